@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the pure-Python parsing and selection paths.
+
+Runs the format parsers, the Format Checker table, format selection and
+URL intake against the recorded corpus in ``bench/corpus`` and against
+synthetic URL lists built from a fixed seed, so two runs on the same
+machine see exactly the same input.
+
+    python bench/bench_parsers.py                    # full run
+    python bench/bench_parsers.py --quick -k youtube
+    python bench/bench_parsers.py --json before.json
+    python bench/bench_parsers.py --compare before.json
+"""
+
+import argparse
+import json
+import random
+from typing import Any, Callable, List, Tuple
+
+import benchlib
+
+k = benchlib.load_app()
+
+# Synthetic URL lists: (name, line count); --quick keeps the first two
+URL_LIST_SIZES = [("1k", 1_000), ("10k", 10_000), ("100k", 100_000)]
+
+# Rows per scaled format table (the YouTube corpus repeated with fresh IDs)
+SCALED_TABLE_COPIES = 50
+
+_URL_SHAPES = [
+    "https://www.youtube.com/watch?v={yt}",
+    "https://youtu.be/{yt}?si={junk}",
+    "https://www.youtube.com/watch?v={yt}&list=PL{junk}&utm_source=share",
+    "https://www.youtube.com/shorts/{yt}",
+    "https://www.tiktok.com/@user{n}/video/{num}",
+    "https://www.facebook.com/watch/?v={num}",
+    "https://fb.watch/{junk}/",
+    "https://www.instagram.com/reel/{ig}/?igsh={junk}",
+    "https://soundcloud.com/artist{n}/track-{n}",
+    "https://vimeo.com/{n}",
+]
+_ID_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"
+
+
+def synthetic_url_lines(count: int, seed: int) -> List[str]:
+    """Pasted-list lines: mostly URLs, with duplicates, notes and junk mixed in."""
+    rnd = random.Random(seed)
+
+    def token(n: int) -> str:
+        return "".join(rnd.choice(_ID_CHARS) for _ in range(n))
+
+    lines: List[str] = []
+    for i in range(count):
+        roll = rnd.random()
+        if roll < 0.08 and lines:
+            lines.append(rnd.choice(lines))                        # duplicate
+        elif roll < 0.12:
+            lines.append(f"# batch {i} - {token(12)}")             # note
+        elif roll < 0.14:
+            lines.append("")
+        elif roll < 0.16:
+            lines.append(f"not a url {token(20)}")
+        else:
+            url = rnd.choice(_URL_SHAPES).format(
+                yt=token(11), ig=token(11), junk=token(16),
+                num=rnd.randrange(10 ** 15, 10 ** 19), n=rnd.randrange(1, 10 ** 6),
+            )
+            lines.append(f"  {url}  " if roll > 0.95 else url)
+    return lines
+
+
+def scaled_table(output: str, copies: int) -> str:
+    """``output`` with its format rows repeated under new IDs."""
+    lines = output.splitlines()
+    start = next(i for i, line in enumerate(lines) if "ID" in line and "EXT" in line)
+    rows = lines[start + 2:]
+    scaled = [f"{row.split(None, 1)[0]}-{n} {row.split(None, 1)[1]}" for n in range(copies) for row in rows]
+    return "\n".join(lines[:start + 2] + scaled)
+
+
+def format_table_all_filters(output: str) -> Any:
+    table = k.FormatTable()
+    for line in output.splitlines():
+        table.feed(line)
+    return [table.render(name) for name in table.FILTERS]
+
+
+def build_cases(seed: int, quick: bool) -> List[Tuple[str, Callable[[], Any]]]:
+    cases: List[Tuple[str, Callable[[], Any]]] = []
+    choice = k.FormatChoice(1080, "VP9", "Opus")
+
+    tables = [(name, benchlib.corpus_text(f"{name}.formats.txt")) for name in benchlib.PLATFORMS]
+    tables.append((f"youtube-x{SCALED_TABLE_COPIES}", scaled_table(tables[0][1], SCALED_TABLE_COPIES)))
+    for name, output in tables:
+        lines = output.splitlines()
+        cases += [
+            (f"parse_video_formats[{name}]", lambda o=output: k.parse_video_formats(o)),
+            (f"FormatRecord.from_line[{name}]", lambda ls=lines: [k.FormatRecord.from_line(ln) for ln in ls]),
+            (f"FormatTable.all_filters[{name}]", lambda o=output: format_table_all_filters(o)),
+        ]
+
+    for name in benchlib.PLATFORMS:
+        raw = benchlib.corpus_text(f"{name}.info.json")
+        info = json.loads(raw)
+        cases += [
+            (f"json.loads[{name}]", lambda r=raw: json.loads(r)),
+            (f"formats_from_metadata[{name}]", lambda i=info: k.formats_from_metadata(i)),
+            (f"rank_format_choices[{name}]", lambda i=info: k.rank_format_choices(i, min_height=720)),
+            (f"FormatChoice.resolve[{name}]", lambda i=info: choice.resolve("bench://other", i)),
+        ]
+
+    for size_name, count in URL_LIST_SIZES[:2] if quick else URL_LIST_SIZES:
+        lines = synthetic_url_lines(count, seed)
+        urls = [ln.strip() for ln in lines if k.URL_RE.match(ln.strip())]
+        cases += [
+            (f"URL_RE.match[{size_name}]", lambda ls=lines: [k.URL_RE.match(ln.strip()) for ln in ls]),
+            (f"detect_platform[{size_name}]", lambda us=urls: [k.detect_platform(u) for u in us]),
+            (f"canonical_id[{size_name}]", lambda us=urls: [k.canonical_id(u) for u in us]),
+            (f"import_urls[{size_name}]", lambda ls=lines: k.import_urls(ls, "bench")),
+            (f"UrlQueue.set_typed[{size_name}]", lambda ls=lines: k.UrlQueue().set_typed(ls)),
+        ]
+    return cases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", "--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="shorter runs and smaller URL lists")
+    parser.add_argument("--repeat", type=int, default=None, help="timed repeats per case (default 5, quick 3)")
+    parser.add_argument("--min-time", type=float, default=None, help="seconds per repeat (default 0.2, quick 0.05)")
+    parser.add_argument("--seed", type=int, default=1234, help="seed for the synthetic URL lists")
+    parser.add_argument("--json", metavar="PATH", help="save results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="show the change against a saved JSON run")
+    args = parser.parse_args()
+
+    repeat = args.repeat or (3 if args.quick else 5)
+    min_time = args.min_time or (0.05 if args.quick else 0.2)
+    baseline = benchlib.load_baseline(args.compare) if args.compare else None
+
+    results = []
+    for name, fn in build_cases(args.seed, args.quick):
+        if args.filter.lower() in name.lower():
+            results.append(benchlib.measure(name, fn, min_time=min_time, repeat=repeat))
+    benchlib.print_results(results, baseline)
+
+    if args.json:
+        benchlib.save_results(args.json, results, {"suite": "parsers", "seed": args.seed, "quick": args.quick})
+        print(f"\n💾 Saved {len(results)} result(s) to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
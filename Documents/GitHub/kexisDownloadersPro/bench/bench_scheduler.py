@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Offline end-to-end benchmark for the download scheduler.
+
+Points ``YTDLP_EXE`` at ``fake_ytdlp.py`` and serves the media from a local
+``MediaServer``, then drives ``DownloadWorker`` (or ``run_download`` on a
+plain thread pool) through a seeded batch of jobs with a configurable mix
+of failures and stalls. The app's scheduler, watchdog, retry policies and
+fallback chain all run unchanged; only the network and yt-dlp are fake.
+
+    python bench/bench_scheduler.py                          # 50 jobs, DownloadWorker
+    python bench/bench_scheduler.py --jobs 500 --size-mb 1 --bandwidth 4M
+    python bench/bench_scheduler.py --mode direct --concurrency 12
+    python bench/bench_scheduler.py --faults transient=0.1,stall=0.05 --json run.json
+
+Reports jobs/minute, bytes/s, job latency percentiles, yt-dlp invocations
+per job, bytes wasted on failed or restarted attempts, and the log
+traffic the UI would have to absorb.
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import benchlib
+from media_server import MediaServer
+
+k = benchlib.load_app()
+
+FAKE_YTDLP = benchlib.BENCH_DIR / "fake_ytdlp.py"
+_COMPONENT_RE = re.compile(r"\.f[0-9A-Za-z_-]+\.\w+$")
+
+# Fault name -> (fake_ytdlp URL parameter, value)
+FAULTS: Dict[str, Tuple[str, str]] = {
+    "transient": ("bench_fail", "503x1"),      # one 503, then fine: retry path
+    "throttled": ("bench_fail", "429x1"),      # one 429: host cooldown path
+    "forbidden": ("bench_fail", "403"),        # always 403: full fallback chain
+    "unavailable": ("bench_fail", "unavailable"),  # permanent: no retries
+    "merge": ("bench_fail", "merge"),          # streams fine, merge fails
+    "stall": ("bench_stall", "0.5x1"),         # server goes silent once: watchdog restart
+}
+
+_URL_SHAPES = [
+    "https://www.youtube.com/watch?v=bench{n:05d}",
+    "https://www.tiktok.com/@bench/video/{n:019d}",
+    "https://www.facebook.com/watch/?v={n:015d}",
+    "https://www.instagram.com/reel/bench{n:05d}/",
+    "https://soundcloud.com/bench/track-{n:05d}",
+]
+
+
+def parse_rate(text: str) -> float:
+    """``"8M"`` / ``"512K"`` / ``"1000"`` -> bytes/s (0 = unlimited)."""
+    text = text.strip().upper().rstrip("B").rstrip("/S")
+    scale = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}.get(text[-1:], 1)
+    return float(text[:-1] if scale != 1 else text) * scale
+
+
+def parse_faults(text: str) -> Dict[str, float]:
+    """``"transient=0.05,stall=0.02"`` -> {name: probability}."""
+    mix: Dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, rate = part.partition("=")
+        if name not in FAULTS:
+            raise SystemExit(f"❌ Unknown fault '{name}' (known: {', '.join(FAULTS)})")
+        mix[name] = float(rate or 0)
+    return mix
+
+
+def build_jobs(args: argparse.Namespace, out: Path) -> Tuple[List[Tuple[str, dict]], Dict[str, str]]:
+    """Seeded job list and the fault assigned to each URL."""
+    rnd = random.Random(args.seed)
+    faults = parse_faults(args.faults)
+    jobs: List[Tuple[str, dict]] = []
+    assigned: Dict[str, str] = {}
+    for n in range(args.jobs):
+        base = rnd.choice(_URL_SHAPES).format(n=n)
+        size = max(int(rnd.lognormvariate(0, 0.5) * args.size_mb * 1024 * 1024), 1024)
+        params = [f"bench_size={size}"]
+        roll = rnd.random()
+        fault = "ok"
+        for name, rate in faults.items():
+            if roll < rate:
+                fault = name
+                key, value = FAULTS[name]
+                params.append(f"{key}={value}")
+                break
+            roll -= rate
+        url = f"{base}{'&' if '?' in base else '?'}{'&'.join(params)}"
+        audio = rnd.random() < args.audio_share
+        opts: Dict[str, Any] = {"out": out, "audio": audio}
+        if not audio:
+            opts["video_id"] = "137"
+            opts["audio_id"] = "140"
+        jobs.append((url, opts))
+        assigned[url] = fault
+    return jobs, assigned
+
+
+class LogDrain(threading.Thread):
+    """Consumes ``log_queue`` the way the UI does and counts the load."""
+
+    def __init__(self) -> None:
+        super().__init__(daemon=True)
+        self.lines = 0
+        self.progress = 0
+        self.chars = 0
+        self.max_backlog = 0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not (self._done.is_set() and k.log_queue.empty()):
+            self.max_backlog = max(self.max_backlog, k.log_queue.qsize())
+            try:
+                tag, msg = k.log_queue.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if tag == "progress":
+                self.progress += 1
+            else:
+                self.lines += 1
+                self.chars += len(str(msg))
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+def configure_app(args: argparse.Namespace, media: MediaServer, events: Path) -> None:
+    """Point the app at the fake yt-dlp and shrink its timeouts for a bench run."""
+    k.YTDLP_EXE = str(FAKE_YTDLP)
+    k.WARM_POOL_SETTINGS["enabled"] = False
+    k.PREFETCH_SETTINGS["enabled"] = False
+    os.environ["KEXIS_BENCH_MEDIA"] = media.base_url
+    os.environ["KEXIS_BENCH_EVENTS"] = str(events)
+    os.environ["KEXIS_BENCH_EXTRACT_DELAY"] = str(args.extract_delay)
+    os.environ["KEXIS_BENCH_PROGRESS_EVERY"] = str(args.progress_every)
+
+    k.WATCHDOG_SETTINGS["stall_timeout"] = args.stall_timeout
+    k.WATCHDOG_SETTINGS["startup_timeout"] = max(args.stall_timeout * 3, args.extract_delay + 5)
+    k.WATCHDOG_SETTINGS["speed_floor"] = args.speed_floor
+    for policy in k.RETRY_POLICIES.values():
+        policy["base_delay"] *= args.backoff_scale
+        policy["max_delay"] *= args.backoff_scale
+
+    k.SCHEDULER.max_total_jobs = args.max_jobs
+    if args.host_max:
+        for host in k.SCHEDULER.host_max_jobs:
+            k.SCHEDULER.host_max_jobs[host] = args.host_max
+    k.SCHEDULER.tuner.enabled = not args.no_autotune
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix="kexis-bench-"))
+    out = workdir / "downloads"
+    out.mkdir()
+    events = workdir / "events.jsonl"
+    media = MediaServer(
+        bandwidth=parse_rate(args.bandwidth), link=parse_rate(args.link), error_rate=args.error_rate,
+        stall_rate=args.stall_rate, stall_seconds=args.stall_seconds, seed=args.seed,
+    ).start()
+    configure_app(args, media, events)
+    jobs, assigned = build_jobs(args, out)
+
+    # Time every job inside whichever driver calls run_download
+    real_run_download = k.run_download
+    timings: Dict[str, Tuple[float, bool]] = {}
+
+    def timed_run_download(url: str, out: Path, **opts: Any) -> bool:
+        started = time.perf_counter()
+        ok = False
+        try:
+            ok = real_run_download(url, out, **opts)
+            return ok
+        finally:
+            timings[url] = (time.perf_counter() - started, ok)
+
+    drain = LogDrain()
+    drain.start()
+    k.run_download = timed_run_download
+    started = time.perf_counter()
+    try:
+        if args.mode == "worker":
+            worker = k.DownloadWorker(jobs, tag="BENCH")
+            worker.start()
+            worker.join()
+        else:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                list(pool.map(lambda job: k.run_download(job[0], **job[1], tag="BENCH"), jobs))
+    finally:
+        elapsed = time.perf_counter() - started
+        k.run_download = real_run_download
+        drain.stop()
+        media.stop()
+
+    invocations: Dict[str, int] = {}
+    if events.exists():
+        for line in events.read_text(encoding="utf-8").splitlines():
+            event = json.loads(line)
+            if event.get("event") == "start":
+                invocations[event["url"]] = invocations.get(event["url"], 0) + 1
+    # Finished outputs only: not partial files or unmerged .fNNN streams
+    final_bytes = sum(p.stat().st_size for p in out.iterdir()
+                      if p.is_file() and not p.name.endswith(".part") and not _COMPONENT_RE.search(p.name))
+
+    latencies = [seconds for seconds, _ in timings.values()]
+    ok = sum(1 for _, success in timings.values() if success)
+    by_fault: Dict[str, Dict[str, Any]] = {}
+    for url, fault in assigned.items():
+        seconds, success = timings.get(url, (0.0, False))
+        entry = by_fault.setdefault(fault, {"jobs": 0, "ok": 0, "invocations": 0, "seconds": 0.0})
+        entry["jobs"] += 1
+        entry["ok"] += success
+        entry["invocations"] += invocations.get(url, 0)
+        entry["seconds"] += seconds
+
+    report = {
+        "jobs": len(jobs),
+        "succeeded": ok,
+        "failed": len(jobs) - ok,
+        "elapsed": elapsed,
+        "jobs_per_minute": len(timings) / elapsed * 60 if elapsed else 0.0,
+        "bytes_per_second": final_bytes / elapsed if elapsed else 0.0,
+        "server_bytes_per_second": media.stats["bytes_sent"] / elapsed if elapsed else 0.0,
+        "final_bytes": final_bytes,
+        "wasted_bytes": max(media.stats["bytes_sent"] - final_bytes, 0),
+        "latency": {
+            "p50": percentile(latencies, 50), "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99), "max": max(latencies, default=0.0),
+            "mean": statistics.fmean(latencies) if latencies else 0.0,
+        },
+        "invocations_per_job": sum(invocations.values()) / len(jobs) if jobs else 0.0,
+        "by_fault": by_fault,
+        "server": dict(media.stats),
+        "log": {
+            "lines": drain.lines, "progress_updates": drain.progress, "chars": drain.chars,
+            "lines_per_second": (drain.lines + drain.progress) / elapsed if elapsed else 0.0,
+            "max_backlog": drain.max_backlog,
+        },
+    }
+    if args.keep:
+        print(f"📁 Kept run files in {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    human = benchlib._human_bytes
+    lat = report["latency"]
+    print(f"\n🏁 {report['jobs']} jobs in {report['elapsed']:.1f}s: "
+          f"{report['succeeded']} ok, {report['failed']} failed")
+    print(f"   throughput   {report['jobs_per_minute']:.1f} jobs/min, "
+          f"{human(report['bytes_per_second'])}/s kept, {human(report['server_bytes_per_second'])}/s served")
+    print(f"   latency      p50 {lat['p50']:.2f}s  p90 {lat['p90']:.2f}s  p99 {lat['p99']:.2f}s  "
+          f"max {lat['max']:.2f}s")
+    print(f"   yt-dlp       {report['invocations_per_job']:.2f} invocations/job, "
+          f"{human(report['wasted_bytes'])} wasted on failed or restarted attempts")
+    log = report["log"]
+    print(f"   UI log       {log['lines']} lines + {log['progress_updates']} progress updates "
+          f"({log['lines_per_second']:.0f}/s, backlog peak {log['max_backlog']})")
+    server = report["server"]
+    print(f"   server       {server['requests']} requests, {server['errors_injected']} errors and "
+          f"{server['stalls_injected']} stalls injected, {server['aborted']} aborted")
+
+    print(f"\n{'fault':<12}  {'jobs':>5}  {'ok':>5}  {'calls/job':>9}  {'mean s':>7}")
+    print("-" * 44)
+    for fault, entry in sorted(report["by_fault"].items()):
+        jobs = entry["jobs"]
+        print(f"{fault:<12}  {jobs:>5}  {entry['ok']:>5}  {entry['invocations'] / jobs:>9.2f}  "
+              f"{entry['seconds'] / jobs:>7.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["worker", "direct"], default="worker",
+                        help="drive DownloadWorker (scheduler caps apply) or run_download on a thread pool")
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=6, help="threads in --mode direct")
+    parser.add_argument("--size-mb", type=float, default=4.0, help="median download size")
+    parser.add_argument("--audio-share", type=float, default=0.2, help="fraction of audio-only jobs")
+    parser.add_argument("--faults", default="transient=0.05,throttled=0.02,forbidden=0.02,"
+                                            "unavailable=0.02,merge=0.02,stall=0.03",
+                        help=f"comma-separated name=probability ({', '.join(FAULTS)})")
+    parser.add_argument("--seed", type=int, default=1234)
+    # Media server
+    parser.add_argument("--bandwidth", default="8M", help="per-connection cap in bytes/s (0 = unlimited)")
+    parser.add_argument("--link", default="0", help="shared link cap in bytes/s (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="random 503s on any request")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="random stalls on any request")
+    parser.add_argument("--stall-seconds", type=float, default=10.0, help="how long an injected stall lasts")
+    # Fake yt-dlp
+    parser.add_argument("--extract-delay", type=float, default=0.2, help="simulated extraction seconds")
+    parser.add_argument("--progress-every", type=float, default=0.0,
+                        help="min seconds between progress lines (0 = every chunk)")
+    # App settings
+    parser.add_argument("--max-jobs", type=int, default=k.DEFAULT_MAX_TOTAL_JOBS, help="scheduler global job cap")
+    parser.add_argument("--host-max", type=int, default=0, help="per-host job cap for every host (0 = app defaults)")
+    parser.add_argument("--no-autotune", action="store_true", help="turn off the AIMD concurrency tuner")
+    parser.add_argument("--stall-timeout", type=float, default=3.0, help="watchdog stall timeout")
+    parser.add_argument("--speed-floor", type=float, default=0, help="watchdog speed floor in bytes/s")
+    parser.add_argument("--backoff-scale", type=float, default=0.05, help="multiplier for retry backoff delays")
+    # Output
+    parser.add_argument("--json", metavar="PATH", help="save the report as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep downloaded files and the event log")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        data = {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "environment": benchlib.environment(),
+            "meta": {"suite": "scheduler", **vars(args)},
+            "report": report,
+        }
+        Path(args.json).write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+        print(f"\n💾 Saved report to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+Timing follows ``timeit``: the garbage collector is off while a case runs,
+the loop count is calibrated so one repeat takes at least ``min_time``
+seconds, and the best and median of several repeats are reported.
+Allocations are measured separately with ``tracemalloc`` on a single
+call, so tracing does not distort the timings.
+"""
+
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_DIR = BENCH_DIR.parent
+CORPUS_DIR = BENCH_DIR / "corpus"
+
+# Corpus platforms, in report order
+PLATFORMS = ["youtube", "tiktok", "facebook", "instagram", "soundcloud"]
+
+
+def load_app() -> Any:
+    """Import ``kexisdownloader`` from the directory above ``bench/``."""
+    if str(APP_DIR) not in sys.path:
+        sys.path.insert(0, str(APP_DIR))
+    import kexisdownloader
+
+    return kexisdownloader
+
+
+def corpus_text(name: str) -> str:
+    return (CORPUS_DIR / name).read_text(encoding="utf-8")
+
+
+def corpus_info(platform_name: str) -> Dict[str, Any]:
+    return json.loads(corpus_text(f"{platform_name}.info.json"))
+
+
+class Result:
+    """Timing and allocation numbers for one benchmark case."""
+
+    def __init__(self, name: str, loops: int, times: List[float], peak_bytes: int, blocks: int) -> None:
+        self.name = name
+        self.loops = loops
+        self.times = times              # seconds per call, one per repeat
+        self.peak_bytes = peak_bytes    # tracemalloc peak during one call
+        self.blocks = blocks            # blocks held after one call, result included
+
+    @property
+    def best(self) -> float:
+        return min(self.times)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.times)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "loops": self.loops,
+            "best": self.best,
+            "median": self.median,
+            "peak_bytes": self.peak_bytes,
+            "blocks": self.blocks,
+        }
+
+
+def measure(name: str, fn: Callable[[], Any], *, min_time: float = 0.2, repeat: int = 5) -> Result:
+    """Time ``fn`` (no arguments) and record its allocations."""
+    fn()  # warm caches (regex compilation, lazy imports)
+
+    loops = 1
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time or loops >= 1 << 20:
+                break
+            loops *= 10 if elapsed < min_time / 10 else 2
+
+        times = [elapsed / loops]
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            times.append((time.perf_counter() - start) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        kept = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del kept
+    return Result(name, loops, times, peak, blocks)
+
+
+def _human_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def _human_bytes(num: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(num) < 1024:
+            return f"{num:.0f} {unit}" if unit == "B" else f"{num:.1f} {unit}"
+        num /= 1024
+    return f"{num:.1f} GB"
+
+
+def print_results(results: List[Result], baseline: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    """Print a results table, with the change against ``baseline`` if given."""
+    width = max([len(r.name) for r in results] + [10])
+    header = f"{'case':<{width}}  {'best':>10}  {'median':>10}  {'peak mem':>9}  {'blocks':>7}"
+    if baseline:
+        header += f"  {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line = (f"{r.name:<{width}}  {_human_time(r.best):>10}  {_human_time(r.median):>10}  "
+                f"{_human_bytes(r.peak_bytes):>9}  {r.blocks:>7}")
+        if baseline:
+            base = baseline.get(r.name)
+            line += f"  {r.best / base['best']:>7.2f}x" if base else f"  {'new':>8}"
+        print(line)
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def save_results(path: str, results: List[Result], meta: Optional[Dict[str, Any]] = None) -> None:
+    data = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": environment(),
+        "meta": meta or {},
+        "results": {r.name: r.to_dict() for r in results},
+    }
+    Path(path).write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))["results"]
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Scriptable yt-dlp stand-in for offline end-to-end benchmarks.
+
+Accepts the command lines the app builds, downloads the requested streams
+from ``media_server.MediaServer`` and prints yt-dlp's own output shapes
+(extraction lines, ``[download] Destination:``, ``--newline`` progress,
+``[Merger]``, ``ERROR:`` lines), so the app's progress parsing, stall
+watchdog, error classification, retries and fallbacks all run for real.
+
+The job URL decides what happens; the app passes it through unchanged:
+
+    bench_size=BYTES        total size of the download (default 8 MiB)
+    bench_fail=STATUS[xN]   the media server answers STATUS (first N requests
+                            for the video, counted across its streams)
+    bench_fail=unavailable  extraction fails with "Video unavailable"
+    bench_fail=merge        streams download, then the merge fails
+    bench_stall=FRAC[xN]    the server goes silent at FRAC of each stream
+
+Environment:
+
+    KEXIS_BENCH_MEDIA           media server base URL (required for downloads)
+    KEXIS_BENCH_EVENTS          JSON-lines file; start and end records per URL
+    KEXIS_BENCH_EXTRACT_DELAY   seconds of simulated extraction (default 0.2)
+    KEXIS_BENCH_PROGRESS_EVERY  min seconds between progress lines (default 0:
+                                every chunk, like yt-dlp --newline)
+
+``-F``, ``-J`` and ``-j`` print the matching platform's corpus entry.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus"
+CHUNK_SIZE = 64 * 1024
+
+# Options that take a value, so their value is not mistaken for a URL
+VALUE_FLAGS = {
+    "-o", "-f", "--limit-rate", "--load-info-json", "--audio-format", "--audio-quality",
+    "--extractor-args", "--cookies", "--cookies-from-browser", "--downloader", "--downloader-args",
+    "--concurrent-fragments", "--http-chunk-size", "--remote-components", "--merge-output-format",
+    "--fragment-retries", "--retries", "--socket-timeout",
+}
+_FORMAT_ID_RE = re.compile(r"^[0-9A-Za-z_-]+$")
+
+
+def parse_args(argv: List[str]) -> Tuple[Dict[str, str], set, List[str]]:
+    values: Dict[str, str] = {}
+    flags = set()
+    urls: List[str] = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "--":
+            urls.extend(argv[i + 1:])
+            break
+        if arg in VALUE_FLAGS and i + 1 < len(argv):
+            values[arg] = argv[i + 1]
+            i += 2
+            continue
+        if arg.startswith("-"):
+            flags.add(arg)
+        else:
+            urls.append(arg)
+        i += 1
+    return values, flags, urls
+
+
+def platform_of(url: str) -> Tuple[str, str]:
+    """(extractor name, corpus name) for ``url``."""
+    host = urlparse(url).netloc.lower()
+    for needle, extractor, corpus in (
+        ("youtu", "youtube", "youtube"), ("tiktok", "TikTok", "tiktok"), ("facebook", "facebook", "facebook"),
+        ("fb.watch", "facebook", "facebook"), ("instagram", "Instagram", "instagram"),
+        ("soundcloud", "soundcloud", "soundcloud"),
+    ):
+        if needle in host:
+            return extractor, corpus
+    return "generic", "youtube"
+
+
+def video_id(url: str) -> str:
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    if "v" in query:
+        return query["v"][0]
+    segments = [s for s in parsed.path.split("/") if s]
+    return re.sub(r"[^0-9A-Za-z_-]", "_", segments[-1] if segments else "video")
+
+
+def bench_params(url: str) -> Dict[str, str]:
+    return {k[6:]: v[-1] for k, v in parse_qs(urlparse(url).query).items() if k.startswith("bench_")}
+
+
+def human(num: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if num < 1024 or unit == "GiB":
+            return f"{num:.2f}{unit}"
+        num /= 1024
+    return f"{num:.2f}GiB"
+
+
+def clock(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}" if seconds >= 3600 \
+        else f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_rate(text: Optional[str]) -> float:
+    if not text:
+        return 0
+    m = re.match(r"^([\d.]+)([KMG]?)", text, re.IGNORECASE)
+    if not m:
+        return 0
+    return float(m.group(1)) * {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[m.group(2).upper()]
+
+
+def say(line: str) -> None:
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+def record(event: Dict[str, object]) -> None:
+    path = os.environ.get("KEXIS_BENCH_EVENTS")
+    if path:
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(event) + "\n")
+
+
+def listing(flags: set, urls: List[str]) -> int:
+    """-F / -J / -j from the corpus."""
+    code = 0
+    for url in urls:
+        extractor, corpus = platform_of(url)
+        vid = video_id(url)
+        if bench_params(url).get("fail") == "unavailable":
+            say(f"ERROR: [{extractor}] {vid}: Video unavailable. This video has been removed by the uploader")
+            code = 1
+            continue
+        if "-F" in flags:
+            text = (CORPUS_DIR / f"{corpus}.formats.txt").read_text(encoding="utf-8")
+            sys.stdout.write(text)
+            continue
+        info = json.loads((CORPUS_DIR / f"{corpus}.info.json").read_text(encoding="utf-8"))
+        info.update(id=vid, title=vid, webpage_url=url, original_url=url)
+        say(json.dumps(info))
+    return code
+
+
+def pick_streams(selector: str, audio: bool) -> List[str]:
+    """Concrete format IDs for the first alternative of ``selector``."""
+    if audio:
+        return ["251"]
+    first = selector.split("/")[0] if selector else "bestvideo+bestaudio"
+    parts = first.split("+")
+    ids = [p if _FORMAT_ID_RE.match(p) else ("140" if "audio" in p else "137") for p in parts]
+    return ids[:2] or ["18"]
+
+
+def fetch(media: str, vid: str, fmt: str, size: int, params: Dict[str, str], part: Path,
+          limit: float, every: float) -> Tuple[int, str]:
+    """Download one stream into ``part``; returns (bytes fetched, error or "")."""
+    have = part.stat().st_size if part.exists() else 0
+    if have:
+        say(f"[download] Resuming download at byte {have}")
+    query = {"size": size}
+    if params.get("fail") and params["fail"][0].isdigit():
+        query["fail"] = params["fail"]
+    if params.get("stall"):
+        query["stall"] = params["stall"]
+    request = urllib.request.Request(f"{media}/media/{vid}/{fmt}?{urlencode(query)}")
+    if have:
+        request.add_header("Range", f"bytes={have}-")
+
+    fetched = 0
+    started = last = time.monotonic()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as resp, open(part, "ab") as fh:
+            while True:
+                chunk = resp.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                fh.write(chunk)
+                fetched += len(chunk)
+                now = time.monotonic()
+                if limit:
+                    delay = started + fetched / limit - now
+                    if delay > 0:
+                        time.sleep(delay)
+                        now = time.monotonic()
+                if now - last >= every:
+                    last = now
+                    done = have + fetched
+                    speed = fetched / max(now - started, 1e-3)
+                    eta = (size - done) / speed if speed else 0
+                    say(f"[download] {done * 100 / size:5.1f}% of {human(size):>10} at {human(speed):>10}/s ETA {clock(eta)}")
+    except urllib.error.HTTPError as exc:
+        if exc.code == 416:
+            return fetched, ""
+        return fetched, f"unable to download video data: HTTP Error {exc.code}: {exc.reason}"
+    except (urllib.error.URLError, OSError) as exc:
+        return fetched, f"unable to download video data: {exc}"
+
+    elapsed = time.monotonic() - started
+    say(f"[download] 100% of {human(size):>10} in {clock(elapsed)} at {human(fetched / max(elapsed, 1e-3))}/s")
+    return fetched, ""
+
+
+def download(values: Dict[str, str], flags: set, url: str) -> Tuple[int, int]:
+    """Run one download; returns (exit code, bytes fetched)."""
+    media = os.environ.get("KEXIS_BENCH_MEDIA", "").rstrip("/")
+    extractor, _ = platform_of(url)
+    vid = video_id(url)
+    params = bench_params(url)
+    audio = "--extract-audio" in flags
+    size = int(params.get("size", 8 * 1024 * 1024))
+    every = float(os.environ.get("KEXIS_BENCH_PROGRESS_EVERY", "0"))
+    limit = parse_rate(values.get("--limit-rate"))
+
+    if "--load-info-json" in values:
+        say(f"[info] Loading video info from {values['--load-info-json']}")
+    else:
+        say(f"[{extractor}] Extracting URL: {url}")
+        say(f"[{extractor}] {vid}: Downloading webpage")
+        time.sleep(float(os.environ.get("KEXIS_BENCH_EXTRACT_DELAY", "0.2")))
+    if params.get("fail") == "unavailable":
+        say(f"ERROR: [{extractor}] {vid}: Video unavailable. This video has been removed by the uploader")
+        return 1, 0
+    if not media:
+        say("ERROR: KEXIS_BENCH_MEDIA is not set")
+        return 1, 0
+
+    streams = pick_streams(values.get("-f", ""), audio)
+    say(f"[info] {vid}: Downloading 1 format(s): {'+'.join(streams)}")
+    template = values.get("-o", "%(title)s.%(ext)s")
+    exts = {"140": "m4a", "251": "webm"}
+    # Video gets most of the bytes, as with real DASH pairs
+    shares = [0.85, 0.15] if len(streams) == 2 else [1.0]
+
+    fetched_total = 0
+    paths: List[Path] = []
+    for fmt, share in zip(streams, shares):
+        ext = exts.get(fmt, "mp4")
+        name = template.replace("%(title)s", vid).replace("%(ext)s", ext)
+        path = Path(name if len(streams) == 1 else re.sub(r"\.(\w+)$", rf".f{fmt}.\1", name))
+        paths.append(path)
+        if path.exists():
+            say(f"[download] {path} has already been downloaded")
+            continue
+        say(f"[download] Destination: {path}")
+        part = Path(str(path) + ".part")
+        fetched, error = fetch(media, vid, fmt, max(int(size * share), 1), params, part, limit, every)
+        fetched_total += fetched
+        if error:
+            say(f"ERROR: {error}")
+            return 1, fetched_total
+        part.replace(path)
+
+    if audio:
+        final = paths[0].with_suffix("." + values.get("--audio-format", "mp3"))
+        say(f"[ExtractAudio] Destination: {final}")
+        paths[0].replace(final)
+    elif len(paths) == 2:
+        final = paths[0].with_name(re.sub(r"\.f[^.]+\.\w+$", ".mp4", paths[0].name))
+        say(f'[Merger] Merging formats into "{final}"')
+        if params.get("fail") == "merge":
+            say("ERROR: Postprocessing: Conversion failed!")
+            return 1, fetched_total
+        with open(final, "wb") as out:
+            for path in paths:
+                out.write(path.read_bytes())
+        for path in paths:
+            say(f'Deleting original file {path} (pass -k to keep)')
+            path.unlink()
+    return 0, fetched_total
+
+
+def main(argv: List[str]) -> int:
+    started = time.monotonic()
+    values, flags, urls = parse_args(argv)
+    if flags & {"-F", "-J", "-j", "--dump-json", "--dump-single-json", "--list-formats"}:
+        return listing(flags, urls)
+    if not urls and "--load-info-json" in values:
+        # The app swapped the URL for prefetched metadata
+        info = json.loads(Path(values["--load-info-json"]).read_text(encoding="utf-8"))
+        urls = [info.get("original_url") or info.get("webpage_url") or ""]
+    if not urls:
+        say("ERROR: You must provide at least one URL.")
+        return 2
+    code = 0
+    for url in urls:
+        # A start record too, so invocations the watchdog kills are counted
+        record({"event": "start", "url": url, "pid": os.getpid()})
+        result, fetched = download(values, flags, url)
+        record({"event": "end", "url": url, "video": video_id(url), "code": result, "bytes": fetched,
+                "seconds": round(time.monotonic() - started, 4), "pid": os.getpid()})
+        code = result or code
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,203 @@
+"""Local HTTP media server for the end-to-end benchmarks.
+
+Serves deterministic bytes for ``/media/<video>/<format>?size=N`` with
+HTTP range support (so resumed downloads work), a per-connection and a
+shared link bandwidth cap, and fault injection:
+
+    fail=STATUS[xN]    answer STATUS to the first N requests (all if no N)
+    stall=FRAC[xN]     go silent at FRAC of the body for the first N requests
+
+N counts requests per video, across all of its format streams, so
+``fail=503x1`` fails exactly one request of a video+audio download.
+
+plus random 503s and stalls at ``error_rate`` / ``stall_rate``. Counts of
+requests, bytes and injected faults are kept in ``stats``.
+"""
+
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+CHUNK_SIZE = 64 * 1024
+
+
+class TokenBucket:
+    """Shared byte budget refilled at ``rate`` bytes/s (0 = unlimited)."""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._tokens = rate
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, amount: int) -> None:
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(min(wait, 0.05))
+
+
+def _with_count(value: str) -> Tuple[str, Optional[int]]:
+    """Split ``"503x2"`` into ``("503", 2)``; no count means every request."""
+    head, sep, count = value.partition("x")
+    return head, int(count) if sep and count.isdigit() else None
+
+
+class MediaServer:
+    """Threaded media server on 127.0.0.1 with bandwidth and fault knobs."""
+
+    def __init__(
+        self,
+        *,
+        bandwidth: float = 0,
+        link: float = 0,
+        error_rate: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_seconds: float = 30.0,
+        seed: int = 0,
+        port: int = 0,
+    ) -> None:
+        self.bandwidth = bandwidth          # bytes/s per connection, 0 = unlimited
+        self.link = TokenBucket(link)       # bytes/s across all connections
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self.stats: Dict[str, int] = {
+            "requests": 0, "bytes_sent": 0, "errors_injected": 0, "stalls_injected": 0, "aborted": 0,
+        }
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, video: str, fmt: str, size: int, **params: Any) -> str:
+        query = urlencode({"size": size, **{k: v for k, v in params.items() if v}})
+        return f"{self.base_url}/media/{video}/{fmt}?{query}"
+
+    def start(self) -> "MediaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="media-server")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ------------------------------------------------------------------
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def _plan(self, path: str, query: Dict[str, str]) -> Tuple[Optional[int], Optional[float]]:
+        """(status to fail with, stall fraction) for this request."""
+        video = path.rsplit("/", 1)[0]
+        with self._lock:
+            hit = self._hits[video] = self._hits.get(video, 0) + 1
+            roll_error = self._random.random() < self.error_rate
+            roll_stall = self._random.random() < self.stall_rate
+            roll_at = self._random.uniform(0.1, 0.9)
+
+        status = None
+        if "fail" in query:
+            code, count = _with_count(query["fail"])
+            if code.isdigit() and (count is None or hit <= count):
+                status = int(code)
+        if status is None and roll_error:
+            status = 503
+
+        stall = None
+        if "stall" in query:
+            frac, count = _with_count(query["stall"])
+            if count is None or hit <= count:
+                stall = float(frac)
+        if stall is None and roll_stall:
+            stall = roll_at
+        return status, stall
+
+    def _handler_class(self) -> Any:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                parsed = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+                server._count("requests")
+                if not parsed.path.startswith("/media/"):
+                    self.send_error(404)
+                    return
+                size = int(query.get("size", 1024 * 1024))
+                status, stall = server._plan(parsed.path, query)
+                if status:
+                    server._count("errors_injected")
+                    self.send_error(status)
+                    return
+
+                start, end = 0, size - 1
+                ranged = self.headers.get("Range", "")
+                if ranged.startswith("bytes="):
+                    first, _, last = ranged[6:].partition("-")
+                    start = int(first or 0)
+                    end = min(int(last), size - 1) if last else size - 1
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+
+                stall_at = int(size * stall) if stall is not None else None
+                pattern = (parsed.path.encode() * (CHUNK_SIZE // max(len(parsed.path), 1) + 1))[:CHUNK_SIZE]
+                sent_at = time.monotonic()
+                position = start
+                try:
+                    while position <= end:
+                        if stall_at is not None and position >= stall_at:
+                            server._count("stalls_injected")
+                            time.sleep(server.stall_seconds)
+                            stall_at = None
+                        amount = min(CHUNK_SIZE, end - position + 1)
+                        server.link.take(amount)
+                        self.wfile.write(pattern[:amount])
+                        position += amount
+                        server._count("bytes_sent", amount)
+                        if server.bandwidth:
+                            # Pace this connection to its own cap
+                            due = sent_at + (position - start) / server.bandwidth
+                            delay = due - time.monotonic()
+                            if delay > 0:
+                                time.sleep(delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    server._count("aborted")
+
+        return Handler
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Record (or refresh) one platform's entry in the benchmark corpus.
+
+Runs the same ``yt-dlp -F`` and ``-J`` commands the app uses for format
+listing and writes ``corpus/<platform>.formats.txt`` and
+``corpus/<platform>.info.json``. Signed stream URLs, cookies and request
+headers are replaced before anything is written, so the files are safe
+to check in.
+
+    python bench/record_corpus.py youtube "https://www.youtube.com/watch?v=aqz-KE-bpKQ"
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Any, List
+
+import benchlib
+
+k = benchlib.load_app()
+
+# Keys whose values are signed, per-session or user specific
+_REDACT_KEYS = {"url", "manifest_url", "fragment_base_url", "http_headers", "cookies", "requested_downloads"}
+# Heavy per-fragment lists the parsers never read
+_DROP_KEYS = {"fragments", "thumbnails", "automatic_captions", "subtitles", "heatmap"}
+
+
+def redact(value: Any) -> Any:
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            if key in _DROP_KEYS:
+                continue
+            if key in _REDACT_KEYS:
+                out[key] = f"https://media.example.invalid/{value.get('format_id', 'redacted')}" if key.endswith("url") else None
+                continue
+            out[key] = redact(item)
+        return out
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def run(cmd: List[str]) -> str:
+    proc = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        sys.exit(f"❌ {' '.join(cmd[:1] + cmd[-2:])} failed:\n{proc.stderr.strip()}")
+    return proc.stdout
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("platform", choices=benchlib.PLATFORMS)
+    parser.add_argument("url")
+    parser.add_argument("--cookies-from-browser", metavar="BROWSER", help="passed through to yt-dlp")
+    args = parser.parse_args()
+
+    base = [k.YTDLP_EXE, "--remote-components", "ejs:github"]
+    if args.cookies_from_browser:
+        base += ["--cookies-from-browser", args.cookies_from_browser]
+    base += k.extraction_args(args.url, "listing")
+
+    listing = run(base + ["-F", args.url])
+    info = redact(json.loads(run(base + ["-J", args.url])))
+
+    benchlib.CORPUS_DIR.mkdir(exist_ok=True)
+    (benchlib.CORPUS_DIR / f"{args.platform}.formats.txt").write_text(listing, encoding="utf-8")
+    (benchlib.CORPUS_DIR / f"{args.platform}.info.json").write_text(
+        json.dumps(info, indent=1, ensure_ascii=False) + "\n", encoding="utf-8"
+    )
+    print(f"✅ Recorded {len(info.get('formats') or [])} formats for {args.platform}")
+
+
+if __name__ == "__main__":
+    main()
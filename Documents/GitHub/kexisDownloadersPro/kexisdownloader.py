@@ -47,13 +47,28 @@ __license__ = "MIT"
 import os
 import sys
 import re
+import asyncio
+import glob
+import csv
+import hashlib
+import json
+import logging
+import random
+import signal
 import shutil
 import queue
 import threading
 import subprocess
+import tempfile
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait as wait_futures
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Any
+import urllib.error
+import urllib.parse
+import urllib.request
+from urllib.parse import urlparse
+from typing import Dict, Iterator, List, Tuple, Optional, Any
 import webbrowser
 
 import customtkinter as ctk
@@ -86,6 +101,11 @@ except ImportError:
 # ----------------------------------------------------------------------
 os.environ["TK_SILENCE_DEPRECATION"] = "1"
 
+# Parser diagnostics; set KEXIS_DEBUG=1 to see them
+log = logging.getLogger("kexisdownloader")
+if os.environ.get("KEXIS_DEBUG"):
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s %(name)s: %(message)s")
+
  # Set appearance / theme, but be defensive if running with a
  # stripped-down or older customtkinter where these helpers are missing
 if hasattr(ctk, "set_appearance_mode"):
@@ -190,23 +210,1023 @@ def find_yt_dlp() -> str:
 YTDLP_EXE = find_yt_dlp()
 
 
+# ----------------------------------------------------------------------
+# Process supervisor (process groups, output streaming, cancellation)
+# ----------------------------------------------------------------------
+CANCEL_SETTINGS: Dict[str, Any] = {
+    "grace_period": 5.0,     # s between the polite signal and the hard kill
+    "keep_partials": True,   # keep .part/.ytdl/fragments on cancel for resume
+}
+
+
+def popen_group_kwargs() -> Dict[str, Any]:
+    """Popen arguments that put the child (and its ffmpeg/aria2c children) in
+    its own process group so the whole tree can be signalled."""
+    if os.name == "nt":
+        return {
+            "creationflags": getattr(subprocess, "CREATE_NO_WINDOW", 0)
+            | getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
+        }
+    return {"start_new_session": True}
+
+
+def _signal_group(pid: int, hard: bool) -> None:
+    """Send the polite (SIGTERM / CTRL_BREAK) or forced signal to ``pid``'s group."""
+    if os.name == "nt":
+        try:
+            if hard:
+                subprocess.run(
+                    ["taskkill", "/PID", str(pid), "/T", "/F"],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+                )
+            else:
+                os.kill(pid, signal.CTRL_BREAK_EVENT)
+        except OSError:
+            pass
+        return
+    try:
+        os.killpg(pid, signal.SIGKILL if hard else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class SupervisedProcess:
+    """Handle for a child process owned by ``ProcessSupervisor``.
+
+    Thread-safe: ``wait`` blocks the calling thread on a future and
+    ``terminate`` schedules a process-group kill on the supervisor loop.
+    """
+
+    def __init__(self, supervisor: "ProcessSupervisor", cmd: List[str], label: str) -> None:
+        self.supervisor = supervisor
+        self.cmd = cmd
+        self.label = label
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.kill_reason: Optional[str] = None
+        self.future: "Future[int]" = Future()
+        self._aproc: Optional[asyncio.subprocess.Process] = None
+        self._pending_kill: Optional[float] = None
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        """Block until the process exited and its output was delivered."""
+        return self.future.result(timeout)
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def send(self, text: str) -> None:
+        """Write ``text`` to the process's stdin (spawned with ``stdin=True``)."""
+        self.supervisor.call_soon(self._send(text.encode("utf-8")))
+
+    async def _send(self, data: bytes) -> None:
+        if self._aproc is None or self._aproc.stdin is None:
+            return
+        try:
+            self._aproc.stdin.write(data)
+            await self._aproc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def terminate(self, grace: Optional[float] = None, reason: str = "terminated") -> None:
+        """Kill the whole process group (after ``grace`` seconds of SIGTERM)."""
+        self.supervisor.call_soon(self._kill(grace, reason))
+
+    async def _kill(self, grace: Optional[float], reason: str) -> None:
+        if self.kill_reason is None:
+            self.kill_reason = reason
+        if self._aproc is None:
+            # Not started yet; killed as soon as it is
+            self._pending_kill = grace
+            return
+        if grace is None:
+            grace = CANCEL_SETTINGS["grace_period"]
+        pid = self._aproc.pid
+        if grace and self._aproc.returncode is None:
+            _signal_group(pid, hard=False)
+            try:
+                await asyncio.wait_for(self._aproc.wait(), grace)
+            except asyncio.TimeoutError:
+                pass
+        # Children (ffmpeg merges, aria2c) can outlive the parent; kill the group
+        await asyncio.get_running_loop().run_in_executor(None, _signal_group, pid, True)
+
+
+class ProcessSupervisor:
+    """Single asyncio loop that owns every yt-dlp / ffmpeg child process.
+
+    Output is read with non-blocking streams and delivered line by line to
+    the ``on_line`` callback given to ``spawn`` (called on the supervisor
+    thread, so it must be quick). Wall-clock timeouts and stall watchdogs
+    are checked by the loop, and structured events (``spawn``, ``line``,
+    ``exit``) are published to subscribers. This replaces the pipe-reading
+    thread per process; it does not make the thread count constant. On
+    POSIX before Python 3.12, asyncio reaps each child with its own
+    short-lived waiter thread (``ThreadedChildWatcher``), and callers
+    still block a thread on the returned future (one ``DownloadWorker``
+    lane per running download).
+    """
+
+    CHECK_INTERVAL = 1.0
+    # Grace for the pipe to drain after the parent exited before the
+    # group (a child still holding the pipe) is killed.
+    DRAIN_TIMEOUT = 5.0
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._subscribers: List[Any] = []
+        self._running: Dict[int, SupervisedProcess] = {}
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="process-supervisor", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def call_soon(self, coro: Any) -> "Future[Any]":
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def subscribe(self, callback: Any) -> None:
+        """Receive every event dict (called on the supervisor thread)."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Any) -> None:
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def running(self) -> int:
+        return len(self._running)
+
+    def spawn(
+        self,
+        cmd: List[str],
+        *,
+        on_line: Optional[Any] = None,
+        timeout: Optional[float] = None,
+        watchdog: Optional["StallWatchdog"] = None,
+        env: Optional[Dict[str, str]] = None,
+        label: str = "",
+        stdin: bool = False,
+    ) -> SupervisedProcess:
+        """Start ``cmd`` under supervision and return its handle immediately."""
+        proc = SupervisedProcess(self, cmd, label)
+        self.call_soon(self._supervise(proc, on_line, timeout, watchdog, env, stdin))
+        return proc
+
+    def _publish(self, event: Dict[str, Any]) -> None:
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as exc:
+                print(f"⚠️ Supervisor subscriber error: {exc}")
+
+    async def _supervise(self, proc: SupervisedProcess, on_line: Any, timeout: Optional[float],
+                         watchdog: Optional["StallWatchdog"], env: Optional[Dict[str, str]],
+                         stdin: bool) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            aproc = await asyncio.create_subprocess_exec(
+                *proc.cmd,
+                stdin=asyncio.subprocess.PIPE if stdin else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                env=env,
+                **popen_group_kwargs(),
+            )
+        except Exception as exc:
+            proc.future.set_exception(exc)
+            return
+
+        proc._aproc = aproc
+        proc.pid = aproc.pid
+        self._running[aproc.pid] = proc
+        self._publish({"event": "spawn", "pid": aproc.pid, "label": proc.label, "cmd": proc.cmd, "time": time.time()})
+        if proc._pending_kill is not None:
+            asyncio.ensure_future(proc._kill(proc._pending_kill, proc.kill_reason or "terminated"))
+
+        reader = asyncio.ensure_future(self._read(proc, aproc.stdout, on_line, watchdog))
+        deadline = loop.time() + timeout if timeout else None
+        exited_at: Optional[float] = None
+        try:
+            while True:
+                done, _ = await asyncio.wait({reader}, timeout=self.CHECK_INTERVAL)
+                if done:
+                    break
+                now = loop.time()
+                if proc.kill_reason is None:
+                    if deadline is not None and now > deadline:
+                        asyncio.ensure_future(proc._kill(0, "timeout"))
+                    elif watchdog is not None:
+                        reason = watchdog.check()
+                        if reason:
+                            asyncio.ensure_future(proc._kill(None, reason))
+                if aproc.returncode is not None:
+                    exited_at = exited_at or now
+                    if now - exited_at > self.DRAIN_TIMEOUT:
+                        await loop.run_in_executor(None, _signal_group, aproc.pid, True)
+                        reader.cancel()
+                        break
+            await aproc.wait()
+        except Exception as exc:
+            proc.future.set_exception(exc)
+            return
+        finally:
+            self._running.pop(aproc.pid, None)
+
+        proc.returncode = aproc.returncode
+        self._publish({
+            "event": "exit", "pid": aproc.pid, "label": proc.label, "returncode": aproc.returncode,
+            "reason": proc.kill_reason, "time": time.time(),
+        })
+        proc.future.set_result(aproc.returncode)
+
+    async def _read(self, proc: SupervisedProcess, stream: asyncio.StreamReader, on_line: Any,
+                    watchdog: Optional["StallWatchdog"]) -> None:
+        # Read in chunks rather than readline(): -J output is one huge line
+        buf = b""
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                break
+            buf += chunk
+            *complete, buf = buf.split(b"\n")
+            for raw in complete:
+                self._deliver(proc, raw, on_line, watchdog)
+        if buf:
+            self._deliver(proc, buf, on_line, watchdog)
+
+    def _deliver(self, proc: SupervisedProcess, raw: bytes, on_line: Any,
+                 watchdog: Optional["StallWatchdog"]) -> None:
+        line = raw.decode("utf-8", errors="replace").rstrip()
+        if watchdog is not None:
+            watchdog.feed(line)
+        if on_line is not None:
+            try:
+                on_line(line)
+            except Exception as exc:
+                print(f"⚠️ Output handler error: {exc}")
+        if self._subscribers:
+            self._publish({"event": "line", "pid": proc.pid, "label": proc.label, "line": line, "time": time.time()})
+
+
+SUPERVISOR = ProcessSupervisor()
+
+
+# Output lines naming files a job writes
+_DESTINATION_RE = re.compile(
+    r'^\[(?:download|ExtractAudio)\] Destination: (.+)$'
+    r'|^\[Merger\] Merging formats into "(.+)"$'
+)
+
+
+def partial_files(dest: Path) -> List[Path]:
+    """Existing leftovers of an unfinished download of ``dest``.
+
+    ``dest`` itself is never included: if it exists it is finished.
+    """
+    candidates = [
+        dest.with_name(dest.name + ".part"),
+        dest.with_name(dest.name + ".ytdl"),
+        dest.with_name(f"{dest.stem}.temp{dest.suffix}"),
+    ]
+    candidates.extend(dest.parent.glob(glob.escape(dest.name) + ".part-Frag*"))
+    return [p for p in candidates if p.exists()]
+
+
+def cleanup_partials(destinations: List[Path], keep: Optional[bool] = None) -> Tuple[int, int]:
+    """Delete the leftovers of cancelled downloads; return (files, bytes) removed.
+
+    With ``keep`` the resumable files (.part, .ytdl, fragments, finished
+    streams) stay and only half-written merge outputs (``.temp.*``) go.
+    Finished files are only removed when they are a separate stream
+    (``name.f137.mp4``) that was never merged, never a completed output.
+    """
+    if keep is None:
+        keep = CANCEL_SETTINGS["keep_partials"]
+    removed = freed = 0
+    for dest in dict.fromkeys(destinations):
+        leftovers = partial_files(dest)
+        if not keep and _COMPONENT_RE.search(dest.name) and dest.exists():
+            leftovers.append(dest)
+        for path in leftovers:
+            if keep and ".temp." not in path.name:
+                continue
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except OSError:
+                continue
+            removed += 1
+            freed += size
+    return removed, freed
+
+
+# ----------------------------------------------------------------------
+# Background executor (bounded, prioritised)
+# ----------------------------------------------------------------------
+# Lower runs first: a window the user is looking at beats bulk planning
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BULK = 10
+
+# Most background tasks are yt-dlp extractions, so keep the count small
+BACKGROUND_WORKERS = max(2, min(4, os.cpu_count() or 2))
+
+
+class BackgroundExecutor:
+    """One bounded, prioritised pool for every background task of the GUI.
+
+    Tasks are queued by (priority, submission order) and run on a fixed
+    number of worker threads, so opening many windows or hammering Retry
+    never starts more than ``max_workers`` extractions at once. ``stats``
+    exposes the queue depth per priority for the status bar.
+    """
+
+    def __init__(self, max_workers: int = BACKGROUND_WORKERS) -> None:
+        self.max_workers = max_workers
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Future, Any, tuple, Dict[str, Any], str]]" = queue.PriorityQueue()
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._running: Dict[int, str] = {}
+        self._queued: Dict[int, int] = {}
+
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            while len(self._threads) < self.max_workers:
+                t = threading.Thread(target=self._work, name=f"background-{len(self._threads)}", daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def submit(self, fn: Any, *args: Any, priority: int = PRIORITY_NORMAL, label: str = "",
+               **kwargs: Any) -> "Future[Any]":
+        """Queue ``fn(*args, **kwargs)``; cancel the returned future to drop it while queued."""
+        future: "Future[Any]" = Future()
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._queued[priority] = self._queued.get(priority, 0) + 1
+        self._queue.put((priority, seq, future, fn, args, kwargs, label or getattr(fn, "__name__", "task")))
+        self._ensure_workers()
+        return future
+
+    def map(self, fn: Any, items: List[Any], *, priority: int = PRIORITY_BULK) -> List[Any]:
+        """Run ``fn`` over ``items`` in the pool and return the results in order.
+
+        Safe to call from a pool worker: items that have not started yet are
+        run inline instead of waiting, so nested maps cannot deadlock.
+        """
+        futures = [self.submit(fn, item, priority=priority) for item in items]
+        on_worker = threading.current_thread() in self._threads
+        results = []
+        for item, future in zip(items, futures):
+            if on_worker and future.cancel():
+                results.append(fn(item))
+            else:
+                results.append(future.result())
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per priority plus the labels of the running tasks."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": list(self._running.values()),
+                "queued": {p: n for p, n in sorted(self._queued.items()) if n},
+            }
+
+    def _work(self) -> None:
+        while True:
+            priority, _, future, fn, args, kwargs, label = self._queue.get()
+            with self._lock:
+                self._queued[priority] -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            ident = threading.get_ident()
+            with self._lock:
+                self._running[ident] = label
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+            finally:
+                with self._lock:
+                    self._running.pop(ident, None)
+
+
+BACKGROUND = BackgroundExecutor()
+
+
+# ----------------------------------------------------------------------
+# Warm yt-dlp worker pool
+# ----------------------------------------------------------------------
+WARM_POOL_SETTINGS: Dict[str, Any] = {
+    "enabled": True,
+    "idle_workers": 2,                # kept warm between jobs
+    # Hard cap, busy + idle. Each worker is a resident Python process with
+    # yt-dlp imported (roughly 60-100 MB RSS), so this stays near the job
+    # caps; requests beyond it run as one-shot processes instead
+    "max_workers": 8,
+    "max_jobs": 50,                   # recycle a worker after this many jobs
+    "max_rss": 600 * 1024 * 1024,     # ... or once its peak RSS grows past this
+}
+
+# Runs inside each worker: import yt-dlp once, then run one request per
+# stdin line. Job output and control messages go back as JSON lines.
+_WARM_WORKER_SOURCE = r'''
+import io, json, os, sys
+proto = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+
+def send(**msg):
+    proto.write(json.dumps(msg) + "\n")
+    proto.flush()
+
+try:
+    from yt_dlp import main as ytdlp_main
+except Exception as exc:
+    send(w="fatal", error=repr(exc))
+    sys.exit(1)
+
+try:
+    import resource
+    def peak_rss():
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+except ImportError:
+    def peak_rss():
+        return 0
+
+class JobStream(io.TextIOBase):
+    encoding = "utf-8"
+    def __init__(self, job):
+        self.job, self.buf = job, ""
+    def writable(self):
+        return True
+    def isatty(self):
+        return False
+    def write(self, text):
+        self.buf += text
+        *lines, self.buf = self.buf.split("\n")
+        for line in lines:
+            send(w="line", id=self.job, text=line)
+        return len(text)
+    def finish(self):
+        if self.buf:
+            send(w="line", id=self.job, text=self.buf)
+        self.buf = ""
+
+send(w="ready", pid=os.getpid())
+for raw in sys.stdin:
+    req = json.loads(raw)
+    if req.get("quit"):
+        break
+    stream = JobStream(req["id"])
+    sys.stdout = sys.stderr = stream
+    try:
+        ytdlp_main(req["args"])
+        code = 0
+    except SystemExit as exc:
+        if exc.code is None or isinstance(exc.code, int):
+            code = exc.code or 0
+        else:
+            # sys.exit("ERROR: ..."): print it as the interpreter would
+            stream.write("%s\n" % (exc.code,))
+            code = 1
+    except BaseException as exc:
+        stream.write("ERROR: warm worker: %r\n" % (exc,))
+        code = 1
+    finally:
+        stream.finish()
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    send(w="exit", id=req["id"], code=code, rss=peak_rss())
+'''
+
+
+def _ytdlp_python() -> Optional[str]:
+    """Interpreter that can ``import yt_dlp``, or None for standalone builds."""
+    if getattr(sys, "frozen", False):
+        # sys.executable is the app itself; the bundled yt-dlp is a binary
+        return None
+    import importlib.util
+
+    if importlib.util.find_spec("yt_dlp") is not None:
+        return sys.executable
+    # pip-installed yt-dlp: a script whose shebang names its interpreter
+    try:
+        with open(YTDLP_EXE, "rb") as fh:
+            first = fh.readline(512).decode("utf-8", "replace").strip()
+    except OSError:
+        return None
+    if first.startswith("#!") and "python" in first:
+        interpreter = first[2:].split()[0]
+        if os.path.isfile(interpreter):
+            return interpreter
+    return None
+
+
+class WarmJob:
+    """Handle for a request run by a warm worker.
+
+    Same interface as ``SupervisedProcess`` (``wait``, ``poll``,
+    ``terminate``, ``returncode``, ``kill_reason``). Terminating a running
+    job kills its worker, so a hung or cancelled job never leaks into the
+    next one.
+    """
+
+    def __init__(self, pool: "WarmPool", args: List[str], on_line: Any, timeout: Optional[float],
+                 watchdog: Optional["StallWatchdog"], env: Optional[Dict[str, str]], label: str) -> None:
+        self.pool = pool
+        self.args = args
+        self.on_line = on_line
+        self.timeout = timeout
+        # Counts from submission, so time spent queued for a worker is included
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.watchdog = watchdog
+        self.env = env
+        self.label = label
+        self.id = id(self)
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.kill_reason: Optional[str] = None
+        self.future: "Future[int]" = Future()
+        self.worker: Optional["WarmWorker"] = None
+        self.cold: Optional[SupervisedProcess] = None
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        return self.future.result(timeout)
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def terminate(self, grace: Optional[float] = None, reason: str = "terminated") -> None:
+        if self.future.done():
+            return
+        if self.kill_reason is None:
+            self.kill_reason = reason
+        if self.cold is not None:
+            self.cold.terminate(grace, reason)
+        elif self.worker is not None:
+            self.worker.proc.terminate(grace, reason)
+        elif self.pool._unqueue(self):
+            self._finish(-signal.SIGTERM)
+
+    def _line(self, line: str) -> None:
+        if self.watchdog is not None:
+            self.watchdog.feed(line)
+        if self.on_line is not None:
+            try:
+                self.on_line(line)
+            except Exception as exc:
+                print(f"⚠️ Output handler error: {exc}")
+
+    def _finish(self, code: int) -> None:
+        if self.future.done():
+            return
+        self.returncode = code
+        self.future.set_result(code)
+
+
+class WarmWorker:
+    """One long-lived Python process with yt-dlp already imported."""
+
+    def __init__(self, pool: "WarmPool", python: str) -> None:
+        self.pool = pool
+        self.ready = False
+        self.job: Optional[WarmJob] = None
+        self.jobs_done = 0
+        self.rss = 0
+        self.env = _ytdlp_env()
+        self.proc = SUPERVISOR.spawn(
+            [python, "-c", _WARM_WORKER_SOURCE],
+            on_line=self._on_line, env=self.env, label="warm worker", stdin=True,
+        )
+        self.proc.future.add_done_callback(self._on_exit)
+
+    def run(self, job: WarmJob) -> None:
+        self.job = job
+        job.worker = self
+        job.pid = self.proc.pid
+        self.proc.send(json.dumps({"id": job.id, "args": job.args}) + "\n")
+
+    def retire(self) -> None:
+        self.proc.send(json.dumps({"quit": True}) + "\n")
+
+    def _on_line(self, line: str) -> None:
+        msg = None
+        if line.startswith('{"w": '):
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                msg = None
+        if msg is None:
+            # Raw output (a child process or a crash traceback)
+            if self.job:
+                self.job._line(line)
+            return
+        kind = msg.get("w")
+        if kind == "line" and self.job and msg.get("id") == self.job.id:
+            self.job._line(msg.get("text", ""))
+        elif kind == "exit" and self.job and msg.get("id") == self.job.id:
+            job, self.job = self.job, None
+            self.jobs_done += 1
+            self.rss = msg.get("rss") or 0
+            job._finish(int(msg.get("code", 1)))
+            self.pool._worker_idle(self)
+        elif kind == "ready":
+            self.ready = True
+            self.pool._worker_idle(self)
+        elif kind == "fatal":
+            print(f"⚠️ Warm yt-dlp worker could not start: {msg.get('error')}")
+
+    def _on_exit(self, _future: Future) -> None:
+        job, self.job = self.job, None
+        if job is not None:
+            code = self.proc.returncode
+            job._finish(code if code is not None else -1)
+        self.pool._worker_gone(self)
+
+
+class WarmPool:
+    """Pre-started yt-dlp processes that take requests over stdin/stdout.
+
+    Each worker pays interpreter start-up and the extractor imports once;
+    later ``-J``/``-F`` fetches and downloads reuse it. Idle workers are
+    kept up to ``idle_workers``; more are started on demand (up to
+    ``max_workers``) and past that jobs run as one-shot processes, so a
+    job never waits behind a long download. A worker
+    is recycled after ``max_jobs`` requests or once its RSS grows past
+    ``max_rss``. Crash isolation is preserved: a worker that dies or is
+    killed takes only its current job with it.
+    """
+
+    def __init__(self) -> None:
+        # Re-entrant: a worker that dies instantly reports back while
+        # ``submit`` still holds the lock
+        self._lock = threading.RLock()
+        self._workers: List[WarmWorker] = []
+        self._idle: List[WarmWorker] = []
+        self._waiting: deque = deque()
+        self._python: Optional[str] = None
+        self._probed = False
+        self._broken = False
+        self._monitor: Optional[threading.Thread] = None
+
+    def available(self) -> bool:
+        if not WARM_POOL_SETTINGS["enabled"] or self._broken:
+            return False
+        if not self._probed:
+            self._python = _ytdlp_python()
+            self._probed = True
+        return self._python is not None
+
+    def prewarm(self) -> None:
+        """Start the idle workers ahead of the first request."""
+        if not self.available():
+            return
+        with self._lock:
+            while len(self._workers) < WARM_POOL_SETTINGS["idle_workers"]:
+                self._workers.append(WarmWorker(self, self._python))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"workers": len(self._workers), "idle": len(self._idle), "waiting": len(self._waiting)}
+
+    def submit(self, args: List[str], *, on_line: Any = None, timeout: Optional[float] = None,
+               watchdog: Optional["StallWatchdog"] = None, env: Optional[Dict[str, str]] = None,
+               label: str = "") -> WarmJob:
+        """Run ``yt-dlp <args>`` on a warm worker and return its handle.
+
+        A job whose ``env`` differs from the one workers start with runs as
+        a one-shot process instead, since a worker cannot change its env.
+        """
+        job = WarmJob(self, args, on_line, timeout, watchdog, env, label)
+        if env is not None and env != _ytdlp_env():
+            self._run_cold(job)
+            return job
+        self._start_monitor()
+        with self._lock:
+            if self._idle:
+                self._dispatch(self._idle.pop(), job)
+                return job
+            if len(self._workers) < WARM_POOL_SETTINGS["max_workers"]:
+                self._waiting.append(job)
+                self._workers.append(WarmWorker(self, self._python))
+                return job
+        # Every worker is busy or starting: don't queue behind them
+        self._run_cold(job)
+        return job
+
+    def _unqueue(self, job: WarmJob) -> bool:
+        with self._lock:
+            if job in self._waiting:
+                self._waiting.remove(job)
+                return True
+        return False
+
+    def _worker_idle(self, worker: WarmWorker) -> None:
+        settings = WARM_POOL_SETTINGS
+        with self._lock:
+            if worker.jobs_done >= settings["max_jobs"] or worker.rss > settings["max_rss"]:
+                self._retire(worker)
+                if self._waiting and len(self._workers) < settings["max_workers"]:
+                    self._workers.append(WarmWorker(self, self._python))
+                return
+            if self._waiting:
+                self._dispatch(worker, self._waiting.popleft())
+            elif len(self._idle) >= settings["idle_workers"]:
+                self._retire(worker)
+            else:
+                self._idle.append(worker)
+
+    def _dispatch(self, worker: WarmWorker, job: WarmJob) -> None:
+        if job.env is not None and job.env != worker.env:
+            # Worker started before the environment changed
+            self._retire(worker)
+            self._run_cold(job)
+            return
+        worker.run(job)
+
+    def _retire(self, worker: WarmWorker) -> None:
+        """Ask ``worker`` to quit; it stops counting towards the cap right away."""
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if worker in self._idle:
+                self._idle.remove(worker)
+        worker.retire()
+
+    def _worker_gone(self, worker: WarmWorker) -> None:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if worker in self._idle:
+                self._idle.remove(worker)
+            if not worker.ready and worker.jobs_done == 0 and worker.proc.kill_reason is None:
+                # Could not even start (bad interpreter, missing yt_dlp)
+                self._broken = True
+                waiting, self._waiting = list(self._waiting), deque()
+            else:
+                waiting = []
+                if self._waiting and not any(not w.ready for w in self._workers):
+                    self._workers.append(WarmWorker(self, self._python))
+        for job in waiting:
+            self._run_cold(job)
+
+    def _run_cold(self, job: WarmJob) -> None:
+        """Fall back to a normal one-shot yt-dlp process."""
+        remaining = None
+        if job.deadline is not None:
+            remaining = max(job.deadline - time.monotonic(), 1)
+        job.cold = SUPERVISOR.spawn(
+            [YTDLP_EXE] + job.args, on_line=job.on_line, timeout=remaining,
+            watchdog=job.watchdog, env=job.env, label=job.label,
+        )
+        job.pid = job.cold.pid
+
+        def done(_future: Future) -> None:
+            job.kill_reason = job.kill_reason or job.cold.kill_reason
+            job._finish(job.cold.returncode if job.cold.returncode is not None else -1)
+
+        job.cold.future.add_done_callback(done)
+
+    def _start_monitor(self) -> None:
+        with self._lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._watch, name="warm-pool", daemon=True)
+                self._monitor.start()
+
+    def _watch(self) -> None:
+        """Enforce deadlines and stall watchdogs for jobs on warm workers."""
+        while True:
+            time.sleep(1.0)
+            with self._lock:
+                jobs = [w.job for w in self._workers if w.job is not None]
+                queued = list(self._waiting)
+            now = time.monotonic()
+            for job in queued:
+                # Still waiting for a worker: only the deadline applies
+                if job.deadline is not None and now > job.deadline:
+                    job.terminate(0, "timeout")
+            for job in jobs:
+                if job.kill_reason is not None:
+                    continue
+                if job.deadline is not None and now > job.deadline:
+                    job.terminate(0, "timeout")
+                elif job.watchdog is not None:
+                    reason = job.watchdog.check()
+                    if reason:
+                        job.terminate(None, reason)
+
+
+WARM_POOL = WarmPool()
+
+
+def spawn_ytdlp(
+    cmd: List[str],
+    *,
+    on_line: Any = None,
+    timeout: Optional[float] = None,
+    watchdog: Optional["StallWatchdog"] = None,
+    env: Optional[Dict[str, str]] = None,
+    label: str = "",
+) -> "SupervisedProcess | WarmJob":
+    """Run a yt-dlp command, on a warm worker when possible."""
+    if cmd and cmd[0] == YTDLP_EXE and WARM_POOL.available():
+        return WARM_POOL.submit(cmd[1:], on_line=on_line, timeout=timeout, watchdog=watchdog,
+                                env=env, label=label)
+    return SUPERVISOR.spawn(cmd, on_line=on_line, timeout=timeout, watchdog=watchdog, env=env, label=label)
+
+
+# ----------------------------------------------------------------------
+# Deadlines and cancellation for yt-dlp fetches
+# ----------------------------------------------------------------------
+# Wall-clock limit for one Format Checker fetch
+FORMAT_CHECK_TIMEOUT = 60
+
+
+class FetchCancelled(Exception):
+    """Raised when a fetch is abandoned through its ``CancelToken``."""
+
+
+class CancelToken:
+    """Cancellation handle tying background fetches to a window's lifetime.
+
+    Processes attached to the token are killed as soon as it is cancelled.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._procs: List["SupervisedProcess | WarmJob"] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            proc.terminate(grace=0, reason="cancelled")
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to ``seconds``; return True if cancelled meanwhile."""
+        return self._event.wait(seconds)
+
+    def attach(self, proc: "SupervisedProcess | WarmJob") -> None:
+        with self._lock:
+            self._procs.append(proc)
+        if self.cancelled:
+            self.cancel()
+
+    def detach(self, proc: "SupervisedProcess | WarmJob") -> None:
+        with self._lock:
+            if proc in self._procs:
+                self._procs.remove(proc)
+
+
+def run_ytdlp_capture(
+    cmd: List[str], timeout: float, cancel: Optional[CancelToken] = None, on_line: Any = None
+) -> Tuple[int, List[str]]:
+    """Run ``cmd`` and collect its output lines within a wall-clock deadline.
+
+    The supervisor enforces the deadline even on a hung extractor. Raises
+    ``subprocess.TimeoutExpired`` when the deadline passes and
+    ``FetchCancelled`` when ``cancel`` fires; the process tree is killed in
+    both cases. ``on_line`` also gets each line as it arrives (reader thread).
+    """
+    lines: List[str] = []
+
+    def collect(line: str) -> None:
+        lines.append(line)
+        if on_line:
+            on_line(line)
+
+    proc = spawn_ytdlp(cmd, on_line=collect, timeout=timeout, env=_ytdlp_env(), label="fetch")
+    if cancel:
+        cancel.attach(proc)
+    try:
+        code = proc.wait()
+    finally:
+        if cancel:
+            cancel.detach(proc)
+    if cancel and cancel.cancelled:
+        raise FetchCancelled(cmd[-1])
+    if proc.kill_reason == "timeout":
+        raise subprocess.TimeoutExpired(cmd, timeout, output="\n".join(lines))
+    return code, lines
+
+
+# ----------------------------------------------------------------------
+# Extraction profiles (extractor args per platform and strategy)
+# ----------------------------------------------------------------------
+# yt-dlp's default extraction fetches more than a given download needs.
+# Strategies:
+#   listing - Smart Selector / Format Checker / metadata (-F, -J), and
+#             downloads of a format ID the user picked from such a listing
+#   video   - best-quality video downloads (generic selector)
+#   audio   - audio-only downloads
+# Values are {extractor: {arg: value}}; platforms and strategies without an
+# entry keep yt-dlp's defaults.
+#
+# YouTube: every strategy asks only the tv and web_safari player clients
+# (one player request fewer than yt-dlp's default set; two clients keep
+# the full adaptive set if one is missing formats). Listings keep the
+# HLS/DASH manifests: they must show every format, live and just-ended
+# streams have no others, and downloads reuse them via --load-info-json.
+# Audio and best-quality video only ever select adaptive mp4/m4a/webm
+# streams from the player response, so they skip fetching the HLS and DASH
+# manifests. A live stream then has no formats, fails as "unknown" and the
+# first fallback retries with yt-dlp's full extraction.
+_YOUTUBE_CLIENTS = "tv,web_safari"
+
+EXTRACTION_PROFILES: Dict[str, Dict[str, Dict[str, Dict[str, str]]]] = {
+    "YouTube": {
+        "listing": {"youtube": {"player_client": _YOUTUBE_CLIENTS}},
+        "video": {"youtube": {"player_client": _YOUTUBE_CLIENTS, "skip": "hls,dash"}},
+        "audio": {"youtube": {"player_client": _YOUTUBE_CLIENTS, "skip": "hls,dash"}},
+    },
+    "SoundCloud": {
+        # Only the progressive/HLS AAC and MP3 transcodings we convert from;
+        # yt-dlp resolves each transcoding's stream URL with its own request
+        "audio": {"soundcloud": {"formats": "http_aac,hls_aac,http_mp3,hls_mp3"}},
+    },
+}
+
+EXTRACTION_SETTINGS: Dict[str, Any] = {"enabled": True}
+
+
+def extraction_args(urls: "str | List[str]", strategy: str) -> List[str]:
+    """``--extractor-args`` for the platform(s) of ``urls`` and a strategy.
+
+    Arguments are keyed by extractor, so one command may carry the
+    profiles of several platforms (batched metadata).
+    """
+    if not EXTRACTION_SETTINGS["enabled"]:
+        return []
+    merged: Dict[str, Dict[str, str]] = {}
+    for url in [urls] if isinstance(urls, str) else urls:
+        profile = EXTRACTION_PROFILES.get(detect_platform(url), {}).get(strategy, {})
+        for extractor, extractor_args in profile.items():
+            merged.setdefault(extractor, {}).update(extractor_args)
+    args: List[str] = []
+    for extractor, extractor_args in merged.items():
+        args.extend(["--extractor-args", f"{extractor}:" + ";".join(f"{k}={v}" for k, v in extractor_args.items())])
+    return args
+
+
+def strip_extraction_args(cmd: List[str]) -> List[str]:
+    """Drop every ``--extractor-args`` pair (back to yt-dlp's full extraction)."""
+    out: List[str] = []
+    skip = False
+    for arg in cmd:
+        if skip:
+            skip = False
+        elif arg == "--extractor-args":
+            skip = True
+        else:
+            out.append(arg)
+    return out
+
+
 # ----------------------------------------------------------------------
 # Format fetching and parsing (All Platforms)
 # ----------------------------------------------------------------------
-def fetch_video_formats(url: str, max_retries: int = 3, timeout: int = 30) -> Dict[str, List[Dict[str, str]]]:
+def fetch_video_formats(
+    url: str, max_retries: int = 3, timeout: int = 30, cancel: Optional[CancelToken] = None
+) -> Dict[str, List[Dict[str, str]]]:
     """Fetch and parse real video formats for any platform (YouTube, TikTok, Facebook, Instagram).
 
     Args:
         url: Video URL to fetch formats for
         max_retries: Maximum number of retry attempts (default: 3)
-        timeout: Timeout in seconds for each attempt (default: 30)
+        timeout: Wall-clock timeout in seconds for each attempt (default: 30)
+        cancel: Optional token; cancelling it kills the running attempt
 
     Returns:
         Dictionary of formats grouped by resolution
     """
+    # Prefetched while the user was still pasting URLs
+    PREFETCHER.wait_for([url])
+    cached = cached_format_metadata(url)
+    if cached:
+        result = formats_from_metadata(cached)
+        if result:
+            print(f"⚡ Using prefetched formats for {url}")
+            return result
+
     # Try different browser cookies for YouTube (works best when user
     # clicks "Always Allow" on the macOS Keychain prompt).
     browsers_to_try = ["chrome", "safari", "firefox", "edge"] if ("youtube.com" in url.lower() or "youtu.be" in url.lower()) else [None]
+
+    def is_cancelled() -> bool:
+        return cancel is not None and cancel.cancelled
     
     for browser in browsers_to_try:
         for attempt in range(max_retries):
@@ -223,41 +1243,11 @@ def fetch_video_formats(url: str, max_retries: int = 3, timeout: int = 30) -> Di
                 if browser:
                     cmd.extend(["--cookies-from-browser", browser])
                 
+                cmd.extend(extraction_args(url, "listing"))
                 cmd.extend(["-F", url])
-            
-                creation_flags = 0
-                if os.name == "nt":
-                    creation_flags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
-                
-                # Set up environment for bundled app
-                env = os.environ.copy()
-                if getattr(sys, "frozen", False):
-                    # Running in bundled app - ensure Python paths are set
-                    bundle_dir = Path(sys.executable).parent
-                    resources_dir = bundle_dir.parent / "Resources"
-                    env["PYTHONHOME"] = str(resources_dir)
-                    env["PYTHONPATH"] = str(resources_dir / "lib" / "python3.13")
-                
-                proc = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    encoding="utf-8",
-                    errors="replace",
-                    creationflags=creation_flags,
-                    env=env,
-                )
-                
-                output_lines = []
+
                 try:
-                    # Read output with timeout
-                    if proc.stdout:
-                        for line in proc.stdout:
-                            output_lines.append(line.rstrip())
-                    
-                    # Wait for process with timeout
-                    proc.wait(timeout=timeout)
+                    _, output_lines = run_ytdlp_capture(cmd, timeout, cancel)
                     
                     # Success!
                     result = parse_video_formats("\n".join(output_lines))
@@ -267,13 +1257,24 @@ def fetch_video_formats(url: str, max_retries: int = 3, timeout: int = 30) -> Di
                         return result
                     else:
                         print(f"⚠️ No formats found on attempt {attempt + 1}")
-                        
+                        category, reason = classify_error(output_lines)
+                        if category == "permanent":
+                            print(f"⛔ {reason} - not retrying")
+                            return {}
+                        if category == "auth":
+                            print(f"🔄 Needs login with {browser or 'no cookies'}, trying next browser...")
+                            break
+                        if category == "throttled":
+                            SCHEDULER.cool_down(host_key(url), backoff_delay(RETRY_POLICIES["throttled"], attempt))
+
                 except subprocess.TimeoutExpired:
                     print(f"⏱️ Timeout on attempt {attempt + 1} with {browser or 'no cookies'}")
-                    proc.kill()
-                    proc.wait()
                     # If cookie reading times out, try next browser
                     break
+
+            except FetchCancelled:
+                print(f"🛑 Fetch cancelled: {url}")
+                return {}
             
             except Exception as exc:
                 print(f"❌ Error on attempt {attempt + 1}: {exc}")
@@ -282,238 +1283,1882 @@ def fetch_video_formats(url: str, max_retries: int = 3, timeout: int = 30) -> Di
                     print(f"🔄 Cookie issue with {browser}, trying next browser...")
                     break
             
-            # Wait before retrying (exponential backoff) only if not last attempt
+            # Wait before retrying (jittered exponential backoff, plus any
+            # host-wide cool-down) only if not last attempt
             if attempt < max_retries - 1:
-                wait_time = min(2 ** attempt, 4)  # 1s, 2s, 4s max
-                print(f"⏳ Waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
+                wait_time = backoff_delay(RETRY_POLICIES["transient"], attempt)
+                print(f"⏳ Waiting {wait_time:.1f}s before retry...")
+                if not SCHEDULER.wait_cooldown(host_key(url), wait_time, is_cancelled):
+                    print(f"🛑 Fetch cancelled: {url}")
+                    return {}
     
     # All retries failed
     print(f"❌ Failed to fetch video info after {max_retries} attempts")
     return {}
 
 
-def detect_platform(url: str) -> str:
-    """Detect platform from URL."""
-    low = url.lower()
-    if "youtube.com" in low or "youtu.be" in low:
-        return "YouTube"
-    elif "tiktok.com" in low:
-        return "TikTok"
-    elif "facebook.com" in low or "fb.watch" in low or "fb.com" in low:
-        return "Facebook"
-    elif "instagram.com" in low:
-        return "Instagram"
-    elif "soundcloud.com" in low:
-        return "SoundCloud"
-    else:
-        return "Video"
+def detect_platform(url: str) -> str:
+    """Detect platform from URL."""
+    low = url.lower()
+    if "youtube.com" in low or "youtu.be" in low:
+        return "YouTube"
+    elif "tiktok.com" in low:
+        return "TikTok"
+    elif "facebook.com" in low or "fb.watch" in low or "fb.com" in low:
+        return "Facebook"
+    elif "instagram.com" in low:
+        return "Instagram"
+    elif "soundcloud.com" in low:
+        return "SoundCloud"
+    else:
+        return "Video"
+
+
+def parse_video_formats(output: str) -> Dict[str, List[Dict[str, str]]]:
+    """Parse yt-dlp -F output into grouped format dictionary (all platforms)."""
+    records = parse_format_table(output)
+    return _group_formats(records) if records else {}
+
+
+def parse_format_table(output: str) -> List["FormatRecord"]:
+    """All format rows of ``yt-dlp -F`` output (empty if there is no table)."""
+    lines = output.split("\n")
+    start = next(
+        (i for i, line in enumerate(lines) if "ID" in line and ("EXT" in line or "RESOLUTION" in line)), -1
+    )
+    if start == -1:
+        log.debug("No format table header in %d lines", len(lines))
+        return []
+    records = [rec for rec in map(FormatRecord.from_line, lines[start + 2:]) if rec]
+    log.debug("Parsed %d format rows from %d lines", len(records), len(lines))
+    return records
+
+
+def _res_group(height: int) -> Optional[str]:
+    """Smart Selector resolution group for a video height (720p and up)."""
+    if height >= 4320:
+        return "8K (4320p)"
+    if height >= 2160:
+        return "4K (2160p)"
+    if height >= 1440:
+        return "1440p"
+    if height >= 1080:
+        return "1080p"
+    if height >= 720:
+        return "720p"
+    return None
+
+
+def formats_from_metadata(info: Dict[str, Any]) -> Dict[str, List[Dict[str, str]]]:
+    """Same grouping as ``parse_video_formats``, built from a yt-dlp info dict.
+
+    Lets the Smart Selector use prefetched (cached) metadata instead of
+    running ``yt-dlp -F`` again.
+    """
+    records = [rec for rec in map(FormatRecord.from_info, info.get("formats") or []) if rec]
+    return _group_formats(records)
+
+
+def _group_formats(records: List["FormatRecord"]) -> Dict[str, List[Dict[str, str]]]:
+    """Pair each video format with the preferred audio and group by resolution."""
+    formats_by_res = {
+        "8K (4320p)": [],
+        "4K (2160p)": [],
+        "1440p": [],
+        "1080p": [],
+        "720p": []
+    }
+    # Later rows with the same ID win, as in yt-dlp's own listing
+    video_formats = {rec.format_id: rec for rec in records if rec.kind == "video" and rec.res_group}
+    audio_formats = {rec.format_id: rec for rec in records if rec.kind == "audio"}
+
+    # Build format combinations (video + audio)
+    # For YouTube: Combine video with audio (251, 140, etc.)
+    # For TikTok/Instagram: Often video-only formats work (they include audio)
+    audio_priority = ["251", "140", "250", "249", "139"]
+    audio = next((audio_formats[aud_id] for aud_id in audio_priority if aud_id in audio_formats), None)
+    audio_codec = (audio.codec or "Audio") if audio else ""
+
+    for vid_id, video in video_formats.items():
+        video_codec = video.codec or "Video"
+        if audio:
+            formats_by_res[video.res_group].append({
+                "video_id": vid_id,
+                "video_codec": video_codec,
+                "audio_id": audio.format_id,
+                "audio_codec": audio_codec,
+                "audio_bitrate": audio.bitrate,
+                "format_string": f"{vid_id}+{audio.format_id}",
+                "display": f"{video_codec} • {vid_id}+{audio.format_id} ({audio_codec} {audio.bitrate}k)"
+            })
+        else:
+            # If no audio formats available (TikTok, Instagram), add video-only
+            formats_by_res[video.res_group].append({
+                "video_id": vid_id,
+                "video_codec": video_codec,
+                "audio_id": "",
+                "audio_codec": "Included",
+                "audio_bitrate": 0,
+                "format_string": vid_id,
+                "display": f"{video_codec} • {vid_id} (Audio Included)"
+            })
+
+    # Remove empty resolution groups
+    result = {k: v for k, v in formats_by_res.items() if v}
+    log.debug("Grouped %d video and %d audio formats into %d resolution group(s)",
+              len(video_formats), len(audio_formats), len(result))
+    return result
+
+
+# ----------------------------------------------------------------------
+# Format records
+# ----------------------------------------------------------------------
+# Precompiled -F classifiers. Codec tokens are ranked below, so a muxed
+# "avc1 ... mp4a" row is H264 like before.
+_CODEC_TOKEN_RE = re.compile(r"av01|bytevc1|avc|h264|vp0?9|opus|mp4a|m4a")
+_DIMENSIONS_RE = re.compile(r"(\d{3,4})x(\d{3,4})")
+_NAMED_HEIGHT_RE = re.compile(r"(\d{3,4})p")
+_KBPS_RE = re.compile(r"(\d+)k")
+_CODEC_TOKENS: Dict[str, Tuple[int, str]] = {
+    "av01": (0, "AV01"),
+    "bytevc1": (1, "ByteVC1"),
+    "avc": (2, "H264"),
+    "h264": (2, "H264"),
+    "vp9": (3, "VP9"),
+    "vp09": (3, "VP9"),
+    "opus": (4, "Opus"),
+    "mp4a": (5, "AAC"),
+    "m4a": (5, "AAC"),
+}
+
+
+class FormatRecord:
+    """One format of one video, as the selectors and filters see it.
+
+    ``kind`` is ``"video"`` (possibly with audio, see ``has_audio``),
+    ``"audio"`` (audio only) or ``""`` for rows that are neither, such as
+    storyboards. ``codec`` is the display family of the main stream and
+    ``bitrate`` is in kbps.
+    """
+
+    __slots__ = ("format_id", "kind", "codec", "height", "bitrate", "has_audio")
+
+    def __init__(
+        self,
+        format_id: str,
+        kind: str,
+        codec: str = "",
+        height: int = 0,
+        bitrate: int = 0,
+        has_audio: bool = False,
+    ) -> None:
+        self.format_id = format_id
+        self.kind = kind
+        self.codec = codec
+        self.height = height
+        self.bitrate = bitrate
+        self.has_audio = has_audio
+
+    def __repr__(self) -> str:
+        return (f"FormatRecord({self.format_id!r}, {self.kind!r}, codec={self.codec!r}, "
+                f"height={self.height}, bitrate={self.bitrate}, has_audio={self.has_audio})")
+
+    @property
+    def res_group(self) -> Optional[str]:
+        return _res_group(self.height) if self.kind == "video" else None
+
+    @classmethod
+    def from_line(cls, line: str) -> Optional["FormatRecord"]:
+        """Classify one row of ``yt-dlp -F`` output; None for blank lines."""
+        parts = line.split(None, 1)
+        if not parts:
+            return None
+        if len(parts) < 2:
+            return cls(parts[0], "")
+        low = line.lower()
+        tokens = _CODEC_TOKEN_RE.findall(low)
+        codec = min(map(_CODEC_TOKENS.__getitem__, tokens))[1] if tokens else ""
+
+        if "audio only" in low:
+            m = _KBPS_RE.search(low)
+            return cls(parts[0], "audio", codec, 0, int(m.group(1)) if m else 0)
+
+        # YouTube style "1920x1080", else TikTok/Instagram style "720p"
+        m = _DIMENSIONS_RE.search(low) or _NAMED_HEIGHT_RE.search(low)
+        if m:
+            return cls(parts[0], "video", codec, int(m.group(m.lastindex)), 0, "video only" not in low)
+        return cls(parts[0], "", codec)
+
+    @classmethod
+    def from_info(cls, fmt: Dict[str, Any]) -> Optional["FormatRecord"]:
+        """Record for one entry of a yt-dlp info dict's ``formats``."""
+        if fmt.get("format_id") is None:
+            return None
+        format_id = str(fmt["format_id"])
+        vcodec, acodec = fmt.get("vcodec"), fmt.get("acodec")
+        has_audio = acodec not in (None, "none")
+        if vcodec == "none" and has_audio:
+            return cls(format_id, "audio", _codec_family(acodec), 0, int(fmt.get("abr") or fmt.get("tbr") or 0))
+        if vcodec != "none" and fmt.get("height"):
+            return cls(format_id, "video", _codec_family(vcodec), int(fmt["height"]),
+                       int(fmt.get("tbr") or 0), has_audio)
+        return cls(format_id, "", _codec_family(vcodec) or _codec_family(acodec))
+
+
+# ----------------------------------------------------------------------
+# Format metadata (yt-dlp JSON) and bandwidth-budget selection
+# ----------------------------------------------------------------------
+# Signed stream URLs inside the JSON expire after a few hours, so cached
+# metadata is only trusted for a while.
+METADATA_TTL = 30 * 60
+
+_metadata_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_metadata_lock = threading.Lock()
+# Last yt-dlp ERROR line per URL whose extraction failed
+_metadata_errors: Dict[str, str] = {}
+
+
+def _record_metadata_error(url: str, lines: List[str]) -> None:
+    error = next((ln for ln in reversed(lines) if ln.startswith("ERROR:")), "")
+    with _metadata_lock:
+        _metadata_errors[url] = error[len("ERROR:"):].strip() or "extraction failed"
+
+
+def metadata_error(url: str) -> Optional[str]:
+    """Why the last metadata fetch for ``url`` failed, if it did."""
+    with _metadata_lock:
+        return _metadata_errors.get(url)
+
+QUALITY_FLOORS: Dict[str, int] = {
+    "Any": 0,
+    "720p": 720,
+    "1080p": 1080,
+    "1440p": 1440,
+    "4K (2160p)": 2160,
+    "8K (4320p)": 4320,
+}
+
+
+def _ytdlp_env() -> Dict[str, str]:
+    """Environment for yt-dlp child processes (bundled app aware)."""
+    env = os.environ.copy()
+    if getattr(sys, "frozen", False):
+        bundle_dir = Path(sys.executable).parent
+        resources_dir = bundle_dir.parent / "Resources"
+        env["PYTHONHOME"] = str(resources_dir)
+        env["PYTHONPATH"] = str(resources_dir / "lib" / "python3.13")
+    return env
+
+
+def _is_youtube(url: str) -> bool:
+    low = url.lower()
+    return "youtube.com" in low or "youtu.be" in low
+
+
+def fetch_format_metadata(
+    url: str, timeout: int = 60, use_cache: bool = True, cancel: Optional[CancelToken] = None
+) -> Dict[str, Any]:
+    """Return yt-dlp's JSON info dict for a single video (cached).
+
+    Unlike ``fetch_video_formats`` this keeps the real per-format metadata
+    (filesize, bitrate, codecs, protocol) so formats can be ranked.
+    Returns an empty dict on failure, timeout or cancellation.
+    """
+    now = time.time()
+    if use_cache:
+        with _metadata_lock:
+            cached = _metadata_cache.get(url)
+        if cached and now - cached[0] < METADATA_TTL:
+            return cached[1]
+
+    cmd = [YTDLP_EXE]
+    if shutil.which("node") or shutil.which("deno"):
+        cmd.extend(["--remote-components", "ejs:github"])
+    if _is_youtube(url):
+        cmd.extend(["--cookies-from-browser", "chrome"])
+    cmd.extend(extraction_args(url, "listing"))
+    cmd.extend(["-J", "--no-playlist", "--no-warnings", url])
+
+    try:
+        code, lines = run_ytdlp_capture(cmd, timeout, cancel)
+    except FetchCancelled:
+        return {}
+    except (subprocess.TimeoutExpired, OSError) as exc:
+        print(f"❌ Metadata fetch failed for {url}: {exc}")
+        return {}
+
+    # stderr is merged into the output; the JSON document is a single line
+    payload = next((ln for ln in reversed(lines) if ln.startswith("{")), "")
+    if code != 0 or not payload:
+        print(f"❌ Metadata fetch failed for {url}: {classify_error(lines)[1]}")
+        _record_metadata_error(url, lines)
+        return {}
+
+    try:
+        info = json.loads(payload)
+    except ValueError as exc:
+        print(f"❌ Could not decode metadata for {url}: {exc}")
+        return {}
+
+    with _metadata_lock:
+        _metadata_cache[url] = (time.time(), info)
+        _metadata_errors.pop(url, None)
+    return info
+
+
+# One yt-dlp invocation extracts this many URLs (one cookie load, one
+# start-up); larger batches are split so several chunks run in parallel.
+BATCH_CHUNK_SIZE = 50
+
+# "ERROR: [youtube] dQw4w9WgXcQ: Video unavailable" -> the video ID
+_BATCH_ERROR_ID_RE = re.compile(r"^ERROR: \[[^\]]+\] ([^:\s]+):")
+
+
+def _batch_owner(pending: List[str], candidates: List[Any], video_id: Optional[str] = None,
+                 text: str = "") -> Optional[str]:
+    """The pending URL a batch result or error belongs to, or None if unclear.
+
+    Tries the URLs yt-dlp reports, then a pending URL quoted in ``text``,
+    then the one pending URL containing ``video_id``. Never guesses by
+    position: yt-dlp may print several errors for one URL, or none.
+    """
+    for candidate in candidates:
+        if candidate and candidate in pending:
+            return candidate
+    if text:
+        for url in pending:
+            if url in text:
+                return url
+    if video_id:
+        matches = [url for url in pending if video_id in url]
+        if len(matches) == 1:
+            return matches[0]
+    return None
+
+
+def fetch_metadata_batch(
+    urls: List[str],
+    *,
+    timeout_per_url: int = 60,
+    use_cache: bool = True,
+    cancel: Optional[CancelToken] = None,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ``(url, info)`` for every URL as soon as yt-dlp finishes it.
+
+    All URLs go to one ``yt-dlp -j --ignore-errors`` invocation, so the
+    start-up and browser-cookie load are paid once for the whole list.
+    Cached URLs are yielded first; ``info`` is ``{}`` for URLs that
+    failed. Results and errors are matched to URLs by the URL or video ID
+    yt-dlp reports; URLs with no result when the process ends count as
+    failed. Results are stored in the metadata cache.
+    """
+    now = time.time()
+    pending: List[str] = []
+    for url in dict.fromkeys(urls):
+        cached = None
+        if use_cache:
+            with _metadata_lock:
+                cached = _metadata_cache.get(url)
+        if cached and now - cached[0] < METADATA_TTL:
+            yield url, cached[1]
+        else:
+            pending.append(url)
+    if not pending:
+        return
+
+    cmd = [YTDLP_EXE]
+    if shutil.which("node") or shutil.which("deno"):
+        cmd.extend(["--remote-components", "ejs:github"])
+    if any(_is_youtube(url) for url in pending):
+        cmd.extend(["--cookies-from-browser", "chrome"])
+    cmd.extend(extraction_args(pending, "listing"))
+    cmd.extend(["-j", "--no-playlist", "--no-warnings", "--ignore-errors", "--"])
+    cmd.extend(pending)
+
+    results: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+
+    def on_line(line: str) -> None:
+        if line.startswith("{"):
+            results.put(("info", line))
+        elif line.startswith("ERROR:"):
+            results.put(("error", line))
+
+    proc = spawn_ytdlp(cmd, on_line=on_line, timeout=timeout_per_url * len(pending),
+                       env=_ytdlp_env(), label="batch")
+    if cancel:
+        cancel.attach(proc)
+    try:
+        while pending:
+            try:
+                kind, line = results.get(timeout=0.5)
+            except queue.Empty:
+                if proc.future.done() and results.empty():
+                    break
+                continue
+            if kind == "error":
+                m = _BATCH_ERROR_ID_RE.match(line)
+                url = _batch_owner(pending, [], m.group(1) if m else None, line)
+                if url is None:
+                    # A second error for a URL already failed, or no way to tell
+                    print(f"⚠️ Unattributed metadata error: {line[len('ERROR:'):].strip()}")
+                    continue
+                print(f"❌ Metadata fetch failed for {url}: {line[len('ERROR:'):].strip()}")
+                _record_metadata_error(url, [line])
+                pending.remove(url)
+                yield url, {}
+                continue
+            try:
+                info = json.loads(line)
+            except ValueError as exc:
+                # Left pending: fails at the end unless another line claims it
+                print(f"⚠️ Could not decode a metadata line: {exc}")
+                continue
+            url = _batch_owner(pending, [info.get("original_url"), info.get("webpage_url")], info.get("id"))
+            if url is None:
+                print(f"⚠️ Metadata for {info.get('webpage_url') or info.get('id')} matched no pending URL")
+                continue
+            pending.remove(url)
+            with _metadata_lock:
+                _metadata_cache[url] = (time.time(), info)
+                _metadata_errors.pop(url, None)
+            yield url, info
+    finally:
+        if cancel:
+            cancel.detach(proc)
+        if not proc.future.done():
+            # Consumer stopped early or the window went away
+            proc.terminate(grace=0, reason="cancelled")
+    if cancel and cancel.cancelled:
+        return
+    if proc.kill_reason == "timeout":
+        print(f"⏱️ Batch metadata fetch timed out with {len(pending)} URL(s) left")
+    for url in pending:
+        _record_metadata_error(url, ["ERROR: yt-dlp returned no metadata for this URL"])
+        yield url, {}
+
+
+def fetch_metadata_many(urls: List[str], *, priority: int = PRIORITY_BULK) -> Dict[str, Dict[str, Any]]:
+    """Metadata for many URLs: batched invocations spread over the background pool."""
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    size = min(BATCH_CHUNK_SIZE, -(-len(urls) // BACKGROUND.max_workers))
+    chunks = [urls[i:i + size] for i in range(0, len(urls), size)]
+    infos: Dict[str, Dict[str, Any]] = {}
+
+    def run_chunk(chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+        return dict(fetch_metadata_batch(chunk))
+
+    for part in BACKGROUND.map(run_chunk, chunks, priority=priority):
+        infos.update(part)
+    return infos
+
+
+# Columns of the CSV export: one row per (URL, format)
+FORMAT_CSV_FIELDS = [
+    "url", "id", "title", "duration", "format_id", "ext", "resolution", "fps",
+    "vcodec", "acodec", "tbr", "abr", "filesize", "protocol", "error",
+]
+
+
+def metadata_rows(url: str, info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten one info dict into CSV rows (a single error row on failure)."""
+    if not info:
+        return [{"url": url, "error": "extraction failed"}]
+    base = {"url": url, "id": info.get("id"), "title": info.get("title"), "duration": info.get("duration")}
+    duration = info.get("duration")
+    rows = []
+    for fmt in info.get("formats") or []:
+        height = fmt.get("height")
+        rows.append(dict(
+            base,
+            format_id=fmt.get("format_id"),
+            ext=fmt.get("ext"),
+            resolution=f"{height}p" if height else ("audio only" if fmt.get("vcodec") == "none" else ""),
+            fps=fmt.get("fps"),
+            vcodec=fmt.get("vcodec"),
+            acodec=fmt.get("acodec"),
+            tbr=fmt.get("tbr"),
+            abr=fmt.get("abr"),
+            filesize=_format_filesize(fmt, duration),
+            protocol=fmt.get("protocol"),
+        ))
+    return rows or [dict(base, error="no formats")]
+
+
+def metadata_record(url: str, info: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact JSON Lines record (drops signed stream URLs and fragments)."""
+    if not info:
+        return {"url": url, "error": "extraction failed"}
+    rows = metadata_rows(url, info)
+    return {
+        "url": url,
+        "id": info.get("id"),
+        "title": info.get("title"),
+        "duration": info.get("duration"),
+        "formats": [
+            {k: v for k, v in row.items() if k not in ("url", "id", "title", "duration", "error")}
+            for row in rows if not row.get("error")
+        ],
+    }
+
+
+def format_matrix(results: List[Tuple[str, Dict[str, Any]]]) -> Tuple[List[str], List[List[str]]]:
+    """URL x resolution matrix; each cell is the best format ID at that height.
+
+    Returns ``(header, rows)``. Resolution columns run from highest to
+    lowest across the whole batch, followed by the best audio-only format.
+    """
+    best: List[Dict[str, Tuple[float, str]]] = []
+    heights = set()
+    for _, info in results:
+        cells: Dict[str, Tuple[float, str]] = {}
+        for fmt in (info or {}).get("formats") or []:
+            fid = str(fmt.get("format_id", ""))
+            tbr = fmt.get("tbr") or 0
+            if fmt.get("vcodec") not in (None, "none") and fmt.get("height"):
+                heights.add(fmt["height"])
+                key = _resolution_label(fmt["height"])
+            elif fmt.get("vcodec") == "none" and fmt.get("acodec") not in (None, "none"):
+                key = "audio"
+                tbr = fmt.get("abr") or tbr
+            else:
+                continue
+            if key not in cells or tbr > cells[key][0]:
+                cells[key] = (tbr, f"{fid} ({tbr:.0f}k)" if tbr else fid)
+        best.append(cells)
+
+    columns = list(dict.fromkeys(_resolution_label(h) for h in sorted(heights, reverse=True))) + ["audio"]
+    header = ["url", "title"] + columns
+    rows = []
+    for (url, info), cells in zip(results, best):
+        title = (info or {}).get("title") or "❌ extraction failed"
+        rows.append([url, title] + [cells[c][1] if c in cells else "" for c in columns])
+    return header, rows
+
+
+def _codec_family(codec: Optional[str]) -> str:
+    """Map a yt-dlp codec string (e.g. ``avc1.640028``) to a display family."""
+    low = (codec or "").lower()
+    if not low or low == "none":
+        return ""
+    if low.startswith("av01"):
+        return "AV01"
+    if low.startswith(("avc", "h264")):
+        return "H264"
+    if low.startswith(("vp09", "vp9")):
+        return "VP9"
+    if low.startswith(("hev", "hvc", "h265")):
+        return "HEVC"
+    if low.startswith("bytevc1"):
+        return "ByteVC1"
+    if low.startswith("opus"):
+        return "Opus"
+    if low.startswith(("mp4a", "aac")):
+        return "AAC"
+    if low.startswith("mp3"):
+        return "MP3"
+    return codec or ""
+
+
+def _format_filesize(fmt: Dict[str, Any], duration: Optional[float]) -> Optional[int]:
+    """Exact or approximate size in bytes, falling back to bitrate x duration."""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return int(size)
+    tbr = fmt.get("tbr")
+    if tbr and duration:
+        return int(tbr * 1000 / 8 * duration)
+    return None
+
+
+def _resolution_label(height: int) -> str:
+    """Resolution group label matching ``parse_video_formats``."""
+    if height >= 4320:
+        return "8K (4320p)"
+    if height >= 2160:
+        return "4K (2160p)"
+    return f"{height}p"
+
+
+def _merge_cost(video: Dict[str, Any], audio: Optional[Dict[str, Any]], target_ext: str) -> int:
+    """How much post-processing a choice needs for ``target_ext`` output.
+
+    0 = single file already in the target container (no merge)
+    1 = single file, needs a remux
+    2 = separate streams that stream-copy cleanly (e.g. mp4 + m4a)
+    3 = separate streams from mixed containers (webm into mp4 etc.)
+    """
+    if audio is None:
+        return 0 if video.get("ext") == target_ext else 1
+    if target_ext == "mp4" and video.get("ext") == "mp4" and audio.get("ext") == "m4a":
+        return 2
+    if video.get("ext") == audio.get("ext") == target_ext:
+        return 2
+    return 3
+
+
+def parse_size(text: str) -> Optional[int]:
+    """Parse a user byte budget such as ``500``, ``500 MB`` or ``1.5G`` (MB default)."""
+    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$", text or "", re.IGNORECASE)
+    if not m:
+        return None
+    unit = {"": 1024 ** 2, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}[m.group(2).lower()]
+    return int(float(m.group(1)) * unit)
+
+
+def human_size(num: Optional[float]) -> str:
+    """Format a byte count for display."""
+    if num is None:
+        return "?"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num) < 1024:
+            return f"{num:.0f} {unit}" if unit == "B" else f"{num:.1f} {unit}"
+        num /= 1024
+    return f"{num:.2f} TB"
+
+
+def rank_format_choices(
+    info: Dict[str, Any],
+    *,
+    min_height: int = 0,
+    max_bytes: Optional[int] = None,
+    prefer: str = "smallest",
+    target_ext: str = "mp4",
+) -> List[Dict[str, Any]]:
+    """Rank the real formats of one video against a quality floor and byte budget.
+
+    Candidates are progressive formats (video with audio) and video-only
+    formats paired with a few audio-only formats. ``prefer`` is either
+    ``"smallest"`` (fewest bytes meeting the floor) or ``"best"`` (highest
+    quality within the budget). Choices that need a merge or a mixed-container
+    remux are penalised slightly, so a single mp4 wins over a webm pair of
+    similar size. Candidates with unknown size are dropped when a budget is set.
+    """
+    formats = info.get("formats") or []
+    duration = info.get("duration")
+
+    videos: List[Dict[str, Any]] = []
+    audios: List[Dict[str, Any]] = []
+    for f in formats:
+        if f.get("format_id") is None or f.get("protocol") == "mhtml":
+            continue
+        has_video = f.get("vcodec") not in (None, "none")
+        has_audio = f.get("acodec") not in (None, "none")
+        if has_video and f.get("height"):
+            videos.append(f)
+        elif has_audio and not has_video:
+            audios.append(f)
+
+    # Pair every video-only stream with a handful of representative audio
+    # streams instead of the full cross product.
+    audio_pick: Dict[str, Dict[str, Any]] = {}
+    if audios:
+        by_abr = sorted(audios, key=lambda a: a.get("abr") or a.get("tbr") or 0)
+        m4a = [a for a in by_abr if a.get("ext") == "m4a"]
+        audio_pick["best"] = by_abr[-1]
+        audio_pick["smallest"] = by_abr[0]
+        if m4a:
+            audio_pick["best_m4a"] = m4a[-1]
+            audio_pick["smallest_m4a"] = m4a[0]
+
+    candidates: List[Dict[str, Any]] = []
+    for v in videos:
+        pairs: List[Optional[Dict[str, Any]]]
+        if v.get("acodec") not in (None, "none"):
+            pairs = [None]
+        else:
+            if not audio_pick:
+                continue
+            pairs = list({a["format_id"]: a for a in audio_pick.values()}.values())
+
+        v_size = _format_filesize(v, duration)
+        for a in pairs:
+            a_size = _format_filesize(a, duration) if a else 0
+            size = v_size + a_size if v_size is not None and a_size is not None else None
+            height = int(v.get("height") or 0)
+            cost = _merge_cost(v, a, target_ext)
+            vcodec = _codec_family(v.get("vcodec")) or "Video"
+            if a:
+                acodec = _codec_family(a.get("acodec")) or "Audio"
+                abr = int(a.get("abr") or a.get("tbr") or 0)
+                fmt_string = f"{v['format_id']}+{a['format_id']}"
+                display = f"{vcodec} • {fmt_string} ({acodec} {abr}k)"
+            else:
+                acodec, abr = "Included", 0
+                fmt_string = str(v["format_id"])
+                display = f"{vcodec} • {fmt_string} (Audio Included)"
+            candidates.append({
+                "resolution": _resolution_label(height),
+                "video_id": str(v["format_id"]),
+                "video_codec": vcodec,
+                "audio_id": str(a["format_id"]) if a else "",
+                "audio_codec": acodec,
+                "audio_bitrate": abr,
+                "format_string": fmt_string,
+                "height": height,
+                "fps": v.get("fps") or 0,
+                "video_tbr": v.get("tbr") or 0,
+                "tbr": (v.get("tbr") or 0) + ((a.get("tbr") or a.get("abr") or 0) if a else 0),
+                "filesize": size,
+                "merge_cost": cost,
+                "protocol": v.get("protocol", ""),
+                "display": f"{display} • {human_size(size)}",
+            })
+
+    if min_height:
+        candidates = [c for c in candidates if c["height"] >= min_height]
+    if max_bytes is not None:
+        candidates = [c for c in candidates if c["filesize"] is not None and c["filesize"] <= max_bytes]
+
+    def effective_size(c: Dict[str, Any]) -> float:
+        # A merge/remux costs disk I/O and time; count it as ~5% extra
+        # bytes per level so it only breaks near-ties.
+        if c["filesize"] is None:
+            return float("inf")
+        return c["filesize"] * (1 + 0.05 * c["merge_cost"])
+
+    if prefer == "best":
+        candidates.sort(key=lambda c: (
+            -c["height"], -c["fps"], -c["video_tbr"], c["merge_cost"], -c["tbr"], effective_size(c)
+        ))
+    else:
+        candidates.sort(key=lambda c: (effective_size(c), c["merge_cost"], -c["height"]))
+    return candidates
+
+
+def select_format_by_budget(
+    url: str,
+    *,
+    min_height: int = 0,
+    max_bytes: Optional[int] = None,
+    prefer: str = "smallest",
+    cancel: Optional[CancelToken] = None,
+) -> Optional[Dict[str, Any]]:
+    """Pick the top-ranked format for ``url`` (e.g. "smallest ≥1080p", "best under 500 MB")."""
+    info = fetch_format_metadata(url, cancel=cancel)
+    if not info:
+        return None
+    ranked = rank_format_choices(info, min_height=min_height, max_bytes=max_bytes, prefer=prefer)
+    return ranked[0] if ranked else None
+
+
+# ----------------------------------------------------------------------
+# URL validation
+# ----------------------------------------------------------------------
+URL_RE = re.compile(
+    r"^(https?://)?(www\.)?"
+    r"(youtube\.com|youtu\.be|"
+    r"facebook\.com|fb\.watch|fb\.com|"
+    r"tiktok\.com|"
+    r"instagram\.com|"
+    r"soundcloud\.com)"
+    r"/.+$"
+)
+
+
+# ----------------------------------------------------------------------
+# Bulk URL import (files / stdin) and the pending URL queue
+# ----------------------------------------------------------------------
+# Same sites as URL_RE, found anywhere in a line (CSV, exported lists...)
+_IMPORT_URL_RE = re.compile(
+    r"(?:https?://)?(?:[\w-]+\.)?"
+    r"(?:youtube\.com|youtu\.be|facebook\.com|fb\.watch|fb\.com|tiktok\.com|instagram\.com|soundcloud\.com)"
+    r"/[^\s,;\"'<>|]+",
+    re.IGNORECASE,
+)
+
+# (site, pattern capturing the media ID) for canonical-ID deduplication
+_CANONICAL_ID_RES: List[Tuple[str, re.Pattern]] = [
+    ("youtube", re.compile(r"(?:youtube\.com/(?:watch\?(?:[^#]*&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)([\w-]{11})", re.I)),
+    ("tiktok", re.compile(r"tiktok\.com/(?:@[\w.-]+/)?video/(\d+)", re.I)),
+    ("instagram", re.compile(r"instagram\.com/(?:[\w.]+/)?(?:p|reels?|tv)/([\w-]+)", re.I)),
+    ("facebook", re.compile(r"(?:facebook|fb)\.com/(?:[^?#]*/videos/(?:[\w.-]+/)?|watch/?\?v=|reel/)(\d+)", re.I)),
+]
+
+# Query parameters that never change which media a URL points to
+_TRACKING_PARAMS = ("utm_", "si=", "feature=", "fbclid=", "igshid=", "ref=")
+_HOST_SPLIT_RE = re.compile(r"([^/?]*)(.*)", re.S)
+
+
+def canonical_id(url: str) -> str:
+    """Site-specific media ID used to spot the same video under different URLs.
+
+    ``youtu.be/X``, ``youtube.com/watch?v=X&t=1`` and ``/shorts/X`` all map
+    to ``youtube:X``. Other URLs fall back to a normalised form (no scheme,
+    ``www.``/``m.``, fragment, tracking parameters or trailing slash). Only
+    the host is lowercased: paths and queries carry case-sensitive IDs
+    (``fb.watch/AbC``, ``list=PLx``).
+    """
+    for site, pattern in _CANONICAL_ID_RES:
+        m = pattern.search(url)
+        if m:
+            return f"{site}:{m.group(1)}"
+    rest = url.split("#", 1)[0].split("://", 1)[-1]
+    host, tail = _HOST_SPLIT_RE.match(rest).groups()
+    host = host.lower()
+    if host.startswith(("www.", "m.")):
+        host = host.split(".", 1)[1]
+    path, _, query = (host + tail).partition("?")
+    params = [p for p in query.split("&") if p and not p.lower().startswith(_TRACKING_PARAMS)]
+    return path.rstrip("/") + ("?" + "&".join(params) if params else "")
+
+
+class UrlImport:
+    """Outcome of importing a URL list: new URLs plus what was skipped."""
+
+    # Malformed lines quoted in the summary
+    MAX_SAMPLES = 5
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.urls: List[str] = []
+        self.lines = 0
+        self.duplicates = 0
+        self.malformed = 0
+        self.samples: List[Tuple[int, str]] = []   # (line number, text)
+        self.seconds = 0.0
+
+    def summary(self) -> str:
+        parts = [f"📥 Imported {len(self.urls)} URL(s) from {self.source} "
+                 f"({self.lines} lines, {self.seconds:.2f}s)"]
+        if self.duplicates:
+            parts.append(f"   ♊ {self.duplicates} duplicate(s) skipped")
+        if self.malformed:
+            parts.append(f"   ⚠️ {self.malformed} line(s) without a supported URL, e.g.:")
+            parts.extend(f"      line {n}: {text[:80]}" for n, text in self.samples)
+        return "\n".join(parts)
+
+
+def import_urls(lines: Any, source: str = "input", seen: Optional[set] = None) -> UrlImport:
+    """Stream ``lines`` (any iterable, e.g. an open file) into a ``UrlImport``.
+
+    Blank lines and ``#`` comments are ignored; every supported URL in a
+    line is taken. ``seen`` holds canonical IDs already queued and is
+    updated in place, so repeated imports stay duplicate-free; background
+    imports pass a copy and the queue dedupes again on the Tk thread.
+    """
+    started = time.perf_counter()
+    result = UrlImport(source)
+    seen = set() if seen is None else seen
+    findall = _IMPORT_URL_RE.findall
+    number = 0
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        found = findall(line)
+        if not found:
+            result.malformed += 1
+            if len(result.samples) < UrlImport.MAX_SAMPLES:
+                result.samples.append((number, line))
+            continue
+        for url in found:
+            key = canonical_id(url)
+            if key in seen:
+                result.duplicates += 1
+                continue
+            seen.add(key)
+            result.urls.append(url if "://" in url else "https://" + url)
+    result.lines = number
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def import_url_file(path: "str | Path", seen: Optional[set] = None) -> UrlImport:
+    """Import URLs from a text/CSV file, or from stdin when ``path`` is ``-``."""
+    if str(path) == "-":
+        return import_urls(sys.stdin, "stdin", seen)
+    with open(path, "r", encoding="utf-8", errors="replace") as fh:
+        return import_urls(fh, Path(path).name, seen)
+
+
+class UrlQueue:
+    """Pending URLs of one tab, kept apart from the log widget.
+
+    Typed URLs come from the tab's URL box (replaced on every edit) and
+    imported ones are appended by file/stdin imports. The merged,
+    duplicate-free list is rebuilt only when either side changes, so
+    reading the queue or its current selection never depends on how long
+    the session's log has grown.
+    """
+
+    def __init__(self) -> None:
+        self._typed: List[Tuple[str, str]] = []      # (canonical id, url)
+        self._imported: List[Tuple[str, str]] = []
+        # Canonical IDs of imported URLs; imports dedupe against it
+        self.imported_ids: set = set()
+        self._merged: List[str] = []
+        self._keys: set = set()
+        self._selected: Optional[Tuple[str, str]] = None
+        self.last_input: Optional[UrlImport] = None
+
+    def __len__(self) -> int:
+        return len(self._merged)
+
+    def set_typed(self, lines: Any) -> UrlImport:
+        """Replace the typed URLs with those found in ``lines``."""
+        result = import_urls(lines, "URL box")
+        self._typed = [(canonical_id(url), url) for url in result.urls]
+        self.last_input = result
+        self._rebuild()
+        return result
+
+    def add_imported(self, result: UrlImport) -> None:
+        """Queue an import's URLs (Tk thread).
+
+        The import ran against a snapshot of ``imported_ids``; URLs queued
+        by another import since then are dropped here as duplicates.
+        """
+        fresh: List[Tuple[str, str]] = []
+        for url in result.urls:
+            key = canonical_id(url)
+            if key in self.imported_ids:
+                result.duplicates += 1
+                continue
+            self.imported_ids.add(key)
+            fresh.append((key, url))
+        result.urls = [url for _, url in fresh]
+        self._imported.extend(fresh)
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        typed_keys = {key for key, _ in self._typed}
+        merged = [url for _, url in self._typed]
+        merged.extend(url for key, url in self._imported if key not in typed_keys)
+        self._merged = merged
+        self._keys = typed_keys | {key for key, _ in self._imported}
+
+    def select(self, url: Optional[str]) -> None:
+        self._selected = (canonical_id(url), url) if url else None
+
+    def current(self) -> Optional[str]:
+        """The selected URL if it is still queued, else the first one."""
+        if self._selected and self._selected[0] in self._keys:
+            return self._selected[1]
+        return self._merged[0] if self._merged else None
+
+    def urls(self) -> List[str]:
+        return list(self._merged)
+
+    def take(self) -> List[str]:
+        """Hand every queued URL to a batch.
+
+        Imported URLs are consumed; typed ones stay, as they are still in
+        the URL box.
+        """
+        urls = self._merged
+        self._imported = []
+        self.imported_ids = set()
+        self._rebuild()
+        return urls
+
+
+# ----------------------------------------------------------------------
+# Speculative metadata prefetch
+# ----------------------------------------------------------------------
+# Below bulk planning: prefetch is pure speculation
+PRIORITY_PREFETCH = 20
+
+PREFETCH_SETTINGS: Dict[str, Any] = {
+    "enabled": True,
+    "debounce_ms": 800,     # quiet time after the last keystroke/paste
+    "max_urls": 200,        # per pass; the rest is picked up on the next edit
+    "retry_after": 300,     # s before a URL that failed is tried again
+    "join_timeout": 90,     # s a user action waits for a running prefetch of its URLs
+}
+
+# The prefetched JSON is handed to the download (--load-info-json) only
+# while its signed stream URLs are safely valid.
+PREFETCH_REUSE_TTL = 20 * 60
+_INFO_JSON_DIR = Path(tempfile.gettempdir()) / "kexis-info-json"
+
+
+class MetadataPrefetcher:
+    """Resolves pasted URLs into the metadata cache before the user acts.
+
+    ``schedule`` is cheap and idempotent: URLs that are cached, in flight
+    or recently failed are skipped, and the rest are fetched in batches on
+    a single worker of its own, so speculative work never occupies the
+    ``BACKGROUND`` pool that the Smart Selector and batch planning use.
+    Those call ``wait_for`` first: a URL whose batch is already running is
+    awaited instead of extracted a second time.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: set = set()
+        self._failed: Dict[str, float] = {}
+        self._running: Dict[str, Future] = {}  # URLs of the batch being fetched
+        self._executor = BackgroundExecutor(max_workers=1)
+
+    def schedule(self, urls: List[str]) -> int:
+        """Queue metadata fetches for ``urls``; returns how many were new."""
+        if not PREFETCH_SETTINGS["enabled"]:
+            return 0
+        now = time.time()
+        with self._lock:
+            new = [
+                url for url in dict.fromkeys(urls)
+                if url not in self._inflight
+                and now - self._failed.get(url, 0) > PREFETCH_SETTINGS["retry_after"]
+                and cached_format_metadata(url) is None
+            ][:PREFETCH_SETTINGS["max_urls"]]
+            self._inflight.update(new)
+
+        for i in range(0, len(new), BATCH_CHUNK_SIZE):
+            self._executor.submit(self._fetch, new[i:i + BATCH_CHUNK_SIZE], priority=PRIORITY_PREFETCH,
+                                  label="prefetch")
+        return len(new)
+
+    def wait_for(self, urls: List[str], timeout: Optional[float] = None) -> None:
+        """Block until the running prefetch batch has finished ``urls``.
+
+        URLs still queued are not waited for: the caller fetches them, and
+        the prefetch skips them later as they are cached by then.
+        """
+        with self._lock:
+            futures = [self._running[url] for url in urls if url in self._running]
+        if futures:
+            wait_futures(futures, timeout if timeout is not None else PREFETCH_SETTINGS["join_timeout"])
+
+    def _fetch(self, urls: List[str]) -> None:
+        waiters = {url: Future() for url in urls}
+        with self._lock:
+            self._running.update(waiters)
+        try:
+            for url, info in fetch_metadata_batch(urls):
+                with self._lock:
+                    self._inflight.discard(url)
+                    self._running.pop(url, None)
+                    if not info:
+                        self._failed[url] = time.time()
+                waiters[url].set_result(bool(info))
+        finally:
+            with self._lock:
+                self._inflight.difference_update(urls)
+                for url in urls:
+                    self._running.pop(url, None)
+            for waiter in waiters.values():
+                if not waiter.done():
+                    waiter.set_result(False)
+
+
+PREFETCHER = MetadataPrefetcher()
+
+
+def with_prefetched_info(cmd: List[str], url: str) -> List[str]:
+    """Swap ``url`` for ``--load-info-json`` when fresh metadata is cached.
+
+    yt-dlp then skips extraction and goes straight to format selection
+    and the download.
+    """
+    with _metadata_lock:
+        cached = _metadata_cache.get(url)
+    if not cached or time.time() - cached[0] > PREFETCH_REUSE_TTL or url not in cmd:
+        return cmd
+    try:
+        _INFO_JSON_DIR.mkdir(parents=True, exist_ok=True)
+        # One file per job, as two jobs for the same URL may run at once
+        fd, name = tempfile.mkstemp(
+            prefix=hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + "-", suffix=".info.json",
+            dir=_INFO_JSON_DIR,
+        )
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(cached[1], fh)
+    except (OSError, TypeError, ValueError):
+        return cmd
+    i = len(cmd) - 1 - cmd[::-1].index(url)
+    return cmd[:i] + ["--load-info-json", name] + cmd[i + 1:]
+
+
+def discard_prefetched_info(cmd: List[str]) -> None:
+    """Delete the info JSON ``with_prefetched_info`` wrote for ``cmd``."""
+    if "--load-info-json" not in cmd:
+        return
+    path = Path(cmd[cmd.index("--load-info-json") + 1])
+    if path.parent == _INFO_JSON_DIR:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def live_extraction_cmd(cmd: List[str], url: str) -> List[str]:
+    """Undo ``with_prefetched_info`` so yt-dlp extracts ``url`` again."""
+    if "--load-info-json" not in cmd:
+        return cmd
+    i = cmd.index("--load-info-json")
+    return cmd[:i] + [url] + cmd[i + 2:]
+
+
+# ----------------------------------------------------------------------
+# Download acceleration profiles
+# ----------------------------------------------------------------------
+# Per platform, per stream protocol family ("http" = single progressive
+# file, "dash"/"m3u8" = fragmented streams). Keys:
+#   concurrent_fragments  -> --concurrent-fragments (fragmented streams)
+#   http_chunk_size       -> --http-chunk-size (native http downloader)
+#   downloader            -> "aria2c" / "ffmpeg" / "native"
+# External downloaders are only used when they are installed.
+ACCEL_PROFILES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "YouTube": {
+        # googlevideo caps the speed of a single long request; ranged
+        # 10M chunks (or aria2c's split connections) keep it at full speed.
+        "http": {"http_chunk_size": "10M", "downloader": "aria2c"},
+        "dash": {"concurrent_fragments": 4},
+        "m3u8": {"concurrent_fragments": 4},
+    },
+    "TikTok": {
+        "http": {"downloader": "aria2c"},
+    },
+    "Facebook": {
+        "http": {"downloader": "aria2c"},
+        "dash": {"concurrent_fragments": 8},
+    },
+    "Instagram": {
+        "http": {"downloader": "aria2c"},
+        "dash": {"concurrent_fragments": 6},
+    },
+    "SoundCloud": {
+        "http": {},
+        "m3u8": {"concurrent_fragments": 8},
+    },
+    "Video": {
+        "http": {"downloader": "aria2c"},
+        "dash": {"concurrent_fragments": 4},
+        "m3u8": {"concurrent_fragments": 4},
+    },
+}
+
+ARIA2C_ARGS = "-x 8 -s 8 -k 1M --file-allocation=none"
+
+
+def cached_format_metadata(url: str) -> Optional[Dict[str, Any]]:
+    """Return fresh cached metadata for ``url`` without fetching."""
+    with _metadata_lock:
+        cached = _metadata_cache.get(url)
+    if cached and time.time() - cached[0] < METADATA_TTL:
+        return cached[1]
+    return None
+
+
+def _protocol_family(protocol: Optional[str]) -> str:
+    """Map a yt-dlp protocol name to "http", "dash" or "m3u8"."""
+    low = (protocol or "").lower()
+    if "m3u8" in low:
+        return "m3u8"
+    if "dash" in low or "ism" in low:
+        return "dash"
+    return "http"
+
+
+def stream_protocols(url: str, format_ids: Optional[List[str]] = None) -> List[str]:
+    """Protocol families the download will use, from cached metadata (may be empty)."""
+    info = cached_format_metadata(url)
+    if not info:
+        return []
+    if format_ids:
+        by_id = {str(f.get("format_id")): f for f in info.get("formats") or []}
+        found = [by_id[i] for i in format_ids if i in by_id]
+        if found:
+            return sorted({_protocol_family(f.get("protocol")) for f in found})
+    if info.get("protocol"):
+        return sorted({_protocol_family(p) for p in str(info["protocol"]).split("+")})
+    return []
+
+
+def build_accel_args(url: str, format_ids: Optional[List[str]] = None) -> List[str]:
+    """yt-dlp arguments for the acceleration profile of ``url``'s platform.
+
+    When the stream protocols are known (cached metadata) only the matching
+    protocol entries are applied; otherwise all entries are, with the
+    external downloader scoped by protocol prefix so yt-dlp applies it only
+    to matching streams.
+    """
+    platform = detect_platform(url)
+    profile = ACCEL_PROFILES.get(platform, ACCEL_PROFILES["Video"])
+    protocols = stream_protocols(url, format_ids) or list(profile)
+    info = cached_format_metadata(url) or {}
+
+    args: List[str] = []
+    fragments = max((profile.get(p, {}).get("concurrent_fragments", 1) for p in protocols), default=1)
+    if info.get("is_live"):
+        # Live HLS cannot be fetched ahead of the live edge
+        fragments = 1
+    if fragments > 1:
+        args.extend(["--concurrent-fragments", str(fragments)])
+
+    has_aria2c = bool(shutil.which("aria2c"))
+    use_aria2c = False
+    for proto in protocols:
+        settings = profile.get(proto, {})
+        downloader = settings.get("downloader", "native")
+        if info.get("is_live") and proto == "m3u8":
+            downloader = "ffmpeg"
+        if downloader == "aria2c" and not has_aria2c:
+            downloader = "native"
+        if downloader != "native":
+            args.extend(["--downloader", f"{proto}:{downloader}"])
+            use_aria2c = use_aria2c or downloader == "aria2c"
+        if proto == "http" and downloader == "native" and settings.get("http_chunk_size"):
+            args.extend(["--http-chunk-size", settings["http_chunk_size"]])
+
+    if use_aria2c:
+        args.extend(["--downloader-args", f"aria2c:{ARIA2C_ARGS}"])
+    return args
+
+
+# ----------------------------------------------------------------------
+# Throughput measurement
+# ----------------------------------------------------------------------
+_SPEED_RE = re.compile(r"\bat\s+~?\s*([\d.]+)\s*([KMGT]?i?B)/s")
+_SIZE_UNITS = {
+    "B": 1,
+    "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "TiB": 1024 ** 4,
+    "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4,
+}
+
+
+def parse_speed(line: str) -> Optional[float]:
+    """Return bytes/s from a yt-dlp ``[download] ... at 2.35MiB/s`` line."""
+    m = _SPEED_RE.search(line)
+    if not m:
+        return None
+    unit = _SIZE_UNITS.get(m.group(2))
+    if unit is None:
+        return None
+    try:
+        return float(m.group(1)) * unit
+    except ValueError:
+        return None
+
+
+class ThroughputMeter:
+    """Exponentially weighted aggregate download speed, fed from progress lines.
+
+    Every running job reports its own speed; the meter smooths their sum,
+    i.e. what all parallel downloads achieved together.
+    """
+
+    def __init__(self, alpha: float = 0.2) -> None:
+        self.alpha = alpha
+        self._rate: Optional[float] = None
+        self._jobs: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def update(self, job: int, bytes_per_sec: float) -> None:
+        with self._lock:
+            self._jobs[job] = bytes_per_sec
+            total = sum(self._jobs.values())
+            if self._rate is None:
+                self._rate = total
+            else:
+                self._rate += self.alpha * (total - self._rate)
+
+    def job_finished(self, job: int) -> None:
+        with self._lock:
+            self._jobs.pop(job, None)
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Smoothed aggregate bytes/s, or None if nothing has been measured yet."""
+        with self._lock:
+            return self._rate
+
+
+THROUGHPUT = ThroughputMeter()
+
+
+# ----------------------------------------------------------------------
+# Download scheduler (bandwidth limits and per-host job caps)
+# ----------------------------------------------------------------------
+DEFAULT_HOST_MAX_JOBS: Dict[str, int] = {
+    "YouTube": 3,
+    "TikTok": 3,
+    "Facebook": 3,
+    "Instagram": 2,
+    "SoundCloud": 4,
+}
+DEFAULT_MAX_TOTAL_JOBS = 6
+
+# Upper bound on job lanes per DownloadWorker; the scheduler decides how
+# many of them actually run.
+MAX_WORKER_LANES = 16
+
+
+def host_key(url: str) -> str:
+    """Scheduling key for ``url``: the platform, or the hostname for others."""
+    platform = detect_platform(url)
+    if platform != "Video":
+        return platform
+    netloc = urlparse(url if "://" in url else f"https://{url}").netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc or "Video"
+
+
+# Adaptive parallelism: seconds between control steps, and the job cap a
+# host starts from before probing upwards
+AUTOTUNE_INTERVAL = 15.0
+AUTOTUNE_START_JOBS = 2
+
+
+class ConcurrencyTuner:
+    """AIMD control of the number of running jobs per host.
+
+    A host starts at ``AUTOTUNE_START_JOBS`` parallel jobs. Every
+    ``interval`` seconds, per host: any throttling error (the
+    ``classify_error`` "throttled" category) halves the job cap
+    (multiplicative decrease) and holds it for a few intervals. Otherwise,
+    while jobs are queued for the host and every slot is busy, the cap
+    grows by one (additive increase). Once the extra job is running, the
+    increase is kept only if it raised the host's aggregate throughput by
+    at least 5%; otherwise it is undone and held, so the cap hovers around
+    the smallest parallelism that saturates the link. The user's per-host
+    job cap is a hard ceiling: the tuner never runs more jobs than that,
+    it only finds out whether fewer are enough.
+    """
+
+    def __init__(self, scheduler: "DownloadScheduler", interval: float = AUTOTUNE_INTERVAL) -> None:
+        self.scheduler = scheduler
+        self.interval = interval
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._speeds: Dict[str, Dict[int, float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def report_speed(self, host: str, job: int, bytes_per_sec: float) -> None:
+        with self._lock:
+            self._speeds.setdefault(host, {})[job] = bytes_per_sec
+
+    def report_error(self, host: str) -> None:
+        with self._lock:
+            self._errors[host] = self._errors.get(host, 0) + 1
+
+    def job_finished(self, host: str, job: int) -> None:
+        with self._lock:
+            self._speeds.get(host, {}).pop(job, None)
+
+    def limit_for(self, host: str) -> Optional[int]:
+        """Current tuned cap for ``host`` (None when tuning is off).
+
+        Hosts without a control state yet start at ``AUTOTUNE_START_JOBS``.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            state = self._state.get(host)
+            return state["limit"] if state else AUTOTUNE_START_JOBS
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.tick()
+            except Exception as exc:
+                print(f"⚠️ Concurrency tuner error: {exc}")
+
+    def tick(self) -> None:
+        """Run one control step for every host with activity."""
+        if not self.enabled:
+            return
+        with self._lock:
+            hosts = set(self._speeds) | set(self._errors) | set(self._state)
+        demand = {h: (self.scheduler.waiting_jobs(h), self.scheduler.active_jobs(h)) for h in hosts}
+        ceilings = {h: self.scheduler.host_cap(h) for h in hosts}
+
+        changed = False
+        with self._lock:
+            for host in hosts:
+                waiting, active = demand[host]
+                ceiling = ceilings[host]
+                rate = sum(self._speeds.get(host, {}).values())
+                errors = self._errors.pop(host, 0)
+                # A new host starts low and probes upwards
+                state = self._state.setdefault(
+                    host, {"limit": min(AUTOTUNE_START_JOBS, ceiling), "base_rate": 0.0, "probing": False, "hold": 0}
+                )
+                old = state["limit"]
+
+                if errors:
+                    state["limit"] = max(1, state["limit"] // 2)
+                    state["probing"] = False
+                    state["hold"] = 3
+                elif state["hold"] > 0:
+                    state["hold"] -= 1
+                elif state["probing"] and waiting and active < state["limit"]:
+                    pass  # judge the increase only once its extra job is running
+                elif state["probing"]:
+                    state["probing"] = False
+                    if rate < state["base_rate"] * 1.05:
+                        state["limit"] = max(1, state["limit"] - 1)
+                        state["hold"] = 6
+                elif waiting and active >= state["limit"] and state["limit"] < ceiling:
+                    state["base_rate"] = rate
+                    state["limit"] += 1
+                    state["probing"] = True
+
+                state["limit"] = min(state["limit"], ceiling)
+                if state["limit"] != old:
+                    changed = True
+                    print(f"🎛️ {host}: parallel jobs {old} → {state['limit']} "
+                          f"({human_size(rate)}/s, {errors} error(s))")
+
+                # Forget idle hosts so the next batch starts fresh
+                if not active and not waiting and not errors:
+                    self._state.pop(host, None)
+                    self._speeds.pop(host, None)
+
+        if changed:
+            self.scheduler.wake()
+
+
+class DownloadScheduler:
+    """Process-wide admission control for download jobs from both tabs.
+
+    Caps the number of running jobs globally and per host (further narrowed
+    by ``ConcurrencyTuner`` when auto-tuning is on), holds hosts that are
+    cooling down after a 429, and splits the
+    global / per-host bandwidth caps into fixed per-slot ``--limit-rate``
+    shares (cap / job slots), so the running processes together never
+    exceed a cap however their start times interleave. All limits can be
+    changed while jobs run: job caps take effect immediately, rate caps at
+    the next process launch.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self.global_limit = 0  # bytes/s, 0 = unlimited
+        self.max_total_jobs = DEFAULT_MAX_TOTAL_JOBS
+        self.host_limits: Dict[str, int] = {}
+        self.host_max_jobs: Dict[str, int] = dict(DEFAULT_HOST_MAX_JOBS)
+        self._active: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+        self._cooldown_until: Dict[str, float] = {}
+        self.tuner = ConcurrencyTuner(self)
+
+    def host_cap(self, host: str) -> int:
+        """User-configured job cap for ``host``."""
+        return min(self.host_max_jobs.get(host, self.max_total_jobs), self.max_total_jobs)
+
+    def _has_room(self, host: str) -> bool:
+        if time.time() < self._cooldown_until.get(host, 0):
+            return False
+        if sum(self._active.values()) >= self.max_total_jobs:
+            return False
+        cap = self.host_cap(host)
+        tuned = self.tuner.limit_for(host)
+        if tuned is not None:
+            cap = min(cap, tuned)
+        return self._active.get(host, 0) < cap
+
+    def acquire(self, url: str, should_stop: Optional[Any] = None) -> Optional[str]:
+        """Block until ``url``'s host has a free slot; return the host key.
+
+        Returns None if ``should_stop()`` becomes true while waiting.
+        """
+        host = host_key(url)
+        self.tuner.start()
+        with self._cond:
+            self._waiting[host] = self._waiting.get(host, 0) + 1
+            try:
+                while not self._has_room(host):
+                    if should_stop and should_stop():
+                        return None
+                    self._cond.wait(0.5)
+            finally:
+                self._waiting[host] -= 1
+            self._active[host] = self._active.get(host, 0) + 1
+        return host
+
+    def release(self, host: str) -> None:
+        with self._cond:
+            self._active[host] = max(self._active.get(host, 0) - 1, 0)
+            self._cond.notify_all()
+
+    def configure(
+        self,
+        *,
+        global_limit: Optional[int] = None,
+        max_total_jobs: Optional[int] = None,
+        host_limits: Optional[Dict[str, int]] = None,
+        host_max_jobs: Optional[Dict[str, int]] = None,
+    ) -> None:
+        """Update limits live; waiting jobs are re-checked immediately."""
+        with self._cond:
+            if global_limit is not None:
+                self.global_limit = max(global_limit, 0)
+            if max_total_jobs is not None:
+                self.max_total_jobs = max(max_total_jobs, 1)
+            if host_limits is not None:
+                self.host_limits = {h: v for h, v in host_limits.items() if v > 0}
+            if host_max_jobs is not None:
+                self.host_max_jobs.update({h: max(v, 1) for h, v in host_max_jobs.items()})
+            self._cond.notify_all()
+
+    def cool_down(self, host: str, seconds: float) -> None:
+        """Stop starting work on ``host`` for ``seconds`` (all jobs, both tabs)."""
+        with self._cond:
+            until = time.time() + seconds
+            if until > self._cooldown_until.get(host, 0):
+                self._cooldown_until[host] = until
+                print(f"🧊 {host}: cooling down for {seconds:.0f}s")
+
+    def cooldown_remaining(self, host: str) -> float:
+        with self._cond:
+            return max(self._cooldown_until.get(host, 0) - time.time(), 0.0)
+
+    def wait_cooldown(self, host: str, minimum: float = 0.0, should_stop: Optional[Any] = None) -> bool:
+        """Sleep for ``minimum`` seconds and until ``host``'s cool-down ends.
+
+        Returns False if ``should_stop()`` became true while waiting.
+        """
+        deadline = time.time() + minimum
+        while time.time() < deadline or self.cooldown_remaining(host) > 0:
+            if should_stop and should_stop():
+                return False
+            time.sleep(0.25)
+        return True
+
+    def wake(self) -> None:
+        """Re-check waiting jobs (after a tuned cap changed)."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def waiting_jobs(self, host: str) -> int:
+        with self._cond:
+            return self._waiting.get(host, 0)
+
+    def active_jobs(self, host: Optional[str] = None) -> int:
+        with self._cond:
+            if host is None:
+                return sum(self._active.values())
+            return self._active.get(host, 0)
+
+    def rate_limit_for(self, url: str) -> Optional[int]:
+        """Bytes/s share for a process about to start for ``url`` (None = unlimited).
+
+        ``--limit-rate`` is fixed for a process's lifetime, so each job gets
+        the share of one job slot rather than of the jobs running right now.
+        """
+        host = host_key(url)
+        with self._cond:
+            shares: List[float] = []
+            if self.global_limit:
+                shares.append(self.global_limit / self.max_total_jobs)
+            host_limit = self.host_limits.get(host)
+            if host_limit:
+                shares.append(host_limit / self.host_cap(host))
+        if not shares:
+            return None
+        # yt-dlp needs a sane minimum or it spends its time sleeping
+        return max(int(min(shares)), 32 * 1024)
+
+
+SCHEDULER = DownloadScheduler()
+
+
+# ----------------------------------------------------------------------
+# Error classification and retry policy
+# ----------------------------------------------------------------------
+# Checked in order; the first category with a matching line wins.
+# "permanent" means no retry and no fallback, so it only matches yt-dlp's
+# extractor messages for content that is really gone, never a bare HTTP
+# status that a fragment or CDN request can also return.
+ERROR_PATTERNS: List[Tuple[str, re.Pattern]] = [
+    # YouTube's soft block reuses "Video unavailable"; it must win over permanent
+    ("throttled", re.compile(r"try again later", re.IGNORECASE)),
+    ("permanent", re.compile(
+        r"\bPrivate video\b|\] [^:\s]+: Video unavailable"
+        r"|This video (?:has been removed|is no longer available)"
+        r"|not (?:made )?available in your country|geo[- ]?restrict|blocked it in your country"
+        r"|account (?:has been|associated with this video has been) terminated|copyright claim"
+        r"|Unsupported URL|\] [^:\s]+: Unable to download (?:webpage|JSON metadata|API JSON): HTTP Error 4(?:04|10)"
+        r"|(?:video|post|track) (?:has been|was) deleted",
+        re.IGNORECASE,
+    )),
+    ("auth", re.compile(
+        r"Sign in to confirm|login required|log in|requires authentication|members[- ]only"
+        r"|age[- ]restricted|inappropriate for some users|HTTP Error 401|cookies are no longer valid"
+        r"|could not (?:find|copy) .* cookie|failed to decrypt",
+        re.IGNORECASE,
+    )),
+    ("throttled", re.compile(r"HTTP Error 429|Too Many Requests|rate[- ]limit", re.IGNORECASE)),
+    ("transient", re.compile(
+        r"Premieres in|live event will begin|HTTP Error 404"
+        r"|timed? ?out|Connection (?:reset|refused|aborted)|Temporary failure in name resolution"
+        r"|Remote end closed|IncompleteRead|HTTP Error 5\d\d|Network is unreachable|Read timed out"
+        r"|SSL: |EOF occurred",
+        re.IGNORECASE,
+    )),
+]
+
+RETRY_POLICIES: Dict[str, Dict[str, Any]] = {
+    # Removed / private / geo-blocked: no retry or fallback can fix it
+    "permanent": {"retries": 0, "base_delay": 0, "max_delay": 0, "fallbacks": False, "host_cooldown": False},
+    # Login / cookie problems: retry with another cookie source only
+    "auth": {"retries": 2, "base_delay": 0, "max_delay": 0, "fallbacks": False, "host_cooldown": False},
+    # HTTP 429: back the whole host off, then retry the same command
+    "throttled": {"retries": 2, "base_delay": 30, "max_delay": 300, "fallbacks": False, "host_cooldown": True},
+    # Network hiccups: quick retries before the fallback chain
+    "transient": {"retries": 2, "base_delay": 2, "max_delay": 30, "fallbacks": True, "host_cooldown": False},
+    # Anything else (format, merge, HLS quirks): the fallback chain
+    "unknown": {"retries": 0, "base_delay": 1, "max_delay": 10, "fallbacks": True, "host_cooldown": False},
+}
+
+COOKIE_BROWSERS = ["chrome", "safari", "firefox", "edge"]
+
+# Lines of output kept per attempt for classification
+ERROR_TAIL_LINES = 60
+
+
+def classify_error(lines: Any) -> Tuple[str, str]:
+    """Classify yt-dlp output into (category, reason).
+
+    ``ERROR:`` lines are checked first, then the remaining output, so a
+    harmless earlier warning does not decide the category.
+    """
+    lines = [ln for ln in lines if ln]
+    errors = [ln for ln in lines if "ERROR" in ln]
+    reason = errors[-1].split("ERROR:", 1)[-1].strip() if errors else (lines[-1].strip() if lines else "")
+    for candidates in (errors, lines):
+        for category, pattern in ERROR_PATTERNS:
+            if any(pattern.search(ln) for ln in candidates):
+                return category, reason
+    return "unknown", reason
+
+
+def backoff_delay(policy: Dict[str, Any], attempt: int) -> float:
+    """Exponential backoff with equal jitter for ``attempt`` (0-based)."""
+    ceiling = min(policy["max_delay"], policy["base_delay"] * (2 ** attempt))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+def alternate_cookie_cmd(cmd: List[str], tried: List[str]) -> Optional[List[str]]:
+    """Copy of ``cmd`` using the next untried browser's cookies (None if exhausted)."""
+    new = list(cmd)
+    current = None
+    for flag in ("--cookies-from-browser", "--cookies"):
+        if flag in new:
+            idx = new.index(flag)
+            current = new[idx + 1] if flag == "--cookies-from-browser" else "file"
+            del new[idx:idx + 2]
+    if current and current not in tried:
+        tried.append(current)
+    for browser in COOKIE_BROWSERS:
+        if browser not in tried:
+            tried.append(browser)
+            return new[:1] + ["--cookies-from-browser", browser] + new[1:]
+    return None
+
+
+# ----------------------------------------------------------------------
+# Stall watchdog
+# ----------------------------------------------------------------------
+WATCHDOG_SETTINGS: Dict[str, Any] = {
+    "stall_timeout": 60,          # s without progress while downloading
+    "startup_timeout": 180,       # s without any output before the first progress line
+    "speed_floor": 100 * 1024,    # bytes/s, 0 disables the floor
+    "floor_window": 60,           # s the speed must stay below the floor
+    "max_restarts": 3,
+    "switch_client": True,        # YouTube: try another player client on restart
+}
 
+# YouTube player clients tried in turn when a restart switches clients
+WATCHDOG_CLIENTS = ["web_safari", "tv", "mweb", "android"]
 
-def parse_video_formats(output: str) -> Dict[str, List[Dict[str, str]]]:
-    """Parse yt-dlp -F output into grouped format dictionary (all platforms)."""
-    lines = output.split("\n")
-    
-    # Debug: print output
-    print(f"DEBUG: Parsing {len(lines)} lines")
-    
-    # Find header line
-    start = -1
-    for i, line in enumerate(lines):
-        if "ID" in line and ("EXT" in line or "RESOLUTION" in line):
-            start = i
-            print(f"DEBUG: Found header at line {i}: {line}")
-            break
-    
-    if start == -1:
-        print("DEBUG: No header found in output")
-        return {}
-    
-    # Group formats by resolution
-    formats_by_res = {
-        "8K (4320p)": [],
-        "4K (2160p)": [],
-        "1440p": [],
-        "1080p": [],
-        "720p": []
-    }
-    
-    video_formats = {}  # format_id -> format_info
-    audio_formats = {}  # format_id -> format_info
-    
-    # Parse all formats
-    for line in lines[start + 2:]:
-        if not line.strip():
-            continue
-        
-        parts = line.split()
-        if len(parts) < 2:
-            continue
-        
-        format_id = parts[0]
-        low = line.lower()
-        
-        # Extract codec (look for common patterns)
-        codec = ""
-        if "av01" in low:
-            codec = "AV01"
-        elif "bytevc1" in low:
-            codec = "ByteVC1"
-        elif "avc" in low or "h264" in low:
-            codec = "H264"
-        elif "vp9" in low or "vp09" in low:
-            codec = "VP9"
-        elif "opus" in low:
-            codec = "Opus"
-        elif "m4a" in low or "mp4a" in low:
-            codec = "AAC"
-        
-        # Check if audio
-        if "audio only" in low:
-            bitrate = 0
-            m = re.search(r"(\d+)k", low)
-            if m:
-                bitrate = int(m.group(1))
-            
-            audio_formats[format_id] = {
-                "id": format_id,
-                "codec": codec if codec else "Audio",
-                "bitrate": bitrate,
-                "line": line
-            }
-            print(f"DEBUG: Found audio format {format_id} - {codec} {bitrate}kbps")
-            continue
-        
-        # Check if video (look for resolution patterns)
-        # Pattern 1: YouTube style "1920x1080"
-        res_match = re.search(r"(\d{3,4})x(\d{3,4})", line)
-        # Pattern 2: TikTok/Instagram style "720p", "1080p" in format name
-        res_name_match = re.search(r"(\d{3,4})p", line.lower())
-        
-        height = None
-        if res_match:
-            height = int(res_match.group(2))
-        elif res_name_match:
-            height = int(res_name_match.group(1))
-        
-        if height:
-            # Map to resolution group
-            res_group = None
-            if height >= 4320:
-                res_group = "8K (4320p)"
-            elif height >= 2160:
-                res_group = "4K (2160p)"
-            elif height >= 1440:
-                res_group = "1440p"
-            elif height >= 1080:
-                res_group = "1080p"
-            elif height >= 720:
-                res_group = "720p"
-            
-            if res_group:
-                video_formats[format_id] = {
-                    "id": format_id,
-                    "codec": codec if codec else "Video",
-                    "height": height,
-                    "res_group": res_group,
-                    "line": line
-                }
-                print(f"DEBUG: Found video format {format_id} - {res_group} {codec}")
-    
-    print(f"DEBUG: Found {len(video_formats)} video formats, {len(audio_formats)} audio formats")
-    
-    # Build format combinations (video + audio)
-    # For YouTube: Combine video with audio (251, 140, etc.)
-    # For TikTok/Instagram: Often video-only formats work (they include audio)
-    audio_priority = ["251", "140", "250", "249", "139"]
-    
-    for vid_id, vid_info in video_formats.items():
-        res_group = vid_info["res_group"]
-        
-        # Try to add with audio first
-        audio_added = False
-        for aud_id in audio_priority:
-            if aud_id in audio_formats:
-                aud_info = audio_formats[aud_id]
-                formats_by_res[res_group].append({
-                    "video_id": vid_id,
-                    "video_codec": vid_info["codec"],
-                    "audio_id": aud_id,
-                    "audio_codec": aud_info["codec"],
-                    "audio_bitrate": aud_info.get("bitrate", 0),
-                    "format_string": f"{vid_id}+{aud_id}",
-                    "display": f"{vid_info['codec']} • {vid_id}+{aud_id} ({aud_info['codec']} {aud_info.get('bitrate', 0)}k)"
-                })
-                print(f"DEBUG: Added combination {res_group}: {vid_id}+{aud_id}")
-                audio_added = True
-                break  # Only add one audio option per video format
-        
-        # If no audio formats available (TikTok, Instagram), add video-only
-        if not audio_added:
-            formats_by_res[res_group].append({
-                "video_id": vid_id,
-                "video_codec": vid_info["codec"],
-                "audio_id": "",
-                "audio_codec": "Included",
-                "audio_bitrate": 0,
-                "format_string": vid_id,
-                "display": f"{vid_info['codec']} • {vid_id} (Audio Included)"
-            })
-            print(f"DEBUG: Added video-only format {res_group}: {vid_id}")
-    
-    # Remove empty resolution groups
-    result = {k: v for k, v in formats_by_res.items() if v}
-    print(f"DEBUG: Returning {len(result)} resolution groups with {sum(len(v) for v in result.values())} total formats")
-    return result
+_POSTPROCESS_PREFIXES = (
+    "[Merger]", "[ExtractAudio]", "[Fixup", "[VideoConvertor]", "[VideoRemuxer]",
+    "[Metadata]", "[EmbedThumbnail]", "[EmbedSubtitle]", "[MoveFiles]", "[SponsorBlock]",
+)
+
+
+class StallWatchdog:
+    """Kills a download that stops making progress or crawls below a floor.
+
+    ``feed`` every output line; ``check`` (polled by the process
+    supervisor) returns a reason once the stream makes no progress for ``stall_timeout`` seconds, the process prints
+    nothing for ``startup_timeout`` seconds before downloading starts, or
+    the reported speed stays under the floor for ``floor_window`` seconds.
+    Post-processing (merge, audio extraction) is never timed out. The
+    floor is capped at half of the process's ``--limit-rate`` so rate
+    limiting is not mistaken for throttling.
+    """
+
+    def __init__(self, *, rate_limit: Optional[int] = None,
+                 settings: Optional[Dict[str, Any]] = None) -> None:
+        self.settings = dict(settings or WATCHDOG_SETTINGS)
+        self.floor = self.settings["speed_floor"]
+        if self.floor and rate_limit:
+            self.floor = min(self.floor, rate_limit / 2)
+        self.reason: Optional[str] = None
+        now = time.time()
+        self._last_output = now
+        self._last_progress = now
+        self._percent = -1.0
+        self._armed = False
+        self._slow_since: Optional[float] = None
+
+    def feed(self, line: str) -> None:
+        now = time.time()
+        self._last_output = now
+        if line.startswith("[download] Destination:"):
+            # A new stream (video, then audio) starts from zero
+            self._armed = True
+            self._percent = -1.0
+            self._last_progress = now
+            self._slow_since = None
+        elif line.startswith("[download]") and "%" in line:
+            try:
+                percent = float(line.split("%")[0].split()[-1])
+            except (ValueError, IndexError):
+                return
+            if percent > self._percent:
+                self._percent = percent
+                self._last_progress = now
+            self._armed = percent < 100
+            speed = parse_speed(line)
+            if self.floor and speed is not None:
+                if speed < self.floor:
+                    self._slow_since = self._slow_since or now
+                else:
+                    self._slow_since = None
+        elif line.startswith(_POSTPROCESS_PREFIXES):
+            self._armed = False
+            self._slow_since = None
+
+    def check(self) -> Optional[str]:
+        """Return why the process should be killed, or None while it is healthy."""
+        if self.reason:
+            return self.reason
+        now = time.time()
+        if self._armed and now - self._last_progress > self.settings["stall_timeout"]:
+            self.reason = f"No progress at {max(self._percent, 0):.1f}% for {self.settings['stall_timeout']}s"
+        elif self._armed and self._slow_since and now - self._slow_since > self.settings["floor_window"]:
+            self.reason = (f"Speed below {human_size(self.floor)}/s for "
+                           f"{self.settings['floor_window']}s (throttled)")
+        elif not self._armed and self._percent < 0 and now - self._last_output > self.settings["startup_timeout"]:
+            self.reason = f"No output for {self.settings['startup_timeout']}s"
+        return self.reason
+
+
+def watchdog_restart_cmd(cmd: List[str], url: str, restart: int) -> List[str]:
+    """Command for the ``restart``-th watchdog restart (resumes the .part file).
+
+    For YouTube, optionally switch to another player client, since
+    throttling is usually tied to the client's stream URLs.
+    """
+    new = list(cmd)
+    if not (WATCHDOG_SETTINGS["switch_client"] and _is_youtube(url)):
+        return new
+    # A new client needs a fresh extraction, not the prefetched stream URLs
+    new = live_extraction_cmd(new, url)
+    client = WATCHDOG_CLIENTS[(restart - 1) % len(WATCHDOG_CLIENTS)]
+    for i, arg in enumerate(new[:-1]):
+        if arg == "--extractor-args" and new[i + 1].startswith("youtube:"):
+            # Swap in the restart client, which may only offer the manifests
+            # the lean profile skips
+            parts = [p for p in new[i + 1][len("youtube:"):].split(";")
+                     if p and not p.startswith(("player_client=", "skip="))]
+            new[i + 1] = "youtube:" + ";".join(parts + [f"player_client={client}"])
+            return new
+    return new[:1] + ["--extractor-args", f"youtube:player_client={client}"] + new[1:]
 
 
 # ----------------------------------------------------------------------
-# URL validation
+# Reusing stream data across fallbacks
 # ----------------------------------------------------------------------
-URL_RE = re.compile(
-    r"^(https?://)?(www\.)?"
-    r"(youtube\.com|youtu\.be|"
-    r"facebook\.com|fb\.watch|fb\.com|"
-    r"tiktok\.com|"
-    r"instagram\.com|"
-    r"soundcloud\.com)"
-    r"/.+$"
-)
+# yt-dlp names the separate streams of a merged download "<name>.f<ID>.<ext>"
+_COMPONENT_RE = re.compile(r"\.f([0-9A-Za-z_-]+)\.\w+$")
 
+# The format IDs yt-dlp picked, printed before any of them is downloaded
+_FORMAT_CHOICE_RE = re.compile(r"^\[info\] [^:\s]+: Downloading \d+ format\(s\): (\S+)")
 
-def clean_list(text: str) -> list[str]:
-    """Extract video/audio URLs from multi-line string."""
-    raw = [x.strip() for x in text.splitlines() if x.strip()]
-    urls: list[str] = []
-    ignored: list[str] = []
-
-    for line in raw:
-        if (
-            line.startswith("=")
-            or line.startswith("-")
-            or "DOWNLOAD" in line.upper()
-            or "RUNNING" in line.upper()
-            or "COMMAND:" in line.upper()
-            or line.startswith("Paste")
-            or line.startswith("[")
-            or "✅" in line
-            or "❌" in line
-        ):
+# yt-dlp reports a failed merge as a post-processing error after "[Merger]"
+_MERGE_FAILED_RE = re.compile(r"^ERROR: Postprocessing: ")
+
+# Local stream-copy merges: a base allowance plus time per GiB of input
+MERGE_TIMEOUT = 120
+MERGE_TIMEOUT_PER_GIB = 60
+
+
+def stream_components(destinations: List[Path]) -> List[Tuple[str, Path, bool]]:
+    """``(format_id, path, complete)`` for each stream an attempt started.
+
+    Streams that left neither a finished file nor a partial are dropped.
+    yt-dlp skips a finished ``name.f<ID>.<ext>`` and resumes its ``.part``
+    whenever a later attempt picks the same format ID, so these are what
+    a fallback can reuse.
+    """
+    seen: Dict[str, Tuple[str, Path, bool]] = {}
+    for dest in destinations:
+        m = _COMPONENT_RE.search(dest.name)
+        if not m or m.group(1) in seen:
             continue
+        if dest.exists():
+            seen[m.group(1)] = (m.group(1), dest, True)
+        elif partial_files(dest):
+            seen[m.group(1)] = (m.group(1), dest, False)
+    return list(seen.values())
 
-        if URL_RE.match(line):
-            urls.append(line)
-        else:
-            ignored.append(line)
-
-    if ignored:
-        messagebox.showwarning(
-            "Invalid URLs",
-            "These lines were ignored:\n"
-            + "\n".join(ignored[:5])
-            + (f"\n… and {len(ignored)-5} more" if len(ignored) > 5 else ""),
-        )
-    return urls
+
+def merge_failed(lines: List[str]) -> bool:
+    """True when the streams downloaded but yt-dlp's merge step failed."""
+    merger = [i for i, line in enumerate(lines) if line.startswith("[Merger]")]
+    return bool(merger) and any(_MERGE_FAILED_RE.match(line) for line in lines[merger[-1] + 1:])
+
+
+def merge_components(first: Path, second: Path, on_line: Any = None) -> Optional[Path]:
+    """Merge two finished streams with ffmpeg (stream copy); returns the output.
+
+    The streams may come in either order: the video track is taken from
+    whichever file has one, the audio track likewise. Tries an mp4
+    container first and falls back to mkv, which accepts any codec pair.
+    The stream files are removed after a successful merge.
+    """
+    ffmpeg = get_bundled_ffmpeg()
+    if not (os.path.isfile(ffmpeg) or shutil.which(ffmpeg)):
+        return None
+    base = first.name[: _COMPONENT_RE.search(first.name).start()]
+    try:
+        size = first.stat().st_size + second.stat().st_size
+    except OSError:
+        return None
+    timeout = MERGE_TIMEOUT + MERGE_TIMEOUT_PER_GIB * size / 1024 ** 3
+    for ext in ("mp4", "mkv"):
+        target = first.with_name(f"{base}.{ext}")
+        temp = first.with_name(f"{base}.temp.{ext}")
+        # Optional maps: one video and one audio track, whichever file holds them
+        cmd = [
+            ffmpeg, "-nostdin", "-y", "-loglevel", "error",
+            "-i", str(first), "-i", str(second),
+            "-map", "0:v:0?", "-map", "1:v:0?", "-map", "0:a:0?", "-map", "1:a:0?", "-c", "copy",
+        ]
+        if ext == "mp4":
+            cmd.extend(["-movflags", "+faststart"])
+        cmd.append(str(temp))
+        # A hung ffmpeg must not hold the job's lane forever
+        proc = SUPERVISOR.spawn(cmd, on_line=on_line, timeout=timeout, label="merge")
+        if proc.wait() == 0 and temp.exists():
+            os.replace(temp, target)
+            for component in (first, second):
+                try:
+                    component.unlink()
+                except OSError:
+                    pass
+            return target
+        try:
+            temp.unlink()
+        except OSError:
+            pass
+    return None
 
 
 # ----------------------------------------------------------------------
@@ -529,10 +3174,11 @@ def run_download(
     right_codec: str | None = None,
     cookies_path: str | None = None,
     tag: str = "Job",
-    proc_ref: Optional["DownloadWorker"] = None,
+    proc_ref: Optional["JobHandle"] = None,
 ) -> bool:
     """Build the yt-dlp command and run it."""
     out_tpl = str(out / "%(title)s.%(ext)s")
+    host = host_key(url)
 
     # Allow browser cookies (Chrome) so YouTube behaves like in Safari/
     # Chrome itself. On macOS this will trigger a one-time Keychain
@@ -556,6 +3202,11 @@ def run_download(
             "--newline",
             "-o", out_tpl,
         ])
+        cmd.extend(extraction_args(url, "audio"))
+        cmd.extend(build_accel_args(url))
+        rate = SCHEDULER.rate_limit_for(url)
+        if rate:
+            cmd.extend(["--limit-rate", str(rate)])
         
         # Add cookies for YouTube audio downloads
         if cookies_path:
@@ -580,6 +3231,12 @@ def run_download(
         cmd = [YTDLP_EXE]
         if has_js_runtime:
             cmd.extend(["--remote-components", "ejs:github"])
+        # A picked format ID may be any listed format, manifests included
+        cmd.extend(extraction_args(url, "listing" if video_id and video_id != "best" else "video"))
+        cmd.extend(build_accel_args(url, fmt.split("/")[0].split("+")))
+        rate = SCHEDULER.rate_limit_for(url)
+        if rate:
+            cmd.extend(["--limit-rate", str(rate)])
         cmd.extend(["-f", fmt, "--merge-output-format", "mp4", "--newline", "-o", out_tpl, url])
 
     # Add cookies for authentication
@@ -596,123 +3253,255 @@ def run_download(
 
     ui_append(tag, f"Running command:\n{' '.join(cmd)}\n")
 
-    creation_flags = 0
-    if os.name == "nt":
-        creation_flags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
-
-    proc = None
+    primary = cmd
     try:
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            bufsize=1,
-            creationflags=creation_flags,
-        )
-        if proc_ref:
-            proc_ref.current_proc = proc
-
-        def stream_and_collect(p: subprocess.Popen) -> int:
-            """Stream subprocess output to UI and return exit code."""
-            if p.stdout:
-                for line in p.stdout:
-                    line = line.rstrip()
-                    if "[download]" in line and "%" in line:
-                        try:
-                            percent = float(line.split("%")[0].split()[-1])
-                            ui_append("progress", percent)
-                        except Exception:
-                            pass
-                    ui_append(tag, line)
-
-                    if proc_ref and proc_ref.stop_flag:
-                        try:
-                            p.terminate()
-                        except Exception:
-                            pass
-                        break
-
-            p.wait()
-            return p.returncode
-
-        code = stream_and_collect(proc)
-
-        # If first attempt failed, try safe fallbacks (do not remove user's choices)
-        if code != 0:
-            ui_append(tag, "⚠️ Primary download failed, attempting fallbacks...")
-
-            # Prepare fallback command variants
-            fallbacks: list[list[str]] = []
+        tail: deque = deque(maxlen=ERROR_TAIL_LINES)
+        # Every file any attempt wrote to, for stream reuse in fallbacks
+        destinations: List[Path] = []
+        # Format IDs the latest attempt picked, and the pairs merged locally
+        picked: List[str] = []
+        merges_tried: set = set()
+
+        def handle_line(line: str) -> None:
+            """Stream one output line to the UI (runs on the supervisor thread)."""
+            tail.append(line)
+            dest = _DESTINATION_RE.match(line)
+            if dest:
+                destinations.append(Path(dest.group(1) or dest.group(2)))
+                if proc_ref:
+                    proc_ref.destinations.append(destinations[-1])
+            if "[download]" in line and "%" in line:
+                try:
+                    percent = float(line.split("%")[0].split()[-1])
+                    ui_append("progress", percent)
+                except Exception:
+                    pass
+                speed = parse_speed(line)
+                if speed:
+                    THROUGHPUT.update(id(tail), speed)
+                    SCHEDULER.tuner.report_speed(host, id(tail), speed)
+            elif ("ERROR" in line or "WARNING" in line) and classify_error([line])[0] == "throttled":
+                SCHEDULER.tuner.report_error(host)
+            ui_append(tag, line)
+            choice = _FORMAT_CHOICE_RE.match(line)
+            if choice:
+                picked[:] = choice.group(1).split("+")
+                reused = [c for c in stream_components(destinations) if c[0] in picked]
+                if reused:
+                    have = ", ".join(
+                        f"{fid} ({human_size(path.stat().st_size)})" if done else f"{fid} (partial)"
+                        for fid, path, done in reused
+                    )
+                    ui_append(tag, f"♻️ Reusing downloaded stream data: {have}")
+
+        def stopped() -> bool:
+            return bool(proc_ref and proc_ref.stop_flag)
+
+        def wait_for_retry(delay: float) -> bool:
+            """Back off for ``delay`` (and any host cool-down) without holding a job slot."""
+            slot = proc_ref.slot if proc_ref else None
+            if slot:
+                # Let queued jobs for other hosts run meanwhile
+                SCHEDULER.release(slot)
+                proc_ref.slot = None
+            if not SCHEDULER.wait_cooldown(host, delay, stopped):
+                return False
+            if slot:
+                proc_ref.slot = SCHEDULER.acquire(url, stopped)
+                return proc_ref.slot is not None
+            return True
+
+        def merge_locally() -> bool:
+            """Merge the last attempt's streams with ffmpeg if only yt-dlp's merge failed.
+
+            Re-running yt-dlp would repeat the same merge, so this is tried
+            instead whenever both picked streams are finished on disk.
+            """
+            if audio or len(picked) != 2 or tuple(picked) in merges_tried or not merge_failed(list(tail)):
+                return False
+            on_disk = {fid: (path, done) for fid, path, done in stream_components(destinations)}
+            if not all(on_disk.get(fid, (None, False))[1] for fid in picked):
+                return False
+            merges_tried.add(tuple(picked))
+            ui_append(tag, "🔧 Both streams are downloaded; retrying the merge locally...")
+            merged = merge_components(on_disk[picked[0]][0], on_disk[picked[1]][0],
+                                      on_line=lambda ln: ui_append(tag, ln))
+            if merged:
+                ui_append(tag, f"✅ Merged locally: {merged.name}")
+                drop_stale_streams()
+                return True
+            ui_append(tag, "⚠️ Local merge failed")
+            return False
 
-            # 1) Remove remote-components (EJS) to avoid JS challenge issues
-            fb1 = [c for c in cmd if c != "--remote-components" and c != "ejs:github"]
-            fallbacks.append(fb1)
+        def drop_stale_streams() -> None:
+            """Delete streams of earlier attempts that the successful one did not pick."""
+            stale = [path for fid, path, _ in stream_components(destinations) if fid not in picked]
+            if stale:
+                cleanup_partials(stale, keep=False)
 
-            # 2) Try forcing native HLS handling
-            fb2 = fb1.copy()
-            if "--hls-prefer-native" not in fb2:
-                fb2.insert(1, "--hls-prefer-native")
-            fallbacks.append(fb2)
+        def run_attempt(attempt_cmd: List[str]) -> int:
+            """Run one command; restart it from its partial file if the watchdog trips."""
+            rate_limit = None
+            if "--limit-rate" in attempt_cmd:
+                rate_limit = int(attempt_cmd[attempt_cmd.index("--limit-rate") + 1])
 
-            # 3) Force a strict MP4 format fallback to avoid fragmented m3u8
-            fb3 = [c for c in fb1]
-            # replace or add -f with a robust mp4 selector
-            if "-f" in fb3:
-                idx = fb3.index("-f")
-                # keep url at the end; replace following format
-                if idx + 1 < len(fb3):
-                    fb3[idx + 1] = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best"
-            else:
-                # insert format before output/template or url
-                fb3.insert(1, "-f")
-                fb3.insert(2, "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best")
-            fallbacks.append(fb3)
-
-            # 4) Try HLS using mpegts container and increase fragment retries
-            # This can help when segmented HLS fragments produce 403s for
-            # certain fragment request patterns; using mpegts + more
-            # fragment retries sometimes recovers the stream.
-            fb4 = [c for c in fb3]
-            if "--hls-use-mpegts" not in fb4:
-                fb4.insert(1, "--hls-use-mpegts")
-            if "--fragment-retries" not in fb4:
-                fb4.insert(1, "--fragment-retries")
-                fb4.insert(2, "20")
-            fallbacks.append(fb4)
-
-            for attempt_cmd in fallbacks:
+            restarts = 0
+            while True:
+                tail.clear()
+                picked.clear()
+                watchdog = StallWatchdog(rate_limit=rate_limit)
+                p2 = spawn_ytdlp(attempt_cmd, on_line=handle_line, watchdog=watchdog, label=tag)
+                if proc_ref:
+                    proc_ref.current_proc = p2
+                    if proc_ref.stop_flag:
+                        # Cancelled between launch and registration
+                        p2.terminate(grace=0, reason="cancelled")
                 try:
-                    ui_append(tag, f"Running fallback: {' '.join(attempt_cmd)}")
-                    p2 = subprocess.Popen(
-                        attempt_cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        text=True,
-                        encoding="utf-8",
-                        errors="replace",
-                        bufsize=1,
-                        creationflags=creation_flags,
-                    )
-                    if proc_ref:
-                        proc_ref.current_proc = p2
-
-                    code2 = stream_and_collect(p2)
-                    if code2 == 0:
-                        ui_append(tag, "✅ Fallback succeeded")
-                        return True
-                except Exception as exc2:
-                    ui_append(tag, f"[FALLBACK EXCEPTION] {exc2}")
+                    code = p2.wait()
                 finally:
+                    SCHEDULER.tuner.job_finished(host, id(tail))
+                    THROUGHPUT.job_finished(id(tail))
                     if proc_ref:
                         proc_ref.current_proc = None
 
-            ui_append(tag, "❌ All fallbacks failed")
+                if code == 0 or not watchdog.reason or stopped():
+                    return code
+                if restarts >= WATCHDOG_SETTINGS["max_restarts"]:
+                    ui_append(tag, f"🐕 {watchdog.reason}: giving up after {restarts} restart(s)")
+                    return code
+                restarts += 1
+                attempt_cmd = watchdog_restart_cmd(attempt_cmd, url, restarts)
+                ui_append(tag, f"🐕 {watchdog.reason}: restarting from the partial file "
+                               f"({restarts}/{WATCHDOG_SETTINGS['max_restarts']})")
+
+        # Retries and fallbacks below re-extract from ``cmd``
+        primary = with_prefetched_info(cmd, url)
+        if primary is not cmd:
+            ui_append(tag, "⚡ Using prefetched metadata (skipping extraction)")
+        code = run_attempt(primary)
+        if code == 0:
+            return True
+        if stopped():
             return False
 
-        return True
+        # Classify the failure and apply its retry policy before falling back
+        category, reason = classify_error(tail)
+        policy = RETRY_POLICIES[category]
+        ui_append(tag, f"⚠️ Primary download failed [{category}]: {reason}")
+        if category == "permanent":
+            ui_append(tag, "⛔ Not retrying: no fallback can fix this")
+            return False
+
+        if merge_locally():
+            return True
+
+        tried_cookies: List[str] = []
+        for attempt in range(policy["retries"]):
+            if category == "auth":
+                retry_cmd = alternate_cookie_cmd(cmd, tried_cookies)
+                if retry_cmd is None:
+                    break
+                ui_append(tag, f"🍪 Retrying with {tried_cookies[-1].title()} cookies")
+            else:
+                retry_cmd = cmd
+                delay = backoff_delay(policy, attempt)
+                if policy["host_cooldown"]:
+                    SCHEDULER.cool_down(host, delay)
+                ui_append(tag, f"⏳ Retrying in {delay:.0f}s (attempt {attempt + 2})...")
+                if not wait_for_retry(delay):
+                    return False
+            try:
+                code = run_attempt(retry_cmd)
+            except Exception as exc2:
+                ui_append(tag, f"[RETRY EXCEPTION] {exc2}")
+                continue
+            if code == 0:
+                ui_append(tag, "✅ Retry succeeded")
+                return True
+            if stopped():
+                return False
+            new_category, reason = classify_error(tail)
+            if new_category == "permanent":
+                ui_append(tag, f"⛔ Not retrying: {reason}")
+                return False
+
+        if not policy["fallbacks"]:
+            ui_append(tag, f"❌ Giving up [{category}]: {reason}")
+            return False
+
+        # Try safe fallbacks (do not remove user's choices)
+        ui_append(tag, "⚠️ Attempting fallbacks...")
+
+        # Prepare fallback command variants
+        fallbacks: list[list[str]] = []
+
+        # 1) Remove remote-components (EJS) to avoid JS challenge issues,
+        #    and go back to yt-dlp's full extraction (all clients/manifests)
+        fb1 = [c for c in strip_extraction_args(cmd) if c != "--remote-components" and c != "ejs:github"]
+        fallbacks.append(fb1)
+
+        # 2) Try forcing native HLS handling
+        fb2 = fb1.copy()
+        if "--hls-prefer-native" not in fb2:
+            fb2.insert(1, "--hls-prefer-native")
+        fallbacks.append(fb2)
+
+        # 3) Force a strict MP4 format fallback to avoid fragmented m3u8
+        fb3 = [c for c in fb1]
+        # replace or add -f with a robust mp4 selector
+        if "-f" in fb3:
+            idx = fb3.index("-f")
+            # keep url at the end; replace following format
+            if idx + 1 < len(fb3):
+                fb3[idx + 1] = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best"
+        else:
+            # insert format before output/template or url
+            fb3.insert(1, "-f")
+            fb3.insert(2, "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best")
+        fallbacks.append(fb3)
+
+        # 4) Try HLS using mpegts container and increase fragment retries
+        # This can help when segmented HLS fragments produce 403s for
+        # certain fragment request patterns; using mpegts + more
+        # fragment retries sometimes recovers the stream.
+        fb4 = [c for c in fb3]
+        if "--hls-use-mpegts" not in fb4:
+            fb4.insert(1, "--hls-use-mpegts")
+        if "--fragment-retries" not in fb4:
+            fb4.insert(1, "--fragment-retries")
+            fb4.insert(2, "20")
+        fallbacks.append(fb4)
+
+        # Each fallback runs with its own selector. Whenever it picks a
+        # format ID an earlier attempt already fetched, yt-dlp skips the
+        # finished stream or resumes its .part (logged by handle_line)
+        for attempt_cmd in fallbacks:
+            if stopped():
+                return False
+            try:
+                ui_append(tag, f"Running fallback: {' '.join(attempt_cmd)}")
+                code2 = run_attempt(attempt_cmd)
+                if code2 == 0:
+                    ui_append(tag, "✅ Fallback succeeded")
+                    drop_stale_streams()
+                    return True
+            except Exception as exc2:
+                ui_append(tag, f"[FALLBACK EXCEPTION] {exc2}")
+                continue
+            if merge_locally():
+                return True
+
+            category, reason = classify_error(tail)
+            if category == "permanent":
+                ui_append(tag, f"⛔ Stopping fallbacks: {reason}")
+                return False
+            if category == "throttled":
+                SCHEDULER.cool_down(host, backoff_delay(RETRY_POLICIES["throttled"], 0))
+                ui_append(tag, f"⛔ Stopping fallbacks, {host} is rate limiting: {reason}")
+                return False
+
+        ui_append(tag, "❌ All fallbacks failed")
+        return False
 
     except Exception as exc:
         ui_append(tag, f"[EXCEPTION] {exc}")
@@ -720,46 +3509,437 @@ def run_download(
     finally:
         if proc_ref:
             proc_ref.current_proc = None
-        if proc and proc.stdout:
-            try:
-                proc.stdout.close()
-            except Exception:
-                pass
+        if primary is not cmd:
+            discard_prefetched_info(primary)
+
+
+# ----------------------------------------------------------------------
+# Availability probe
+# ----------------------------------------------------------------------
+# Public oEmbed endpoints answer in ~100 ms without running yt-dlp. Only
+# URLs naming a single video are probed (channels, profiles, playlists and
+# live pages get 400/404 although yt-dlp handles them), and only a 404
+# means the video is gone; anything else, including 400 and 401/403
+# (private or embedding disabled), is left to yt-dlp.
+OEMBED_ENDPOINTS: Dict[str, str] = {
+    "YouTube": "https://www.youtube.com/oembed?format=json&url={url}",
+    "TikTok": "https://www.tiktok.com/oembed?url={url}",
+}
+OEMBED_DEAD_STATUS = {404: "Video unavailable (deleted or never existed)"}
+
+# Probes are plain HTTP requests, not processes, so they get their own
+# small pool instead of occupying the background executor.
+PROBE_CONCURRENCY = 16
+PROBE_TIMEOUT = 5
+
+
+def probeable(url: str) -> bool:
+    """True if ``url`` has an oEmbed endpoint and names one video by its ID."""
+    return detect_platform(url) in OEMBED_ENDPOINTS and any(p.search(url) for _, p in _CANONICAL_ID_RES)
+
+
+def probe_url(url: str) -> Optional[str]:
+    """Reason ``url`` is certainly unavailable, or None if it may be fetchable."""
+    if not probeable(url):
+        return None
+    endpoint = OEMBED_ENDPOINTS[detect_platform(url)]
+    full = url if url.startswith(("http://", "https://")) else "https://" + url
+    request = urllib.request.Request(
+        endpoint.format(url=urllib.parse.quote(full, safe="")),
+        headers={"User-Agent": f"Mozilla/5.0 (kexisDownloader/{__version__})"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=PROBE_TIMEOUT) as resp:
+            resp.read(4096)
+        return None
+    except urllib.error.HTTPError as exc:
+        return OEMBED_DEAD_STATUS.get(exc.code)
+    except (urllib.error.URLError, OSError, ValueError):
+        # Offline or endpoint trouble: say nothing, yt-dlp decides
+        return None
+
+
+def probe_availability(urls: List[str], on_dead: Any = None) -> Dict[str, str]:
+    """Probe all URLs concurrently; return ``{url: reason}`` for dead ones.
+
+    ``on_dead(url, reason)`` is called as soon as each dead URL is found.
+    """
+    urls = [u for u in dict.fromkeys(urls) if probeable(u)]
+    dead: Dict[str, str] = {}
+    if not urls:
+        return dead
+    with ThreadPoolExecutor(max_workers=min(PROBE_CONCURRENCY, len(urls)), thread_name_prefix="probe") as pool:
+        futures = {pool.submit(probe_url, url): url for url in urls}
+        for future in as_completed(futures):
+            reason = future.result()
+            if reason:
+                url = futures[future]
+                dead[url] = reason
+                if on_dead:
+                    on_dead(url, reason)
+    return dead
+
+
+# ----------------------------------------------------------------------
+# Per-URL format resolution for batches
+# ----------------------------------------------------------------------
+# yt-dlp filters for the Smart Selector's codec families, used when a URL
+# has no metadata to resolve against.
+VIDEO_CODEC_FILTERS: Dict[str, str] = {
+    "H264": "[vcodec~='^(avc|h264)']",
+    "VP9": "[vcodec~='^vp0?9']",
+    "AV01": "[vcodec^=av01]",
+    "HEVC": "[vcodec~='^(hev|hvc|h265)']",
+}
+AUDIO_CODEC_FILTERS: Dict[str, str] = {
+    "Opus": "[acodec^=opus]",
+    "AAC": "[acodec^=mp4a]",
+}
+
+
+class FormatChoice:
+    """A format picked as "1080p VP9 + Opus" rather than as one video's IDs.
+
+    Format IDs differ between videos (and platforms), so a batch keeps the
+    high-level choice and ``resolve`` maps it to the IDs each URL actually
+    offers. The URL the choice was made on keeps its exact pick.
+    """
+
+    def __init__(
+        self,
+        height: int,
+        video_codec: str = "",
+        audio_codec: str = "",
+        source: Optional[Tuple[str, str]] = None,
+    ) -> None:
+        self.height = height
+        self.video_codec = video_codec
+        self.audio_codec = audio_codec
+        self.source = source  # (url, format_string) of the original pick
+
+    @classmethod
+    def from_selection(cls, selected: Dict[str, str]) -> "FormatChoice":
+        """Build from a Smart Selector ``selected_format`` dict."""
+        m = re.search(r"(\d{3,4})p", selected.get("resolution", ""))
+        video_codec = selected.get("video_codec", "")
+        audio_codec = selected.get("audio_codec", "")
+        source = (selected["url"], selected["format_string"]) if selected.get("url") else None
+        return cls(
+            int(m.group(1)) if m else 0,
+            "" if video_codec == "Video" else video_codec,
+            "" if audio_codec in ("Audio", "Included") else audio_codec,
+            source,
+        )
+
+    def label(self) -> str:
+        parts = [f"{self.height}p" if self.height else "best"]
+        if self.video_codec:
+            parts.append(self.video_codec)
+        text = " ".join(parts)
+        return f"{text} + {self.audio_codec}" if self.audio_codec else text
+
+    def selector(self) -> str:
+        """Generic yt-dlp selector for URLs without cached metadata."""
+        limit = f"[height<={self.height}]" if self.height else ""
+        vf = VIDEO_CODEC_FILTERS.get(self.video_codec, "")
+        af = AUDIO_CODEC_FILTERS.get(self.audio_codec, "")
+        options = [f"bv*{limit}{vf}+ba{af}", f"bv*{limit}+ba", f"b{limit}", "bv*+ba/b"]
+        return "/".join(dict.fromkeys(options))
+
+    def resolve(self, url: str, info: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Concrete format IDs for ``url`` (e.g. ``"303+251"``), or None.
+
+        The closest height at or below the target wins over the codec, so
+        "1080p VP9" becomes 1080p H264 rather than 720p VP9 when a video
+        has no VP9 at 1080p. Within a height, the preferred codec and then
+        the higher bitrate win.
+        """
+        if self.source and self.source[0] == url:
+            return self.source[1]
+        records = [
+            rec for rec in (
+                FormatRecord.from_info(f) for f in (info or {}).get("formats") or []
+                if f.get("protocol") != "mhtml"
+            ) if rec
+        ]
+        videos = [rec for rec in records if rec.kind == "video"]
+        audios = [rec for rec in records if rec.kind == "audio"]
+        if not audios:
+            # Nothing to merge with: only streams that carry their own audio
+            videos = [rec for rec in videos if rec.has_audio] or videos
+        if not videos:
+            return None
+
+        fitting = [rec for rec in videos if not self.height or rec.height <= self.height]
+        if fitting:
+            height = max(rec.height for rec in fitting)
+        else:
+            height = min(rec.height for rec in videos)
+        video = max(
+            (rec for rec in videos if rec.height == height),
+            key=lambda rec: (rec.codec == self.video_codec, rec.bitrate),
+        )
+        if video.has_audio or not audios:
+            return video.format_id
+        audio = max(audios, key=lambda rec: (rec.codec == self.audio_codec, rec.bitrate))
+        return f"{video.format_id}+{audio.format_id}"
+
+
+# ----------------------------------------------------------------------
+# Pre-flight batch planning
+# ----------------------------------------------------------------------
+# Keep this much disk free on top of the estimate, since sizes from
+# filesize_approx / bitrate are only estimates.
+DISK_RESERVE_BYTES = 512 * 1024 ** 2
+
+
+def estimate_job_bytes(info: Dict[str, Any], opts: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    """Estimate (final_bytes, peak_bytes) on disk for one download job.
+
+    ``peak_bytes`` accounts for the moment the separate streams and the
+    merged/converted output exist side by side.
+    """
+    formats = {str(f.get("format_id")): f for f in info.get("formats") or []}
+    duration = info.get("duration")
+
+    if opts.get("audio"):
+        audios = [f for f in formats.values() if f.get("vcodec") in (None, "none") and f.get("acodec") not in (None, "none")]
+        if not audios:
+            return None, None
+        best = max(audios, key=lambda a: a.get("abr") or a.get("tbr") or 0)
+        size = _format_filesize(best, duration)
+        return (size, size * 2) if size is not None else (None, None)
+
+    # Concrete "303+251" style selections: sum the component sizes
+    selector = opts.get("video_id") or ""
+    first = selector.split("/")[0]
+    ids = [i for i in first.split("+") if i]
+    if ids and all(i in formats for i in ids):
+        sizes = [_format_filesize(formats[i], duration) for i in ids]
+        if any(s is None for s in sizes):
+            return None, None
+        total = sum(sizes)
+        return total, total * 2 if len(ids) > 1 else total
+
+    # Generic "best" selectors: assume the best-ranked combination
+    ranked = rank_format_choices(info, prefer="best")
+    if not ranked or ranked[0]["filesize"] is None:
+        return None, None
+    total = ranked[0]["filesize"]
+    return total, total * 2 if ranked[0]["audio_id"] else total
+
+
+class BatchPlan:
+    """Result of a pre-flight pass over a batch of download jobs."""
+
+    def __init__(self) -> None:
+        self.jobs: List[Tuple[str, dict]] = []       # accepted, in run order
+        self.refused: List[Tuple[str, str]] = []     # (url, reason), no disk space
+        self.dead: List[Tuple[str, str]] = []        # (url, reason), unavailable
+        self.estimates: Dict[str, Optional[int]] = {}
+        self.total_bytes = 0
+        self.unknown = 0
+        self.free_bytes: Optional[int] = None
+        self.eta_seconds: Optional[float] = None
+        self.rate: Optional[float] = None            # aggregate bytes/s behind the ETA
+        self.reordered = False
+        self.format_choice: Optional[FormatChoice] = None
+        self.resolved = 0                            # jobs given exact format IDs
+
+    def summary(self) -> str:
+        """Human-readable plan summary for the log."""
+        lines = [
+            f"📋 Plan: {len(self.jobs)} job(s), ~{human_size(self.total_bytes)}"
+            + (f" (+{self.unknown} of unknown size)" if self.unknown else ""),
+            f"💽 Free space: {human_size(self.free_bytes)}",
+        ]
+        if self.eta_seconds is not None:
+            lines.append(f"⏱️ Estimated time: ~{int(self.eta_seconds // 60)}m {int(self.eta_seconds % 60)}s "
+                         f"at {human_size(self.rate)}/s across parallel jobs")
+        else:
+            lines.append("⏱️ Estimated time: unknown (no throughput measured yet)")
+        if self.reordered:
+            lines.append("🔀 Smaller jobs moved ahead of jobs that do not fit")
+        if self.format_choice:
+            lines.append(f"🎯 {self.format_choice.label()}: exact formats for {self.resolved}/{len(self.jobs)} job(s)"
+                         + (", generic selector for the rest" if self.resolved < len(self.jobs) else ""))
+        for url, reason in self.refused:
+            lines.append(f"⛔ Skipped {url}: {reason}")
+        if self.dead:
+            lines.append(f"💀 {len(self.dead)} unavailable URL(s) kept out of the queue")
+        return "\n".join(lines)
+
+
+def plan_batch(jobs: List[Tuple[str, dict]], out: Path, on_dead: Any = None) -> BatchPlan:
+    """Resolve formats for all jobs with batched extraction and fit them into free disk space.
+
+    Unavailable URLs are dropped first: an oEmbed probe catches deleted
+    videos without running yt-dlp, and extraction errors that no retry
+    can fix (private, removed, geo-blocked) catch the rest.
+    ``on_dead(url, reason)`` reports each one as soon as it is known.
+
+    A job carrying a ``format_choice`` gets the concrete format IDs its
+    own metadata offers, so it does not start on another video's IDs and
+    fall into the fallback chain.
+
+    Jobs keep their order while they fit; a job that would overflow the
+    disk is refused and later, smaller jobs are allowed to move ahead of it.
+    Jobs whose size cannot be estimated are kept.
+    """
+    plan = BatchPlan()
+    urls = list(dict.fromkeys(url for url, _ in jobs))
+
+    dead = probe_availability(urls, on_dead)
+    live = [url for url in urls if url not in dead]
+    PREFETCHER.wait_for(live)
+    infos = fetch_metadata_many(live)
+    for url in urls:
+        if url in dead or infos.get(url):
+            continue
+        error = metadata_error(url)
+        if error and classify_error([error])[0] == "permanent":
+            dead[url] = error
+            if on_dead:
+                on_dead(url, error)
+    plan.dead = [(url, dead[url]) for url in urls if url in dead]
+
+    try:
+        plan.free_bytes = shutil.disk_usage(out).free
+    except OSError:
+        plan.free_bytes = None
+    budget = None if plan.free_bytes is None else plan.free_bytes - DISK_RESERVE_BYTES
+
+    used = 0
+    resolved_urls = set()
+    for url, opts in jobs:
+        if url in dead:
+            continue
+        if "format_choice" in opts:
+            opts = dict(opts)
+            choice = opts.pop("format_choice")
+            plan.format_choice = choice
+            resolved = choice.resolve(url, infos.get(url))
+            if resolved:
+                opts["video_id"] = resolved
+                resolved_urls.add(url)
+        final, peak = estimate_job_bytes(infos.get(url) or {}, opts)
+        plan.estimates[url] = final
+        if final is None:
+            plan.unknown += 1
+            plan.jobs.append((url, opts))
+            continue
+        if budget is not None and used + peak > budget:
+            plan.refused.append((url, f"needs ~{human_size(peak)}, only {human_size(max(budget - used, 0))} left"))
+            continue
+        if plan.refused:
+            plan.reordered = True
+        used += final
+        plan.total_bytes += final
+        plan.jobs.append((url, opts))
+
+    plan.resolved = sum(1 for url, _ in plan.jobs if url in resolved_urls)
+    # Measured across all parallel jobs, so no per-job scaling is needed;
+    # a global bandwidth cap still bounds it
+    plan.rate = THROUGHPUT.rate
+    if plan.rate and SCHEDULER.global_limit:
+        plan.rate = min(plan.rate, SCHEDULER.global_limit)
+    if plan.rate:
+        plan.eta_seconds = plan.total_bytes / plan.rate
+    return plan
 
 
 # ----------------------------------------------------------------------
 # Worker thread
 # ----------------------------------------------------------------------
+class JobHandle:
+    """Process reference for one running job, handed to ``run_download``.
+
+    ``destinations`` collects the files the job's processes wrote, so a
+    cancelled job's partial output can be found again. ``slot`` is the
+    ``SCHEDULER`` slot the lane holds; ``run_download`` gives it up while
+    it backs off before a retry.
+    """
+
+    def __init__(self, worker: "DownloadWorker") -> None:
+        self.worker = worker
+        self.current_proc: "SupervisedProcess | WarmJob | None" = None
+        self.destinations: List[Path] = []
+        self.slot: Optional[str] = None  # host key of the scheduler slot held, if any
+
+    @property
+    def stop_flag(self) -> bool:
+        return self.worker.stop_flag
+
+
 class DownloadWorker(threading.Thread):
-    """Thread that processes download jobs."""
+    """Thread that processes download jobs, several at a time.
+
+    Jobs are spread over up to ``MAX_WORKER_LANES`` lanes; each lane waits
+    for a slot from ``SCHEDULER`` so global and per-host caps hold across
+    all workers.
+    """
 
     def __init__(self, jobs: List[Tuple[str, dict]], *, tag: str) -> None:
         super().__init__(daemon=True)
         self.jobs = jobs
         self.tag = tag
         self.stop_flag = False
-        self.current_proc: Optional[subprocess.Popen] = None
+        self.handles: List[JobHandle] = []
+        self._pending: "queue.Queue[Tuple[str, dict]]" = queue.Queue()
 
     def stop(self) -> None:
         """Stop the worker."""
         self.stop_flag = True
-        if self.current_proc:
-            try:
-                self.current_proc.terminate()
-            except Exception:
-                try:
-                    self.current_proc.kill()
-                except Exception:
-                    pass
+        for handle in list(self.handles):
+            proc = handle.current_proc
+            if proc:
+                # Signals the whole group (yt-dlp + ffmpeg/aria2c) on the supervisor loop
+                proc.terminate(reason="cancelled")
 
     def run(self) -> None:
-        for url, opts in self.jobs:
-            if self.stop_flag:
-                ui_append(self.tag, "\n=== CANCELLED ===\n")
+        for job in self.jobs:
+            self._pending.put(job)
+
+        lanes = [
+            threading.Thread(target=self._run_lane, daemon=True)
+            for _ in range(min(len(self.jobs), MAX_WORKER_LANES))
+        ]
+        for lane in lanes:
+            lane.start()
+        for lane in lanes:
+            lane.join()
+
+        if self.stop_flag:
+            ui_append(self.tag, "\n=== CANCELLED ===\n")
+        else:
+            ui_append(self.tag, "\n=== ALL DONE ===\n")
+
+    def _run_lane(self) -> None:
+        handle = JobHandle(self)
+        self.handles.append(handle)
+        while not self.stop_flag:
+            try:
+                url, opts = self._pending.get_nowait()
+            except queue.Empty:
                 return
-            ok = run_download(url, **opts, tag=self.tag, proc_ref=self)
+            handle.slot = SCHEDULER.acquire(url, lambda: self.stop_flag)
+            if handle.slot is None:
+                return
+            handle.destinations = []
+            try:
+                ok = run_download(url, **opts, tag=self.tag, proc_ref=handle)
+            finally:
+                if handle.slot:
+                    SCHEDULER.release(handle.slot)
+                    handle.slot = None
+            if not ok and self.stop_flag:
+                removed, freed = cleanup_partials(handle.destinations)
+                if CANCEL_SETTINGS["keep_partials"]:
+                    ui_append(self.tag, f"⏸️ Cancelled: {url} (partial files kept for resume)")
+                else:
+                    ui_append(self.tag, f"🧹 Cancelled: {url} (removed {removed} partial file(s), {human_size(freed)})")
+                continue
             ui_append(self.tag, f"\n{'✅' if ok else '❌'} Finished: {url}\n")
-        ui_append(self.tag, "\n=== ALL DONE ===\n")
 
 
 # ----------------------------------------------------------------------
@@ -810,6 +3990,12 @@ class kexisdownloader(ctk.CTk):
         # Smart format selection
         self.selected_format: Optional[Dict[str, str]] = None
 
+        # Pending URLs per tab (typed + imported), separate from the logs
+        self.url_queues: Dict[str, UrlQueue] = {"VIDEO": UrlQueue(), "AUDIO": UrlQueue()}
+        self._url_inputs: Dict[str, tk.Text] = {}
+        self._queue_labels: Dict[str, ctk.CTkLabel] = {}
+        self._url_sync_after: Dict[str, str] = {}
+
         # Setup UI
         self._setup_menu()
         self._setup_ui()
@@ -824,6 +4010,9 @@ class kexisdownloader(ctk.CTk):
         # Start log polling
         self._poll_log()
 
+        # Pay yt-dlp's start-up cost before the first format check
+        WARM_POOL.prewarm()
+
         # Bind keyboard shortcuts
         self.bind("<Command-d>", lambda e: self._start_current_download())
         self.bind("<Command-k>", lambda e: self._show_format_checker())
@@ -842,6 +4031,7 @@ class kexisdownloader(ctk.CTk):
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Open Downloads Folder", command=self._open_downloads_folder, accelerator="⌘O")
+        file_menu.add_command(label="Import URLs from File...", command=self._import_url_file, accelerator="⌘I")
         file_menu.add_separator()
         file_menu.add_command(label="Preferences...", command=self._show_preferences, accelerator="⌘,")
         file_menu.add_separator()
@@ -869,6 +4059,7 @@ class kexisdownloader(ctk.CTk):
 
         # Bind menu shortcuts
         self.bind("<Command-o>", lambda e: self._open_downloads_folder())
+        self.bind("<Command-i>", lambda e: self._import_url_file())
 
     # ------------------------------------------------------------------
     def _setup_ui(self):
@@ -895,6 +4086,16 @@ class kexisdownloader(ctk.CTk):
         if ctk.get_appearance_mode() == "Dark":
             self. dark_mode_switch.select()
 
+        # Background queue depth (format fetches, planning)
+        self.background_label = ctk.CTkLabel(
+            header,
+            text="",
+            font=ctk.CTkFont(size=11),
+            text_color="gray"
+        )
+        self.background_label.pack(side="right", padx=10)
+        self._poll_background()
+
         # Tabview
         self.tabview = ctk.CTkTabview(self, corner_radius=15)
         self.tabview. pack(fill="both", expand=True, padx=20, pady=10)
@@ -1005,11 +4206,19 @@ class kexisdownloader(ctk.CTk):
             font=ctk.CTkFont(size=14, weight="bold")
         ).pack(anchor="w", padx=15, pady=(15, 5))
 
+        self.video_url_text = self._build_url_input(url_frame, "VIDEO")
+
+        ctk.CTkLabel(
+            url_frame,
+            text="📜 Log:",
+            font=ctk.CTkFont(size=13, weight="bold")
+        ).pack(anchor="w", padx=15, pady=(5, 0))
+
         # Log text box with terminal style
         self.video_log_text = tk.Text(
             url_frame,
             wrap="word",
-            height=10,
+            height=8,
             font=("SF Mono", 11),
             bg="#1E1E1E" if ctk.get_appearance_mode() == "Dark" else "#F5F0E8",
             fg="#A8FF60" if ctk.get_appearance_mode() == "Dark" else "#5A524A",
@@ -1021,7 +4230,6 @@ class kexisdownloader(ctk.CTk):
             pady=10
         )
         self.video_log_text.pack(fill="both", expand=True, padx=15, pady=(5, 10))
-        self.video_log_text.insert("1.0", "Paste video URLs here (YouTube, Facebook, TikTok, Instagram), one per line.\n\n")
         self._log_widgets["VIDEO"] = self.video_log_text
 
         # Right-click menu for log
@@ -1120,11 +4328,19 @@ class kexisdownloader(ctk.CTk):
             font=ctk.CTkFont(size=14, weight="bold")
         ).pack(anchor="w", padx=15, pady=(15, 5))
 
+        self.audio_url_text = self._build_url_input(url_frame, "AUDIO")
+
+        ctk.CTkLabel(
+            url_frame,
+            text="📜 Log:",
+            font=ctk.CTkFont(size=13, weight="bold")
+        ).pack(anchor="w", padx=15, pady=(5, 0))
+
         # Log text box
         self.audio_log_text = tk.Text(
             url_frame,
             wrap="word",
-            height=10,
+            height=8,
             font=("SF Mono", 11),
             bg="#1E1E1E" if ctk.get_appearance_mode() == "Dark" else "#F5F0E8",
             fg="#A8FF60" if ctk.get_appearance_mode() == "Dark" else "#5A524A",
@@ -1136,7 +4352,6 @@ class kexisdownloader(ctk.CTk):
             pady=10
         )
         self.audio_log_text.pack(fill="both", expand=True, padx=15, pady=(5, 10))
-        self.audio_log_text.insert("1.0", "Paste audio URLs here (YouTube, SoundCloud, etc.), one per line.\n\n")
         self._log_widgets["AUDIO"] = self.audio_log_text
 
         # Right-click menu
@@ -1232,6 +4447,68 @@ class kexisdownloader(ctk.CTk):
         text_widget.bind("<Button-2>", show_menu)  # Right-click on Mac
         text_widget.bind("<Control-Button-1>", show_menu)  # Ctrl+click
 
+    # ------------------------------------------------------------------
+    def _build_url_input(self, parent, tag: str) -> tk.Text:
+        """URL box feeding the tab's UrlQueue, with a queue status line."""
+        text = tk.Text(
+            parent,
+            wrap="none",
+            height=5,
+            font=("SF Mono", 11),
+            bg="#1E1E1E" if ctk.get_appearance_mode() == "Dark" else "#F5F0E8",
+            fg="#A8FF60" if ctk.get_appearance_mode() == "Dark" else "#5A524A",
+            relief="flat",
+            borderwidth=0,
+            insertbackground="#A8FF60",
+            selectbackground="#3A3A3A",
+            undo=True,
+            padx=10,
+            pady=10
+        )
+        text.pack(fill="x", padx=15, pady=(5, 0))
+
+        status = ctk.CTkLabel(parent, text="", font=ctk.CTkFont(size=11), text_color="gray")
+        status.pack(anchor="w", padx=15, pady=(2, 5))
+
+        self._url_inputs[tag] = text
+        self._queue_labels[tag] = status
+        for sequence in ("<<Paste>>", "<KeyRelease>", "<ButtonRelease-1>"):
+            text.bind(sequence, lambda e, t=tag: self._schedule_url_sync(t), add="+")
+        self._update_queue_label(tag)
+        return text
+
+    def _schedule_url_sync(self, tag: str):
+        """Debounce edits so a paste of many lines is parsed once."""
+        pending = self._url_sync_after.get(tag)
+        if pending:
+            self.after_cancel(pending)
+        self._url_sync_after[tag] = self.after(PREFETCH_SETTINGS["debounce_ms"], lambda: self._sync_url_queue(tag))
+
+    def _sync_url_queue(self, tag: str):
+        """Re-read the URL box into the queue; the line under the cursor is the selection."""
+        pending = self._url_sync_after.pop(tag, None)
+        if pending:
+            self.after_cancel(pending)
+        text = self._url_inputs[tag]
+        queue_ = self.url_queues[tag]
+        queue_.set_typed(text.get("1.0", "end-1c").splitlines())
+        current_line = text.get("insert linestart", "insert lineend")
+        queue_.select(next(iter(import_urls([current_line]).urls), None))
+        self._update_queue_label(tag)
+        # Resolve formats before the user asks for them
+        PREFETCHER.schedule(queue_.urls()[:PREFETCH_SETTINGS["max_urls"]])
+
+    def _update_queue_label(self, tag: str):
+        queue_ = self.url_queues[tag]
+        parts = [f"🔗 {len(queue_)} URL(s) queued" if len(queue_) else "🔗 No URLs queued"]
+        if queue_.imported_ids:
+            parts.append(f"📥 {len(queue_.imported_ids)} imported")
+        if queue_.last_input and queue_.last_input.malformed:
+            parts.append(f"⚠️ {queue_.last_input.malformed} line(s) without a supported URL")
+        if queue_.last_input and queue_.last_input.duplicates:
+            parts.append(f"♊ {queue_.last_input.duplicates} duplicate(s)")
+        self._queue_labels[tag].configure(text="  •  ".join(parts))
+
     # ------------------------------------------------------------------
     def _copy_log(self, widget):
         """Copy log contents to clipboard."""
@@ -1296,6 +4573,20 @@ class kexisdownloader(ctk.CTk):
         for widget in self._log_widgets. values():
             widget.configure(bg=bg, fg=fg)
 
+    # ------------------------------------------------------------------
+    def _poll_background(self):
+        """Show how many background tasks are running and queued."""
+        stats = BACKGROUND.stats()
+        running, queued = len(stats["running"]), sum(stats["queued"].values())
+        if running or queued:
+            text = f"🧵 {running}/{stats['workers']} busy"
+            if queued:
+                text += f", {queued} queued"
+        else:
+            text = ""
+        self.background_label.configure(text=text)
+        self.after(500, self._poll_background)
+
     # ------------------------------------------------------------------
     def _poll_log(self):
         """Poll the log queue and update UI."""
@@ -1341,8 +4632,9 @@ class kexisdownloader(ctk.CTk):
     # ------------------------------------------------------------------
     def _start_video(self):
         """Start video download."""
-        content = self.video_log_text.get("1.0", "end-1c")
-        urls = clean_list(content)
+        self._sync_url_queue("VIDEO")
+        urls = self.url_queues["VIDEO"].take()
+        self._update_queue_label("VIDEO")
         if not urls:
             messagebox.showerror("Error", "No video URLs entered.")
             return
@@ -1355,28 +4647,33 @@ class kexisdownloader(ctk.CTk):
         self.video_log_text.insert("end", "=" * 60 + "\n")
         self.video_log_text.see("end")
 
+        choice = FormatChoice.from_selection(self.selected_format) if self.selected_format else None
+        if choice:
+            self.video_log_text.insert("end", "\n" + "=" * 60 + "\n")
+            self.video_log_text.insert("end", "🎯 USING SMART-SELECTED FORMAT\n")
+            self.video_log_text.insert("end", f"Resolution: {self.selected_format['resolution']}\n")
+            self.video_log_text.insert("end", f"Video: {self.selected_format['video_codec']} ({self.selected_format['video_id']})\n")
+            self.video_log_text.insert("end", f"Audio: {self.selected_format['audio_codec']} ({self.selected_format['audio_id']})\n")
+            self.video_log_text.insert("end", f"Format String: {self.selected_format['format_string']}\n")
+            if len(urls) > 1:
+                self.video_log_text.insert("end", f"Other URLs: closest match to {choice.label()} per video\n")
+            self.video_log_text.insert("end", "=" * 60 + "\n")
+            self.video_log_text.see("end")
+
         jobs:  List[Tuple[str, dict]] = []
         for u in urls:
-            # Use smart-selected format if available, otherwise use best quality
-            if self.selected_format:
-                self.video_log_text.insert("end", "\n" + "=" * 60 + "\n")
-                self.video_log_text.insert("end", "🎯 USING SMART-SELECTED FORMAT\n")
-                self.video_log_text.insert("end", f"Resolution: {self.selected_format['resolution']}\n")
-                self.video_log_text.insert("end", f"Video: {self.selected_format['video_codec']} ({self.selected_format['video_id']})\n")
-                self.video_log_text.insert("end", f"Audio: {self.selected_format['audio_codec']} ({self.selected_format['audio_id']})\n")
-                self.video_log_text.insert("end", f"Format String: {self.selected_format['format_string']}\n")
-                self.video_log_text.insert("end", "=" * 60 + "\n")
-                self.video_log_text.see("end")
-                
+            if choice:
+                # Smart-selected format: plan_batch resolves it per URL
                 jobs.append(
                     (
                         u,
                         dict(
                             out=out_folder,
                             audio=False,
-                            video_id=self.selected_format['format_string'],
-                            audio_id=None,  # Already included in format_string
+                            video_id=choice.selector(),
+                            audio_id=None,
                             cookies_path=cookies_path,
+                            format_choice=choice,
                         ),
                     )
                 )
@@ -1395,18 +4692,14 @@ class kexisdownloader(ctk.CTk):
                     )
                 )
 
-        w = DownloadWorker(jobs, tag="VIDEO")
-        self.video_workers = [w]
-        w.start()
-
-        # Show open folder button after completion
-        self.after(2000, self._check_download_complete)
+        self._plan_and_start(jobs, out_folder, tag="VIDEO")
 
     # ------------------------------------------------------------------
     def _start_audio(self):
         """Start audio download."""
-        content = self.audio_log_text. get("1.0", "end-1c")
-        urls = clean_list(content)
+        self._sync_url_queue("AUDIO")
+        urls = self.url_queues["AUDIO"].take()
+        self._update_queue_label("AUDIO")
         if not urls:
             messagebox.showerror("Error", "No audio URLs entered.")
             return
@@ -1433,10 +4726,95 @@ class kexisdownloader(ctk.CTk):
                 )
             )
 
-        w = DownloadWorker(jobs, tag="AUDIO")
-        self.audio_workers = [w]
-        w. start()
+        self._plan_and_start(jobs, out_folder, tag="AUDIO")
+
+    # ------------------------------------------------------------------
+    def _import_url_file(self):
+        """Import a URL list (txt/csv) into the current tab's queue."""
+        path = filedialog.askopenfilename(
+            title="Import URLs",
+            filetypes=[("URL lists", "*.txt *.csv *.list"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        self.start_import("VIDEO" if "Video" in self.tabview.get() else "AUDIO", path)
+
+    def start_import(self, tag: str, source: str):
+        """Read a URL list (``-`` = stdin) in the background, then queue it for ``tag``."""
+
+        def done(future: Future):
+            try:
+                result = future.result()
+            except Exception as exc:
+                ui_append(tag, f"❌ Import of {source} failed: {exc}")
+                return
+            self.after(0, lambda: self.add_imported_urls(tag, result))
+
+        # A snapshot: the queue's own set is only touched on the Tk thread
+        seen = set(self.url_queues[tag].imported_ids)
+        BACKGROUND.submit(
+            import_url_file, source, seen=seen, priority=PRIORITY_INTERACTIVE, label="import"
+        ).add_done_callback(done)
+
+    def add_imported_urls(self, tag: str, result: UrlImport):
+        """Queue imported URLs for the next download of ``tag`` (Tk thread)."""
+        self.url_queues[tag].add_imported(result)
+        ui_append(tag, result.summary())
+        self._update_queue_label(tag)
+        PREFETCHER.schedule(result.urls[:PREFETCH_SETTINGS["max_urls"]])
+
+    # ------------------------------------------------------------------
+    def _plan_and_start(self, jobs: List[Tuple[str, dict]], out_folder: Path, *, tag: str):
+        """Run the pre-flight plan off the Tk thread, then start the worker."""
+        ui_append(tag, f"🧮 Planning {len(jobs)} job(s): resolving formats and checking disk space...")
+
+        def report_dead(url: str, reason: str):
+            ui_append(tag, f"💀 Unavailable, skipping {url}: {reason}")
+
+        def worker():
+            plan = plan_batch(jobs, out_folder, on_dead=report_dead)
+            self.after(0, lambda: self._start_planned(plan, tag))
+
+        BACKGROUND.submit(worker, priority=PRIORITY_BULK, label=f"plan {tag.lower()}")
+
+    # ------------------------------------------------------------------
+    def _start_planned(self, plan: BatchPlan, tag: str):
+        """Start the download worker for the jobs that fit on disk."""
+        ui_append(tag, plan.summary())
+
+        if plan.dead and not plan.jobs and not plan.refused:
+            messagebox.showwarning(
+                "Nothing to Download",
+                f"All {len(plan.dead)} URL(s) are unavailable (deleted, private or blocked)."
+            )
+            ui_append(tag, "\n=== CANCELLED ===\n")
+            return
+
+        if plan.refused:
+            if not plan.jobs:
+                messagebox.showerror(
+                    "Not Enough Disk Space",
+                    f"None of the {len(plan.refused)} job(s) fit in the free space "
+                    f"({human_size(plan.free_bytes)}).\n\nFree some space or choose another folder."
+                )
+                ui_append(tag, "\n=== CANCELLED ===\n")
+                return
+            if not messagebox.askyesno(
+                "Not Enough Disk Space",
+                f"{len(plan.refused)} job(s) would not fit in the free space "
+                f"({human_size(plan.free_bytes)}).\n\nDownload the {len(plan.jobs)} job(s) that fit?"
+            ):
+                ui_append(tag, "\n=== CANCELLED ===\n")
+                return
+
+        w = DownloadWorker(plan.jobs, tag=tag)
+        if tag == "VIDEO":
+            self.video_workers = [w]
+        else:
+            self.audio_workers = [w]
+        w.start()
 
+        # Show open folder button after completion
         self.after(2000, self._check_download_complete)
 
     # ------------------------------------------------------------------
@@ -1481,14 +4859,12 @@ class kexisdownloader(ctk.CTk):
     # ------------------------------------------------------------------
     def _show_smart_selector(self):
         """Show the smart format selector window."""
-        content = self.video_log_text.get("1.0", "end-1c")
-        urls = [line.strip() for line in content.splitlines() if line.strip() and URL_RE.match(line.strip())]
-        
-        if not urls:
+        self._sync_url_queue("VIDEO")
+        url = self.url_queues["VIDEO"].current()
+        if not url:
             messagebox.showerror("No URL", "Please paste a video URL first (YouTube, TikTok, Facebook, Instagram).")
             return
-        
-        url = urls[0]
+
         try:
             platform = detect_platform(url)
             window = SmartFormatSelectorWindow(self, url)
@@ -1505,16 +4881,11 @@ class kexisdownloader(ctk.CTk):
     def _show_format_checker(self):
         """Show the format checker window."""
         # Get URL from current tab
-        current_tab = self.tabview. get()
-        if "Video" in current_tab: 
-            content = self.video_log_text.get("1.0", "end-1c")
-        else:
-            content = self. audio_log_text.get("1.0", "end-1c")
-
-        urls = [line.strip() for line in content. splitlines() if line.strip() and URL_RE.match(line. strip())]
-        url = urls[0] if urls else ""
+        tag = "VIDEO" if "Video" in self.tabview.get() else "AUDIO"
+        self._sync_url_queue(tag)
+        queue_ = self.url_queues[tag]
 
-        FormatCheckerWindow(self, url)
+        FormatCheckerWindow(self, queue_.current() or "", batch_urls=queue_.urls())
 
     # ------------------------------------------------------------------
     def _open_downloads_folder(self):
@@ -1555,6 +4926,127 @@ class kexisdownloader(ctk.CTk):
         )
 
 
+# ----------------------------------------------------------------------
+# Virtualized format list
+# ----------------------------------------------------------------------
+class VirtualFormatList(ctk.CTkFrame):
+    """Scrollable list that only keeps widgets for the rows on screen.
+
+    Rows are ``("header", text)`` or ``("format", text, on_click)`` tuples
+    of one fixed height. A small pool of labels and buttons is moved and
+    relabelled as the list scrolls, so hundreds of formats cost about as
+    much as one screenful, and ``append`` can grow the list while it is
+    being shown.
+    """
+
+    ROW_HEIGHT = 40
+
+    def __init__(self, master: Any, *, label_text: str = "", **kwargs: Any) -> None:
+        super().__init__(master, **kwargs)
+        if label_text:
+            ctk.CTkLabel(self, text=label_text, font=ctk.CTkFont(size=13, weight="bold")).pack(
+                side="top", fill="x", padx=10, pady=(8, 0)
+            )
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._yview)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 5), pady=8)
+        self.canvas = tk.Canvas(
+            self,
+            bg="#2B2B2B" if ctk.get_appearance_mode() == "Dark" else "#DBDBDB",
+            highlightthickness=0,
+            borderwidth=0,
+            yscrollincrement=self.ROW_HEIGHT,
+            yscrollcommand=self.scrollbar.set,
+        )
+        self.canvas.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=8)
+
+        self.rows: List[Tuple[Any, ...]] = []
+        # kind -> [(canvas item, widget)], reused across renders
+        self._pool: Dict[str, List[Tuple[int, Any]]] = {"header": [], "format": []}
+        self.canvas.bind("<Configure>", lambda e: self._refresh())
+        self._bind_wheel(self.canvas)
+
+    def append(self, rows: List[Tuple[Any, ...]]) -> None:
+        self.rows.extend(rows)
+        self._refresh()
+
+    def clear(self) -> None:
+        self.rows = []
+        self.canvas.yview_moveto(0)
+        self._refresh()
+
+    def _refresh(self) -> None:
+        self.canvas.configure(
+            scrollregion=(0, 0, self.canvas.winfo_width(), len(self.rows) * self.ROW_HEIGHT)
+        )
+        self._render()
+
+    def _yview(self, *args: Any) -> None:
+        self.canvas.yview(*args)
+        self._render()
+
+    def _scroll(self, units: int) -> None:
+        if len(self.rows) * self.ROW_HEIGHT > self.canvas.winfo_height():
+            self.canvas.yview_scroll(units, "units")
+            self._render()
+
+    def _on_wheel(self, event: Any) -> None:
+        delta = event.delta if sys.platform == "darwin" else event.delta // 120
+        self._scroll(-delta or (-1 if event.delta > 0 else 1))
+
+    def _bind_wheel(self, widget: Any) -> None:
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", lambda e: self._scroll(-1), add="+")
+        widget.bind("<Button-5>", lambda e: self._scroll(1), add="+")
+
+    def _widget(self, kind: str, index: int) -> Tuple[int, Any]:
+        pool = self._pool[kind]
+        if index < len(pool):
+            return pool[index]
+        if kind == "header":
+            widget = ctk.CTkLabel(self.canvas, text="", anchor="w", font=ctk.CTkFont(size=16, weight="bold"))
+        else:
+            widget = ctk.CTkButton(
+                self.canvas,
+                text="",
+                anchor="w",
+                font=ctk.CTkFont(size=13),
+                fg_color="transparent",
+                hover_color="#9B59B6",
+                corner_radius=8,
+            )
+        self._bind_wheel(widget)
+        item = self.canvas.create_window(0, -self.ROW_HEIGHT, window=widget, anchor="nw",
+                                         height=self.ROW_HEIGHT - 4)
+        pool.append((item, widget))
+        return pool[-1]
+
+    def _render(self) -> None:
+        """Place pooled widgets on the visible rows; park the rest above the list."""
+        top = int(self.canvas.canvasy(0))
+        first = max(0, top // self.ROW_HEIGHT)
+        last = min(len(self.rows), (top + self.canvas.winfo_height()) // self.ROW_HEIGHT + 1)
+        width = max(self.canvas.winfo_width() - 10, 1)
+
+        used = {"header": 0, "format": 0}
+        for index in range(first, last):
+            row = self.rows[index]
+            kind = row[0]
+            item, widget = self._widget(kind, used[kind])
+            used[kind] += 1
+            if kind == "header":
+                widget.configure(text=row[1])
+                x = 0
+            else:
+                widget.configure(text=row[1], command=row[2])
+                x = 10
+            self.canvas.coords(item, x, index * self.ROW_HEIGHT + 2)
+            self.canvas.itemconfigure(item, width=width - x)
+
+        for kind, pool in self._pool.items():
+            for item, _ in pool[used[kind]:]:
+                self.canvas.coords(item, 0, -2 * self.ROW_HEIGHT)
+
+
 # ----------------------------------------------------------------------
 # Smart Format Selector Window
 # ----------------------------------------------------------------------
@@ -1564,6 +5056,9 @@ class SmartFormatSelectorWindow(ctk.CTkToplevel):
     def __init__(self, parent: "kexisdownloader", url: str):
         super().__init__(parent)
 
+        # Cancelled when the window closes so fetches don't outlive it
+        self.cancel_token = CancelToken()
+        self.fetch_future: Optional[Future] = None
         self.parent_app = parent
         self.url = url
         self.platform = detect_platform(url)
@@ -1641,13 +5136,67 @@ class SmartFormatSelectorWindow(ctk.CTkToplevel):
         self.is_loading = True
         self._update_loading_animation()
 
-        # Scrollable format list
-        self.formats_frame = ctk.CTkScrollableFrame(
+        # Bandwidth budget: pick from real format sizes/bitrates
+        budget_frame = ctk.CTkFrame(self, corner_radius=15)
+        budget_frame.pack(fill="x", padx=20, pady=(0, 10))
+
+        ctk.CTkLabel(
+            budget_frame,
+            text="💾 Budget:",
+            font=ctk.CTkFont(size=13, weight="bold")
+        ).pack(side="left", padx=(15, 10), pady=10)
+
+        self.budget_mode_var = ctk.StringVar(value="Smallest")
+        ctk.CTkOptionMenu(
+            budget_frame,
+            variable=self.budget_mode_var,
+            values=["Smallest", "Best"],
+            width=110,
+            height=32,
+            corner_radius=8
+        ).pack(side="left", padx=5)
+
+        ctk.CTkLabel(budget_frame, text="≥", font=ctk.CTkFont(size=13)).pack(side="left", padx=(5, 0))
+
+        self.budget_floor_var = ctk.StringVar(value="1080p")
+        ctk.CTkOptionMenu(
+            budget_frame,
+            variable=self.budget_floor_var,
+            values=list(QUALITY_FLOORS),
+            width=120,
+            height=32,
+            corner_radius=8
+        ).pack(side="left", padx=5)
+
+        self.budget_size_entry = ctk.CTkEntry(
+            budget_frame,
+            placeholder_text="Max size (e.g. 500 MB)",
+            width=170,
+            height=32,
+            corner_radius=8
+        )
+        self.budget_size_entry.pack(side="left", padx=5)
+
+        self.auto_pick_button = ctk.CTkButton(
+            budget_frame,
+            text="⚡ Auto-Pick",
+            width=120,
+            height=32,
+            corner_radius=8,
+            fg_color="#9B59B6",
+            hover_color="#8E44AD",
+            command=self._auto_pick
+        )
+        self.auto_pick_button.pack(side="left", padx=(5, 15))
+
+        # Scrollable format list (only visible rows have widgets)
+        self.format_list = VirtualFormatList(
             self,
             corner_radius=15,
             label_text="📋 Available Formats (8K → 720p)"
         )
-        self.formats_frame.pack(fill="both", expand=True, padx=20, pady=(0, 10))
+        self.format_list.pack(fill="both", expand=True, padx=20, pady=(0, 10))
+        self.retry_button: Optional[ctk.CTkButton] = None
 
         # Bottom buttons
         button_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -1677,7 +5226,9 @@ class SmartFormatSelectorWindow(ctk.CTkToplevel):
         self.confirm_button.pack(side="left", fill="x", expand=True)
 
         # Start fetching formats
-        threading.Thread(target=self._fetch_formats, daemon=True).start()
+        self.fetch_future = BACKGROUND.submit(
+            self._fetch_formats, priority=PRIORITY_INTERACTIVE, label="smart selector"
+        )
 
     # ------------------------------------------------------------------
     def _update_loading_animation(self):
@@ -1692,10 +5243,20 @@ class SmartFormatSelectorWindow(ctk.CTkToplevel):
         self.loading_dots += 1
         self.after(400, self._update_loading_animation)
 
+    # ------------------------------------------------------------------
+    def destroy(self):
+        """Kill in-flight fetches before the window goes away."""
+        self.cancel_token.cancel()
+        if self.fetch_future is not None:
+            self.fetch_future.cancel()
+        super().destroy()
+
     # ------------------------------------------------------------------
     def _fetch_formats(self):
         """Fetch formats in background thread."""
-        self.formats_data = fetch_video_formats(self.url)
+        self.formats_data = fetch_video_formats(self.url, cancel=self.cancel_token)
+        if self.cancel_token.cancelled:
+            return
         self.is_loading = False
         self.after(0, self._display_formats)
 
@@ -1709,8 +5270,8 @@ class SmartFormatSelectorWindow(ctk.CTkToplevel):
             )
             
             # Add retry button
-            retry_button = ctk.CTkButton(
-                self.formats_frame,
+            self.retry_button = ctk.CTkButton(
+                self.format_list,
                 text="🔄 Retry",
                 height=40,
                 corner_radius=10,
@@ -1719,7 +5280,14 @@ class SmartFormatSelectorWindow(ctk.CTkToplevel):
                 font=ctk.CTkFont(size=14, weight="bold"),
                 command=self._retry_fetch
             )
-            retry_button.pack(pady=20)
+            self.retry_button.pack(before=self.format_list.scrollbar, side="top", pady=20)
+            return
+
+        if not any(self.formats_data.values()):
+            self.status_label.configure(
+                text="⚠️ No video formats found (720p–8K)",
+                text_color="#F39C12"
+            )
             return
 
         self.status_label.configure(
@@ -1727,66 +5295,45 @@ class SmartFormatSelectorWindow(ctk.CTkToplevel):
             text_color="#27AE60"
         )
 
-        # Display formats grouped by resolution
-        for resolution in ["8K (4320p)", "4K (2160p)", "1440p", "1080p", "720p"]:
-            if resolution not in self.formats_data:
-                continue
-
-            formats = self.formats_data[resolution]
-            if not formats:
-                continue
-
-            # Resolution header
-            res_header = ctk.CTkFrame(self.formats_frame, corner_radius=10)
-            res_header.pack(fill="x", pady=(10, 5), padx=5)
-
-            ctk.CTkLabel(
-                res_header,
-                text=f"🎬 {resolution}",
-                font=ctk.CTkFont(size=16, weight="bold")
-            ).pack(anchor="w", padx=15, pady=10)
+        # One resolution group per Tk event, so the first rows show at once
+        # and the window stays responsive while the rest are added
+        groups = [r for r in ["8K (4320p)", "4K (2160p)", "1440p", "1080p", "720p"] if self.formats_data.get(r)]
+        self._add_format_groups(groups)
 
-            # Format items (grouped by video codec)
-            codecs_seen = set()
-            for fmt in formats:
-                video_codec = fmt["video_codec"]
-                
-                # Only show first audio option per video codec to reduce clutter
-                if video_codec in codecs_seen:
-                    continue
-                codecs_seen.add(video_codec)
-
-                format_frame = ctk.CTkFrame(self.formats_frame, corner_radius=8)
-                format_frame.pack(fill="x", pady=2, padx=10)
-
-                # Make frame clickable
-                format_button = ctk.CTkButton(
-                    format_frame,
-                    text=f"{fmt['video_codec']} • {fmt['format_string']} ({fmt['audio_codec']} {fmt['audio_bitrate']}kbps)",
-                    font=ctk.CTkFont(size=13),
-                    anchor="w",
-                    fg_color="transparent",
-                    hover_color="#9B59B6",
-                    command=lambda f=fmt, r=resolution: self._select_format(f, r)
-                )
-                format_button.pack(fill="x", padx=5, pady=5)
+    # ------------------------------------------------------------------
+    def _add_format_groups(self, groups: List[str]):
+        """Append the next resolution group to the list and schedule the rest."""
+        if not groups or not self.winfo_exists():
+            return
+        resolution = groups[0]
+        rows: List[Tuple[Any, ...]] = [("header", f"🎬 {resolution}")]
 
-                # Store reference for highlighting
-                format_button._format_data = fmt
-                format_button._resolution = resolution
+        # Only show first audio option per video codec to reduce clutter
+        codecs_seen = set()
+        for fmt in self.formats_data[resolution]:
+            if fmt["video_codec"] in codecs_seen:
+                continue
+            codecs_seen.add(fmt["video_codec"])
+            rows.append((
+                "format",
+                f"{fmt['video_codec']} • {fmt['format_string']} ({fmt['audio_codec']} {fmt['audio_bitrate']}kbps)",
+                lambda f=fmt, r=resolution: self._select_format(f, r),
+            ))
 
-        if not any(self.formats_data.values()):
-            self.status_label.configure(
-                text="⚠️ No video formats found (720p–8K)",
-                text_color="#F39C12"
-            )
+        self.format_list.append(rows)
+        self.after(1, lambda: self._add_format_groups(groups[1:]))
 
     # ------------------------------------------------------------------
     def _retry_fetch(self):
         """Retry fetching formats."""
-        # Clear formats frame
-        for widget in self.formats_frame.winfo_children():
-            widget.destroy()
+        if self.fetch_future is not None and not self.fetch_future.done():
+            # The previous fetch is still queued or running
+            return
+        # Clear format list
+        if self.retry_button:
+            self.retry_button.destroy()
+            self.retry_button = None
+        self.format_list.clear()
         
         # Reset loading state
         self.is_loading = True
@@ -1798,12 +5345,61 @@ class SmartFormatSelectorWindow(ctk.CTkToplevel):
         self._update_loading_animation()
         
         # Start fetch
-        threading.Thread(target=self._fetch_formats, daemon=True).start()
+        self.fetch_future = BACKGROUND.submit(
+            self._fetch_formats, priority=PRIORITY_INTERACTIVE, label="smart selector"
+        )
+
+    # ------------------------------------------------------------------
+    def _auto_pick(self):
+        """Rank the real formats against the budget and select the winner."""
+        budget_text = self.budget_size_entry.get().strip()
+        max_bytes = parse_size(budget_text) if budget_text else None
+        if budget_text and max_bytes is None:
+            messagebox.showerror("Invalid Budget", "Enter a size like 500, 500 MB or 1.5 GB.")
+            return
+
+        min_height = QUALITY_FLOORS.get(self.budget_floor_var.get(), 0)
+        prefer = self.budget_mode_var.get().lower()
+
+        self.auto_pick_button.configure(state="disabled")
+        self.status_label.configure(
+            text="⏳ Ranking formats by size and bitrate...",
+            text_color="#F39C12"
+        )
+
+        def worker():
+            choice = select_format_by_budget(
+                self.url, min_height=min_height, max_bytes=max_bytes, prefer=prefer,
+                cancel=self.cancel_token,
+            )
+            if self.cancel_token.cancelled:
+                return
+            self.after(0, lambda: self._apply_auto_pick(choice))
+
+        BACKGROUND.submit(worker, priority=PRIORITY_INTERACTIVE, label="budget pick")
+
+    # ------------------------------------------------------------------
+    def _apply_auto_pick(self, choice: Optional[Dict[str, Any]]):
+        """Show the budget pick result on the Tk thread."""
+        self.auto_pick_button.configure(state="normal")
+        if not choice:
+            self.status_label.configure(
+                text="⚠️ No format matches that quality floor and budget",
+                text_color="#F39C12"
+            )
+            return
+
+        self._select_format(choice, choice["resolution"])
+        self.status_label.configure(
+            text=f"✅ Auto-picked: {choice['resolution']} {choice['display']}",
+            text_color="#27AE60"
+        )
 
     # ------------------------------------------------------------------
     def _select_format(self, fmt: Dict[str, str], resolution: str):
         """Handle format selection."""
         self.selected_format = {
+            "url": self.url,
             "resolution": resolution,
             "video_id": fmt["video_id"],
             "video_codec": fmt["video_codec"],
@@ -1852,15 +5448,129 @@ class SmartFormatSelectorWindow(ctk.CTkToplevel):
         self.destroy()
 
 
+# ----------------------------------------------------------------------
+# Format Checker table
+# ----------------------------------------------------------------------
+class FormatTable:
+    """``yt-dlp -F`` output parsed once, line by line, into filter indexes.
+
+    Each format row is classified when it arrives and its position is
+    recorded under every filter it passes, so switching filters only
+    joins the rows already listed for that filter.
+    """
+
+    FILTERS = ("all", "audio", "high_audio", "highest_audio", "video")
+    AUDIO_FILTERS = {"audio", "high_audio", "highest_audio"}
+
+    def __init__(self) -> None:
+        self.preamble: List[str] = []      # lines before and including the table header
+        self.has_header = False
+        self.rows: List[str] = []          # display text, with quality indicator
+        self.index: Dict[str, List[int]] = {name: [] for name in self.FILTERS}
+        self.best_audio: Dict[str, Tuple[int, str]] = {}   # filter -> (bitrate, raw line)
+        self._separator_pending = False
+
+    def feed(self, line: str) -> Optional[int]:
+        """Add one output line; returns the new row's position, if it is a format row."""
+        if not self.has_header:
+            self.preamble.append(line)
+            if "ID" in line and "EXT" in line and "RESOLUTION" in line:
+                self.has_header = True
+                self._separator_pending = True
+            return None
+        if self._separator_pending:
+            # The dashed line under the header
+            self._separator_pending = False
+            self.preamble.append(line)
+            return None
+        record = FormatRecord.from_line(line)
+        if record is None:
+            return None
+
+        bitrate = record.bitrate
+        is_audio = record.kind == "audio"
+        is_video = record.kind == "video"
+
+        # Add quality indicator
+        indicator = ""
+        if is_audio:
+            if bitrate >= 480:
+                indicator = " 🟢 EXCELLENT"
+            elif bitrate >= 256:
+                indicator = " 🟡 VERY GOOD"
+            elif bitrate >= 160:
+                indicator = " 🟠 GOOD"
+            else:
+                indicator = " 🔴 MEDIUM"
+
+        position = len(self.rows)
+        self.rows.append(line + indicator)
+        matched = ["all"]
+        if is_audio:
+            matched.append("audio")
+            if bitrate >= 256:
+                matched.append("high_audio")
+            if bitrate >= 480:
+                matched.append("highest_audio")
+        if is_video:
+            matched.append("video")
+        for name in matched:
+            self.index[name].append(position)
+            if name in self.AUDIO_FILTERS:
+                self.best_audio[name] = max(self.best_audio.get(name, (0, "")), (bitrate, line))
+        return position
+
+    def matches(self, position: int, filter_type: str) -> bool:
+        index = self.index[filter_type]
+        return bool(index) and index[-1] == position
+
+    def render(self, filter_type: str) -> str:
+        """Table text for ``filter_type`` (raw output if no table was found)."""
+        if not self.has_header:
+            return "\n".join(self.preamble)
+        result = self.preamble + [self.rows[i] for i in self.index[filter_type]]
+
+        # Audio summary
+        best = self.best_audio.get(filter_type)
+        if filter_type in self.AUDIO_FILTERS and best:
+            max_br, best_line = best
+            result.append("\n" + "=" * 80)
+            result.append("📊 AUDIO QUALITY SUMMARY:")
+            result.append("=" * 80)
+            result.append(f"🎵 Highest available bitrate: {max_br} kbps")
+            if max_br >= 480:
+                result.append("✅ EXCELLENT – near YouTube's max (512 kbps 5.1)")
+            elif max_br >= 256:
+                result.append("✅ VERY GOOD – high-quality stereo (max 384 kbps)")
+            elif max_br >= 160:
+                result.append("✓ GOOD – standard quality")
+            else:
+                result.append("⚠ MEDIUM – lower-quality audio")
+
+            result.append(f"\n📋 Found {len(self.index[filter_type])} audio format(s)")
+            result.append(f"\n💡 Recommended:  Use format ID {best_line.split()[0]} for best quality")
+
+        return "\n".join(result)
+
+
 # ----------------------------------------------------------------------
 # Format Checker Window
 # ----------------------------------------------------------------------
 class FormatCheckerWindow(ctk.CTkToplevel):
     """Format checker window with all your original features + enhancements."""
 
-    def __init__(self, parent, default_url=""):
+    def __init__(self, parent, default_url="", batch_urls: Optional[List[str]] = None):
         super().__init__(parent)
 
+        # Replaced per fetch; cancelled on a new fetch or when the window closes
+        self.cancel_token = CancelToken()
+        self.fetch_future: Optional[Future] = None
+        self.batch_futures: List[Future] = []
+
+        # Batch mode: URLs from the main window, results as they arrive
+        self.batch_urls = batch_urls or []
+        self.batch_results: List[Tuple[str, Dict[str, Any]]] = []
+
         self.title("🔍 Format Checker - kexi's Downloader Pro")
         self.geometry("1100x750")
         self.minsize(900, 600)
@@ -1908,6 +5618,18 @@ class FormatCheckerWindow(ctk.CTkToplevel):
             command=self._fetch_formats
         ).pack(side="left")
 
+        ctk.CTkButton(
+            url_input_frame,
+            text="📚 Batch Check",
+            width=130,
+            height=40,
+            corner_radius=10,
+            fg_color="#8E44AD",
+            hover_color="#7D3C98",
+            font=ctk.CTkFont(size=13, weight="bold"),
+            command=self._fetch_batch
+        ).pack(side="left", padx=(10, 0))
+
         # Filter controls
         filter_frame = ctk.CTkFrame(self, corner_radius=15)
         filter_frame.pack(fill="x", padx=20, pady=(0, 10))
@@ -1937,6 +5659,22 @@ class FormatCheckerWindow(ctk.CTkToplevel):
                 command=self._apply_filter
             ).pack(side="left", padx=5)
 
+        # Batch export
+        ctk.CTkButton(
+            filter_frame,
+            text="💾 Export",
+            width=90,
+            command=self._export_batch
+        ).pack(side="right", padx=(5, 15), pady=10)
+
+        self.export_var = ctk.StringVar(value="JSON Lines")
+        ctk.CTkOptionMenu(
+            filter_frame,
+            values=["JSON Lines", "CSV", "Format Matrix"],
+            variable=self.export_var,
+            width=140
+        ).pack(side="right", pady=10)
+
         # Info label
         info_frame = ctk.CTkFrame(self, fg_color="transparent")
         info_frame.pack(fill="x", padx=20)
@@ -1968,7 +5706,17 @@ class FormatCheckerWindow(ctk.CTkToplevel):
         # Add context menu
         self._add_context_menu()
 
-        self.raw_output = ""
+        # Rows of the current single-URL check, filled as yt-dlp prints them
+        self.format_table: Optional[FormatTable] = None
+
+    # ------------------------------------------------------------------
+    def destroy(self):
+        """Kill any in-flight fetch before the window goes away."""
+        self.cancel_token.cancel()
+        for future in [self.fetch_future] + self.batch_futures:
+            if future is not None:
+                future.cancel()
+        super().destroy()
 
     # ------------------------------------------------------------------
     def _add_context_menu(self):
@@ -2013,139 +5761,168 @@ class FormatCheckerWindow(ctk.CTkToplevel):
         self.results_text.delete("1.0", "end")
         self.results_text.insert("1.0", "⏳ Fetching formats from YouTube...\n\n")
 
+        # Abandon any fetch still running for a previous URL
+        self.cancel_token.cancel()
+        token = self.cancel_token = CancelToken()
+        table = self.format_table = FormatTable()
+
         def worker():
-            cmd = [YTDLP_EXE, "--remote-components", "ejs:github", "--cookies-from-browser", "chrome", "-F", url]
+            cmd = [YTDLP_EXE, "--remote-components", "ejs:github", "--cookies-from-browser", "chrome"]
+            cmd.extend(extraction_args(url, "listing"))
+            cmd.extend(["-F", url])
             print("🍪 Using Chrome cookies for YouTube")
 
             try:
-                creation_flags = 0
-                if os.name == "nt": 
-                    creation_flags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
-
-                # Set up environment for bundled app
-                env = os.environ.copy()
-                if getattr(sys, "frozen", False):
-                    bundle_dir = Path(sys.executable).parent
-                    resources_dir = bundle_dir.parent / "Resources"
-                    env["PYTHONHOME"] = str(resources_dir)
-                    env["PYTHONPATH"] = str(resources_dir / "lib" / "python3.13")
-
-                proc = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    encoding="utf-8",
-                    errors="replace",
-                    creationflags=creation_flags,
-                    env=env,
+                run_ytdlp_capture(
+                    cmd, FORMAT_CHECK_TIMEOUT, token,
+                    on_line=lambda line: self.after(0, lambda: self._add_format_line(table, line)),
                 )
-
-                raw_lines = []
-                if proc.stdout:
-                    for ln in proc.stdout:
-                        raw_lines.append(ln. rstrip())
-
-                self.raw_output = "\n".join(raw_lines)
-                self.after(0, self._apply_filter)
-                proc.wait()
+                self.after(0, lambda: self._finish_format_table(table))
+            except FetchCancelled:
+                return
+            except subprocess.TimeoutExpired:
+                if token.cancelled:
+                    return
+                self.after(0, lambda: self.results_text.insert(
+                    "end", f"\n⏱️ Timed out after {FORMAT_CHECK_TIMEOUT}s\n"
+                ))
             except Exception as exc:
+                if token.cancelled:
+                    return
                 error_msg = str(exc)
                 self.after(0, lambda msg=error_msg: self.results_text.insert("end", f"\n❌ Error: {msg}\n"))
 
-        threading.Thread(target=worker, daemon=True).start()
+        if self.fetch_future is not None:
+            self.fetch_future.cancel()
+        self.fetch_future = BACKGROUND.submit(worker, priority=PRIORITY_INTERACTIVE, label="format checker")
 
     # ------------------------------------------------------------------
-    def _apply_filter(self):
-        """Apply the selected filter to the results."""
-        if not self.raw_output:
+    def _fetch_batch(self):
+        """Check many URLs with batched extraction, showing each as it completes."""
+        urls = [u for u in re.split(r"[\s,]+", self.url_entry.get().strip()) if URL_RE.match(u)]
+        if len(urls) < 2:
+            urls = list(dict.fromkeys(urls + self.batch_urls))
+        if not urls:
+            messagebox.showerror("No URLs", "Paste several URLs (space separated) or add them to the main window.")
             return
 
-        filtered = self._parse_and_filter(self.raw_output, self.filter_var.get())
-        self.results_text. delete("1.0", "end")
-        self.results_text.insert("1.0", filtered)
+        self.cancel_token.cancel()
+        for future in self.batch_futures:
+            future.cancel()
+        token = self.cancel_token = CancelToken()
+        self.batch_results = []
+        self.format_table = None
+        self.results_text.delete("1.0", "end")
+        self.results_text.insert("1.0", f"📚 Checking {len(urls)} URL(s) in batches of up to {BATCH_CHUNK_SIZE}...\n\n")
+
+        def worker(chunks: List[List[str]]):
+            for chunk in chunks:
+                if token.cancelled:
+                    return
+                for url, info in fetch_metadata_batch(chunk, cancel=token):
+                    if token.cancelled:
+                        return
+                    self.after(0, lambda u=url, i=info: self._show_batch_result(u, i, len(urls), token))
+
+        # Spread big lists over a few invocations that run side by side, at
+        # bulk priority and on all but one worker, so Smart Selector and
+        # single-URL fetches never queue behind a long batch
+        lanes = max(1, BACKGROUND.max_workers - 1)
+        size = min(BATCH_CHUNK_SIZE, -(-len(urls) // lanes))
+        chunks = [urls[i:i + size] for i in range(0, len(urls), size)]
+        self.batch_futures = [
+            BACKGROUND.submit(worker, chunks[lane::lanes], priority=PRIORITY_BULK, label="batch check")
+            for lane in range(min(lanes, len(chunks)))
+        ]
 
     # ------------------------------------------------------------------
-    def _parse_and_filter(self, output: str, filter_type: str) -> str:
-        """Parse and filter format output with quality indicators."""
-        lines = output.split("\n")
-        result = []
-        audio_formats = []
-
-        # Find header
-        start = -1
-        for i, line in enumerate(lines):
-            if "ID" in line and "EXT" in line and "RESOLUTION" in line:
-                start = i
-                break
-        if start == -1:
-            return output
-
-        result.extend(lines[: start + 2])
+    def _show_batch_result(self, url: str, info: Dict[str, Any], total: int, token: CancelToken):
+        """Append one batch result line (Tk thread)."""
+        if token is not self.cancel_token:
+            # Late result of a batch that was replaced
+            return
+        self.batch_results.append((url, info))
+        done = f"[{len(self.batch_results)}/{total}]"
+        if not info:
+            line = f"❌ {done} {url} – extraction failed"
+        else:
+            formats = info.get("formats") or []
+            heights = [f.get("height") or 0 for f in formats if f.get("vcodec") not in (None, "none")]
+            abrs = [f.get("abr") or 0 for f in formats if f.get("vcodec") == "none"]
+            best = f"best {max(heights)}p" if heights else "no video"
+            audio = f"audio {max(abrs):.0f}k" if abrs and max(abrs) else "no audio"
+            line = f"✅ {done} {info.get('title') or url} – {len(formats)} formats, {best}, {audio}"
+        self.results_text.insert("end", line + "\n")
+        self.results_text.see("end")
+        if len(self.batch_results) == total:
+            failed = sum(1 for _, i in self.batch_results if not i)
+            self.results_text.insert("end", f"\n📋 Done: {total - failed} ok, {failed} failed. Use 💾 Export to save.\n")
 
-        # Process formats
-        for line in lines[start + 2:]:
-            if not line.strip():
-                continue
-            low = line.lower()
-            bitrate = 0
-            m = re.search(r"(\d+)k", low)
-            if m:
-                bitrate = int(m.group(1))
-
-            is_audio = "audio only" in low
-            is_video = ("video only" in low) or ("x" in low and not is_audio)
-
-            # Add quality indicator
-            indicator = ""
-            if is_audio: 
-                if bitrate >= 480:
-                    indicator = " 🟢 EXCELLENT"
-                elif bitrate >= 256:
-                    indicator = " 🟡 VERY GOOD"
-                elif bitrate >= 160:
-                    indicator = " 🟠 GOOD"
+    # ------------------------------------------------------------------
+    def _export_batch(self):
+        """Save the batch results as JSON Lines, CSV or a format matrix."""
+        if not self.batch_results:
+            messagebox.showinfo("Nothing to Export", "Run a 📚 Batch Check first.")
+            return
+        kind = self.export_var.get()
+        ext = ".jsonl" if kind == "JSON Lines" else ".csv"
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            defaultextension=ext,
+            initialfile=f"formats{'-matrix' if kind == 'Format Matrix' else ''}{ext}",
+            filetypes=[(kind, f"*{ext}"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8", newline="") as fh:
+                if kind == "JSON Lines":
+                    for url, info in self.batch_results:
+                        fh.write(json.dumps(metadata_record(url, info), ensure_ascii=False) + "\n")
+                elif kind == "CSV":
+                    writer = csv.DictWriter(fh, fieldnames=FORMAT_CSV_FIELDS)
+                    writer.writeheader()
+                    for url, info in self.batch_results:
+                        writer.writerows(metadata_rows(url, info))
                 else:
-                    indicator = " 🔴 MEDIUM"
-
-            modified_line = line + indicator if indicator else line
-
-            if filter_type == "all":
-                result.append(modified_line)
-            elif filter_type == "audio" and is_audio:
-                result.append(modified_line)
-                audio_formats.append((bitrate, line))
-            elif filter_type == "high_audio" and is_audio and bitrate >= 256:
-                result.append(modified_line)
-                audio_formats.append((bitrate, line))
-            elif filter_type == "highest_audio" and is_audio and bitrate >= 480:
-                result. append(modified_line)
-                audio_formats.append((bitrate, line))
-            elif filter_type == "video" and is_video:
-                result.append(modified_line)
+                    header, rows = format_matrix(self.batch_results)
+                    writer = csv.writer(fh)
+                    writer.writerow(header)
+                    writer.writerows(rows)
+        except OSError as exc:
+            messagebox.showerror("Export Failed", str(exc))
+            return
+        self.results_text.insert("end", f"💾 Saved {len(self.batch_results)} result(s) to {path}\n")
 
-        # Audio summary
-        if filter_type in {"audio", "high_audio", "highest_audio"} and audio_formats:
-            audio_formats.sort(reverse=True)
-            result.append("\n" + "=" * 80)
-            result.append("📊 AUDIO QUALITY SUMMARY:")
-            result.append("=" * 80)
+    # ------------------------------------------------------------------
+    def _add_format_line(self, table: FormatTable, line: str):
+        """Index one streamed yt-dlp line and show it if it passes the filter (Tk thread)."""
+        if table is not self.format_table:
+            # Late line of a fetch that was replaced
+            return
+        preamble = len(table.preamble)
+        position = table.feed(line)
+        if table.has_header and len(table.preamble) > preamble:
+            # Table header/separator: redraw, dropping the "Fetching" notice
+            self._apply_filter()
+        elif not table.has_header or (position is not None and table.matches(position, self.filter_var.get())):
+            self.results_text.insert("end", (table.rows[position] if position is not None else line) + "\n")
+            self.results_text.see("end")
 
-            max_br = audio_formats[0][0]
-            result.append(f"🎵 Highest available bitrate: {max_br} kbps")
-            if max_br >= 480:
-                result.append("✅ EXCELLENT – near YouTube's max (512 kbps 5.1)")
-            elif max_br >= 256:
-                result.append("✅ VERY GOOD – high-quality stereo (max 384 kbps)")
-            elif max_br >= 160:
-                result.append("✓ GOOD – standard quality")
-            else:
-                result. append("⚠ MEDIUM – lower-quality audio")
+    # ------------------------------------------------------------------
+    def _finish_format_table(self, table: FormatTable):
+        """Redraw once the fetch ends, adding the audio summary (Tk thread)."""
+        if table is self.format_table:
+            self._apply_filter()
 
-            result.append(f"\n📋 Found {len(audio_formats)} audio format(s)")
-            result.append("\n💡 Recommended:  Use format ID {audio_formats[0][1]. split()[0]} for best quality")
+    # ------------------------------------------------------------------
+    def _apply_filter(self):
+        """Show the indexed rows for the selected filter."""
+        if self.format_table is None or not (self.format_table.preamble or self.format_table.rows):
+            return
 
-        return "\n".join(result)
+        self.results_text.delete("1.0", "end")
+        self.results_text.insert("1.0", self.format_table.render(self.filter_var.get()))
 
 
 # ----------------------------------------------------------------------
@@ -2158,8 +5935,8 @@ class PreferencesWindow(ctk.CTkToplevel):
         super().__init__(parent)
 
         self.title("⚙️ Preferences")
-        self.geometry("600x400")
-        self.minsize(500, 300)
+        self.geometry("640x720")
+        self.minsize(560, 600)
         
         # Set icon
         icon_path = Path(__file__).parent / "app.icon.png"
@@ -2177,7 +5954,7 @@ class PreferencesWindow(ctk.CTkToplevel):
         ).pack(pady=20)
 
         # Settings frame
-        settings_frame = ctk.CTkFrame(self, corner_radius=15)
+        settings_frame = ctk.CTkScrollableFrame(self, corner_radius=15)
         settings_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
 
         ctk.CTkLabel(
@@ -2204,6 +5981,134 @@ class PreferencesWindow(ctk.CTkToplevel):
         )
         theme_menu.pack(anchor="w", padx=20, pady=(0, 20))
 
+        # Bandwidth & connections (applied live to running batches)
+        ctk.CTkLabel(
+            settings_frame,
+            text="🚦 Bandwidth & Connections",
+            font=ctk.CTkFont(size=16, weight="bold")
+        ).pack(anchor="w", padx=20, pady=(10, 10))
+
+        limits_frame = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        limits_frame.pack(fill="x", padx=20)
+
+        ctk.CTkLabel(limits_frame, text="Global limit (MB/s):", font=ctk.CTkFont(size=13)).grid(
+            row=0, column=0, sticky="w", pady=4
+        )
+        self.global_limit_entry = ctk.CTkEntry(limits_frame, placeholder_text="unlimited", width=110)
+        self.global_limit_entry.grid(row=0, column=1, sticky="w", padx=10, pady=4)
+        if SCHEDULER.global_limit:
+            self.global_limit_entry.insert(0, f"{SCHEDULER.global_limit / 1024 ** 2:g}")
+
+        ctk.CTkLabel(limits_frame, text="Max parallel downloads:", font=ctk.CTkFont(size=13)).grid(
+            row=1, column=0, sticky="w", pady=4
+        )
+        self.max_jobs_entry = ctk.CTkEntry(limits_frame, width=110)
+        self.max_jobs_entry.grid(row=1, column=1, sticky="w", padx=10, pady=4)
+        self.max_jobs_entry.insert(0, str(SCHEDULER.max_total_jobs))
+
+        ctk.CTkLabel(limits_frame, text="Host", font=ctk.CTkFont(size=12, weight="bold")).grid(
+            row=2, column=0, sticky="w", pady=(12, 4)
+        )
+        ctk.CTkLabel(limits_frame, text="Limit (MB/s)", font=ctk.CTkFont(size=12, weight="bold")).grid(
+            row=2, column=1, sticky="w", padx=10, pady=(12, 4)
+        )
+        ctk.CTkLabel(limits_frame, text="Max jobs", font=ctk.CTkFont(size=12, weight="bold")).grid(
+            row=2, column=2, sticky="w", padx=10, pady=(12, 4)
+        )
+
+        self.host_entries: Dict[str, Tuple[ctk.CTkEntry, ctk.CTkEntry]] = {}
+        for row, host in enumerate(DEFAULT_HOST_MAX_JOBS, start=3):
+            ctk.CTkLabel(limits_frame, text=host, font=ctk.CTkFont(size=13)).grid(row=row, column=0, sticky="w", pady=2)
+            limit_entry = ctk.CTkEntry(limits_frame, placeholder_text="unlimited", width=110)
+            limit_entry.grid(row=row, column=1, sticky="w", padx=10, pady=2)
+            if SCHEDULER.host_limits.get(host):
+                limit_entry.insert(0, f"{SCHEDULER.host_limits[host] / 1024 ** 2:g}")
+            jobs_entry = ctk.CTkEntry(limits_frame, width=80)
+            jobs_entry.grid(row=row, column=2, sticky="w", padx=10, pady=2)
+            jobs_entry.insert(0, str(SCHEDULER.host_max_jobs.get(host, SCHEDULER.max_total_jobs)))
+            self.host_entries[host] = (limit_entry, jobs_entry)
+
+        self.autotune_var = ctk.BooleanVar(value=SCHEDULER.tuner.enabled)
+        ctk.CTkCheckBox(
+            settings_frame,
+            text="Auto-tune parallel jobs per host (within the caps above)",
+            variable=self.autotune_var,
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w", padx=20, pady=(12, 0))
+
+        # Stall watchdog
+        ctk.CTkLabel(
+            settings_frame,
+            text="🐕 Stall Watchdog",
+            font=ctk.CTkFont(size=16, weight="bold")
+        ).pack(anchor="w", padx=20, pady=(20, 10))
+
+        watchdog_frame = ctk.CTkFrame(settings_frame, fg_color="transparent")
+        watchdog_frame.pack(fill="x", padx=20)
+
+        self.watchdog_entries: Dict[str, ctk.CTkEntry] = {}
+        watchdog_fields = [
+            ("stall_timeout", "Restart after no progress for (s):", WATCHDOG_SETTINGS["stall_timeout"]),
+            ("speed_floor", "Speed floor (KB/s, 0 = off):", WATCHDOG_SETTINGS["speed_floor"] // 1024),
+            ("floor_window", "…sustained for (s):", WATCHDOG_SETTINGS["floor_window"]),
+            ("max_restarts", "Max restarts per attempt:", WATCHDOG_SETTINGS["max_restarts"]),
+        ]
+        for row, (key, label, value) in enumerate(watchdog_fields):
+            ctk.CTkLabel(watchdog_frame, text=label, font=ctk.CTkFont(size=13)).grid(row=row, column=0, sticky="w", pady=4)
+            entry = ctk.CTkEntry(watchdog_frame, width=110)
+            entry.grid(row=row, column=1, sticky="w", padx=10, pady=4)
+            entry.insert(0, str(value))
+            self.watchdog_entries[key] = entry
+
+        self.switch_client_var = ctk.BooleanVar(value=WATCHDOG_SETTINGS["switch_client"])
+        ctk.CTkCheckBox(
+            settings_frame,
+            text="Switch YouTube player client when restarting",
+            variable=self.switch_client_var,
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w", padx=20, pady=(8, 0))
+
+        self.keep_partials_var = ctk.BooleanVar(value=CANCEL_SETTINGS["keep_partials"])
+        ctk.CTkCheckBox(
+            settings_frame,
+            text="Keep partial files of cancelled downloads (resume later)",
+            variable=self.keep_partials_var,
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w", padx=20, pady=(8, 0))
+
+        self.warm_pool_var = ctk.BooleanVar(value=WARM_POOL_SETTINGS["enabled"])
+        ctk.CTkCheckBox(
+            settings_frame,
+            text="Keep warm yt-dlp workers (faster format checks and downloads)",
+            variable=self.warm_pool_var,
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w", padx=20, pady=(8, 0))
+
+        self.prefetch_var = ctk.BooleanVar(value=PREFETCH_SETTINGS["enabled"])
+        ctk.CTkCheckBox(
+            settings_frame,
+            text="Fetch formats in the background as soon as URLs are pasted",
+            variable=self.prefetch_var,
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w", padx=20, pady=(8, 0))
+
+        self.lean_extraction_var = ctk.BooleanVar(value=EXTRACTION_SETTINGS["enabled"])
+        ctk.CTkCheckBox(
+            settings_frame,
+            text="Lean extraction (fewer YouTube player clients, no manifests for audio/best-quality downloads)",
+            variable=self.lean_extraction_var,
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w", padx=20, pady=(8, 0))
+
+        ctk.CTkButton(
+            settings_frame,
+            text="Apply",
+            width=160,
+            height=35,
+            corner_radius=8,
+            command=self._apply_limits
+        ).pack(anchor="w", padx=20, pady=(12, 10))
+
         # Info
         ctk.CTkLabel(
             settings_frame,
@@ -2213,6 +6118,46 @@ class PreferencesWindow(ctk.CTkToplevel):
         ).pack(pady=20)
 
 
+    # ------------------------------------------------------------------
+    def _apply_limits(self):
+        """Push the bandwidth, job and watchdog settings to the download engine."""
+
+        def mbps(entry: ctk.CTkEntry) -> int:
+            text = entry.get().strip()
+            return int(float(text) * 1024 ** 2) if text else 0
+
+        # Parse everything first so a bad entry leaves all settings untouched
+        try:
+            host_limits = {h: mbps(limit) for h, (limit, _) in self.host_entries.items()}
+            host_max_jobs = {h: int(jobs.get().strip()) for h, (_, jobs) in self.host_entries.items()}
+            global_limit = mbps(self.global_limit_entry)
+            max_total_jobs = int(self.max_jobs_entry.get().strip())
+            watchdog = {key: int(entry.get().strip()) for key, entry in self.watchdog_entries.items()}
+        except ValueError:
+            messagebox.showerror("Invalid Setting", "Limits must be numbers (leave a rate blank for unlimited).")
+            return
+        watchdog["speed_floor"] *= 1024
+
+        SCHEDULER.configure(
+            global_limit=global_limit,
+            max_total_jobs=max_total_jobs,
+            host_limits=host_limits,
+            host_max_jobs=host_max_jobs,
+        )
+        WATCHDOG_SETTINGS.update(watchdog)
+        WATCHDOG_SETTINGS["switch_client"] = bool(self.switch_client_var.get())
+        CANCEL_SETTINGS["keep_partials"] = bool(self.keep_partials_var.get())
+        SCHEDULER.tuner.enabled = bool(self.autotune_var.get())
+        WARM_POOL_SETTINGS["enabled"] = bool(self.warm_pool_var.get())
+        PREFETCH_SETTINGS["enabled"] = bool(self.prefetch_var.get())
+        EXTRACTION_SETTINGS["enabled"] = bool(self.lean_extraction_var.get())
+        SCHEDULER.wake()
+        messagebox.showinfo(
+            "Settings Applied",
+            "Job limits apply now; bandwidth limits apply to downloads started from now on.",
+        )
+
+
 # ----------------------------------------------------------------------
 # Run the app
 # ----------------------------------------------------------------------
@@ -2227,6 +6172,11 @@ if __name__ == "__main__":
         _diagnostic_log("__main__ entry point reached")
         try:
             app = kexisdownloader()
+            # `kexisdownloader.py urls.txt` or `... - < urls.txt`: queue for Video.
+            # stdin is only read when asked for: launchers and IDEs often
+            # leave it an open pipe that never ends.
+            for source in [a for a in sys.argv[1:] if not a.startswith("-psn_")]:
+                app.start_import("VIDEO", source)
             app.mainloop()
         except Exception as e:
             import traceback
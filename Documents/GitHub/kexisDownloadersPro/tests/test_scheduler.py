@@ -0,0 +1,63 @@
+"""Tests for DownloadScheduler's per-process bandwidth shares."""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import kexisdownloader as k  # noqa: E402
+
+MiB = 1024 ** 2
+YOUTUBE = "https://www.youtube.com/watch?v=aqz-KE-bpKQ"
+TIKTOK = "https://www.tiktok.com/@user/video/7300000000000000000"
+
+
+class RateShareTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scheduler = k.DownloadScheduler()
+        self.scheduler.tuner.enabled = False
+        self.scheduler.configure(
+            global_limit=6 * MiB,
+            max_total_jobs=4,
+            host_limits={"YouTube": 3 * MiB},
+            host_max_jobs={"YouTube": 3, "TikTok": 3},
+        )
+        self.running = []  # (host, rate) of every "process" still running
+
+    def launch(self, url: str) -> None:
+        host = self.scheduler.acquire(url)
+        self.running.append((host, self.scheduler.rate_limit_for(url)))
+
+    def finish(self, index: int = 0) -> None:
+        host, _ = self.running.pop(index)
+        self.scheduler.release(host)
+
+    def assert_within_caps(self) -> None:
+        self.assertLessEqual(sum(rate for _, rate in self.running), 6 * MiB)
+        self.assertLessEqual(sum(rate for host, rate in self.running if host == "YouTube"), 3 * MiB)
+
+    def test_staggered_launches_stay_under_caps(self) -> None:
+        # Jobs launched one at a time used to keep the larger share they
+        # got while fewer jobs were running (limit * (1 + 1/2 + 1/3 ...))
+        for _ in range(3):
+            self.launch(YOUTUBE)
+            self.assert_within_caps()
+        self.launch(TIKTOK)
+        self.assert_within_caps()
+
+    def test_churn_stays_under_caps(self) -> None:
+        for _ in range(3):
+            self.launch(YOUTUBE)
+        for _ in range(10):
+            self.finish(0)
+            self.launch(YOUTUBE if len(self.running) % 2 else TIKTOK)
+            self.assert_within_caps()
+
+    def test_unlimited_without_caps(self) -> None:
+        self.scheduler.configure(global_limit=0, host_limits={})
+        self.assertIsNone(self.scheduler.rate_limit_for(YOUTUBE))
+
+
+if __name__ == "__main__":
+    unittest.main()